@@ -0,0 +1,252 @@
+from __future__ import unicode_literals
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+from dateutil import parser
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.core.urlresolvers import reverse
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import ugettext as _, ungettext as _n
+
+from notifications.models import Notification
+
+from .models import Alert
+
+# How many users' digests to build and send at a time:
+DIGEST_BATCH_SIZE = 500
+
+# How many connections to the mail server to send digests through at
+# once:
+MAIL_SENDING_THREADS = 4
+
+
+def get_alerts_by_user(frequency, last_sent_before):
+    """
+    Return a dict mapping the ID of each user with alerts that are due
+    to the list of those alerts
+    """
+    alerts_by_user = defaultdict(list)
+    alerts = Alert.objects.filter(
+        frequency=frequency,
+        last_sent__lt=last_sent_before
+    ).select_related('user').order_by('user_id', 'id')
+    for alert in alerts:
+        alerts_by_user[alert.user_id].append(alert)
+    return alerts_by_user
+
+
+def get_unread_notifications(user_ids):
+    """
+    Return a dict mapping each of user_ids to their unread notifications
+
+    The notifications are ordered by the object they're about, and
+    those objects are fetched with one query for each type of object,
+    rather than one for each notification.  If an object has since
+    been deleted, the notification's action_object is None.
+    """
+    notifications = list(
+        Notification.objects.filter(recipient_id__in=user_ids, unread=True)
+        .order_by(
+            'recipient_id', 'action_object_content_type',
+            'action_object_object_id', 'id'
+        )
+    )
+    object_ids_by_content_type = defaultdict(set)
+    for notification in notifications:
+        object_ids_by_content_type[
+            notification.action_object_content_type_id
+        ].add(notification.action_object_object_id)
+    objects = {}
+    for content_type_id, object_ids in object_ids_by_content_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        for object_id, obj in model._default_manager.in_bulk(
+                object_ids).items():
+            objects[(content_type_id, str(object_id))] = obj
+    notifications_by_user = {}
+    for user_id, user_notifications in groupby(
+            notifications, lambda n: n.recipient_id):
+        notifications_by_user[user_id] = []
+        for notification in user_notifications:
+            setattr(
+                notification,
+                Notification.action_object.cache_attr,
+                objects.get((
+                    notification.action_object_content_type_id,
+                    notification.action_object_object_id
+                ))
+            )
+            notifications_by_user[user_id].append(notification)
+    return notifications_by_user
+
+
+class DigestFormatter(object):
+    """
+    Turns a user's notifications into the text of their digest email
+
+    Anything that's the same for every digest, like the site's URL
+    and the diff template, is only looked up once.
+    """
+
+    def __init__(self):
+        self.site = Site.objects.get_current()
+        protocol = 'http'
+        if getattr(settings, 'ACCOUNT_DEFAULT_HTTP_PROTOCOL', '') == 'https':
+            protocol = 'https'
+        self.base_url = '{0}://{1}'.format(protocol, self.site.domain)
+        self.diff_template = get_template('alerts/pretty_diff.txt')
+        self.headings = {}
+
+    def subject(self):
+        return _("Recent activity on {0}").format(self.site.name)
+
+    def heading(self, person):
+        if person.id not in self.headings:
+            self.headings[person.id] = "{0}{1}{2}\n".format(
+                _('Changes to {0}\n').format(person),
+                self.base_url,
+                reverse('person-view', kwargs={'person_id': person.id})
+            )
+        return self.headings[person.id]
+
+    def diff(self, changes):
+        changes = dict(changes)
+        # Timestamps are stored in ISO 8601 format, which parse_datetime
+        # reads much more quickly than dateutil:
+        changes['timestamp'] = parse_datetime(changes['timestamp']) or \
+            parser.parse(changes['timestamp'])
+        diff = self.diff_template.render({'changes': changes})
+        # remove extra blank lines
+        return "\n".join(
+            [ll.rstrip() for ll in diff.splitlines() if ll.strip()])
+
+    def format(self, notifications):
+        details = ""
+        current_object = None
+        no_change_count = 0
+        change_count = 0
+        for notification in notifications:
+            # The object may have been deleted since:
+            if notification.action_object is None:
+                continue
+            if notification.action_object != current_object:
+                if current_object is not None:
+                    details += "\n"
+                details += self.heading(notification.action_object)
+                current_object = notification.action_object
+            changes = (notification.data or {}).get('changes')
+            if changes is not None:
+                details += "\n{0}\n".format(self.diff(changes))
+                change_count += 1
+            else:
+                no_change_count += 1
+
+        if no_change_count > 0:
+            if change_count > 0:
+                desc = _n(
+                    "And %(no_change_count)d change we don't have details of",
+                    "And %(no_change_count)d changes we don't have details of",
+                    no_change_count
+                ) % {'no_change_count': no_change_count}
+            else:
+                desc = _n(
+                    "There has been %(no_change_count)d change we don't have details of",
+                    "There have been %(no_change_count)d changes we don't have details of",
+                    no_change_count
+                ) % {'no_change_count': no_change_count}
+
+            details += "\n{0}\n".format(desc)
+        return details
+
+
+def send_messages(messages, threads=MAIL_SENDING_THREADS):
+    """
+    Send messages through up to threads connections at once
+
+    Each connection is opened once and reused for all the messages
+    it sends.  Returns a list of the messages that were sent, and a
+    list of the exceptions that stopped any of the connections from
+    sending the rest of theirs.
+    """
+    sent = []
+
+    def send(messages_to_send):
+        connection = get_connection()
+        connection.open()
+        try:
+            for message in messages_to_send:
+                if connection.send_messages([message]):
+                    sent.append(message)
+        finally:
+            connection.close()
+
+    chunks = [messages[i::threads] for i in range(threads)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(send, chunk) for chunk in chunks if chunk]
+    return sent, [f.exception() for f in futures if f.exception()]
+
+
+def send_digests(frequency, last_sent_before, batch_size=DIGEST_BATCH_SIZE,
+                 threads=MAIL_SENDING_THREADS):
+    """
+    Email each user with due alerts one digest of their unread notifications
+
+    Once a user's digest has been sent, all their due alerts are
+    marked as sent and the notifications in it as read.  Returns the
+    number of digests sent.
+    """
+    alerts_by_user = get_alerts_by_user(frequency, last_sent_before)
+    user_ids = sorted(alerts_by_user)
+    formatter = DigestFormatter()
+    total = 0
+    for i in range(0, len(user_ids), batch_size):
+        batch_user_ids = user_ids[i:i + batch_size]
+        notifications_by_user = get_unread_notifications(batch_user_ids)
+        user_ids_by_message = {}
+        # Users whose notifications are only about things that have
+        # since been deleted, so there's nothing to send them:
+        skipped_user_ids = []
+        for user_id in batch_user_ids:
+            notifications = notifications_by_user.get(user_id)
+            if not notifications:
+                continue
+            details = formatter.format(notifications)
+            if not details:
+                skipped_user_ids.append(user_id)
+                continue
+            message = EmailMessage(
+                formatter.subject(),
+                details,
+                settings.DEFAULT_FROM_EMAIL,
+                [alerts_by_user[user_id][0].user.email],
+            )
+            user_ids_by_message[message] = user_id
+        sent, errors = send_messages(list(user_ids_by_message), threads)
+        sent_user_ids = [user_ids_by_message[message] for message in sent]
+        Alert.objects.filter(
+            id__in=[
+                alert.id
+                for user_id in sent_user_ids
+                for alert in alerts_by_user[user_id]
+            ]
+        ).update(last_sent=timezone.now())
+        Notification.objects.filter(
+            id__in=[
+                notification.id
+                for user_id in sent_user_ids + skipped_user_ids
+                for notification in notifications_by_user[user_id]
+            ]
+        ).update(unread=False)
+        total += len(sent)
+        # Only give up once everything that was sent has been
+        # recorded, so that nobody's sent the same digest twice:
+        if errors:
+            raise errors[0]
+    return total
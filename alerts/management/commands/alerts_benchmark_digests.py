@@ -0,0 +1,164 @@
+from __future__ import division, print_function, unicode_literals
+
+from datetime import timedelta
+from random import Random
+from timeit import default_timer
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from django.utils.translation import override
+
+from notifications.models import Notification
+from popolo.models import Person
+
+from alerts.digest import MAIL_SENDING_THREADS, send_digests
+from alerts.models import Alert
+
+USERNAME_PREFIX = 'digest-benchmark-'
+
+
+class Rollback(Exception):
+    pass
+
+
+def make_changes(random, i):
+    return {
+        'username': 'editor',
+        'timestamp': timezone.now().isoformat(),
+        'information_source': 'Benchmark change {0}'.format(i),
+        'diffs': [{
+            'parent_version_id': '{0:016x}'.format(random.getrandbits(64)),
+            'parent_diff': [{
+                'op': 'replace',
+                'path': 'honorific_prefix',
+                'previous_value': 'Mr',
+                'value': 'Dr',
+            }],
+        }],
+    }
+
+
+class Command(BaseCommand):
+
+    help = "Time sending alert digests for lots of made-up notifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=2000,
+            help='The number of users with alerts to make up'
+        )
+        parser.add_argument(
+            '--people',
+            type=int,
+            default=500,
+            help='The number of people for the notifications to be about'
+        )
+        parser.add_argument(
+            '--notifications',
+            type=int,
+            default=30000,
+            help='The number of unread notifications to make up'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=MAIL_SENDING_THREADS,
+            help='How many connections to send mail through at once'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='The seed for making up notifications'
+        )
+
+    def create_test_data(self, options):
+        random = Random(options['seed'])
+        User.objects.bulk_create([
+            User(
+                username='{0}{1}'.format(USERNAME_PREFIX, i),
+                email='{0}{1}@example.com'.format(USERNAME_PREFIX, i)
+            )
+            for i in range(options['users'] + 1)
+        ])
+        user_ids = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by('id').values_list('id', flat=True)
+        )
+        editor_id = user_ids.pop()
+        Person.objects.bulk_create([
+            Person(name='{0}{1}'.format(USERNAME_PREFIX, i))
+            for i in range(options['people'])
+        ])
+        person_ids = list(
+            Person.objects.filter(name__startswith=USERNAME_PREFIX)
+            .values_list('id', flat=True)
+        )
+        person_content_type = ContentType.objects.get_for_model(Person)
+        Alert.objects.bulk_create([
+            Alert(
+                user_id=user_id,
+                target_content_type=person_content_type,
+                target_object_id=random.choice(person_ids),
+                frequency='daily',
+                last_sent=timezone.now() - timedelta(days=2)
+            )
+            for user_id in user_ids
+        ])
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    recipient_id=random.choice(user_ids),
+                    actor_content_type=ContentType.objects.get_for_model(
+                        User),
+                    actor_object_id=editor_id,
+                    verb='updated',
+                    action_object_content_type=person_content_type,
+                    action_object_object_id=random.choice(person_ids),
+                    data={'changes': make_changes(random, i)},
+                )
+                for i in range(options['notifications'])
+            ],
+            batch_size=1000
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1:
+            raise CommandError("--threads must be at least 1")
+        email_backend = 'django.core.mail.backends.locmem.EmailBackend'
+        try:
+            with transaction.atomic(), \
+                    override_settings(EMAIL_BACKEND=email_backend), \
+                    override(settings.LANGUAGE_CODE):
+                self.create_test_data(options)
+                mail.outbox = []
+                start = default_timer()
+                with CaptureQueriesContext(connection) as context:
+                    sent = send_digests(
+                        'daily',
+                        timezone.now() - timedelta(days=1),
+                        threads=options['threads']
+                    )
+                elapsed = default_timer() - start
+                print(
+                    'Sent {0} digests of {1} notifications in {2:.2f}s '
+                    '({3:.1f}ms per digest) with {4} queries'.format(
+                        sent,
+                        options['notifications'],
+                        elapsed,
+                        elapsed * 1000 / max(sent, 1),
+                        len(context.captured_queries),
+                    )
+                )
+                # Don't leave any of the made-up data behind:
+                raise Rollback()
+        except Rollback:
+            pass
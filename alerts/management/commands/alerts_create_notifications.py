@@ -0,0 +1,42 @@
+from __future__ import print_function, unicode_literals
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from alerts.models import ALERT_QUEUE_BATCH_SIZE, create_queued_notifications
+
+
+class Command(BaseCommand):
+
+    help = "Create the notifications for queued changes to people"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ALERT_QUEUE_BATCH_SIZE,
+            help='How many queued changes to fetch at a time'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep running, checking for queued changes every "
+                 "--sleep seconds"
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='With --loop, how long to wait when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        verbose = int(options['verbosity']) > 1
+        while True:
+            processed = create_queued_notifications(options['batch_size'])
+            if verbose and processed:
+                print('Processed {0} queued changes'.format(processed))
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
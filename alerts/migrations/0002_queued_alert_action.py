@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('candidates', '0043_person_name_token'),
+        ('alerts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedAlertAction',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('created', models.BooleanField(default=False)),
+                ('logged_action', models.ForeignKey(to='candidates.LoggedAction')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='alert',
+            index_together=set([('target_content_type', 'target_object_id')]),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0044_csv_export_invalidation'),
+        ('alerts', '0002_queued_alert_action'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedalertaction',
+            name='person_version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.SET_NULL, blank=True, to='candidates.PersonVersion', null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0003_queued_alert_action_person_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedalertaction',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='queuedalertaction',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='queuedalertaction',
+            name='retry_after',
+            field=models.DateTimeField(null=True, blank=True),
+        ),
+    ]
@@ -1,15 +1,23 @@
-from django.db import models
+from datetime import timedelta
+import logging
+import traceback
+
+from django.db import models, transaction
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth.models import User
+from django.db.models import Q
 from django.db.models.signals import post_save
+from django.utils import timezone
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
-from notifications.signals import notify
+from notifications.models import EXTRA_DATA, Notification
+
+from popolo.models import Area, Membership, Organization, Person, Post
+from candidates.models import LoggedAction, PersonVersion
 
-from popolo.models import Membership
-from candidates.models import PostExtra, LoggedAction
+logger = logging.getLogger(__name__)
 
 
 class Alert(models.Model):
@@ -45,100 +53,230 @@ class Alert(models.Model):
     last_sent = models.DateTimeField()
     enabled = models.BooleanField(default=True)
 
+    class Meta:
+        index_together = [('target_content_type', 'target_object_id')]
+
+
+# How many queued actions to create notifications for at a time:
+ALERT_QUEUE_BATCH_SIZE = 100
 
-def send_person_signals(sender, instance, created, **kwargs):
+# If creating the notifications for a queued action fails, it's tried
+# again after ALERT_QUEUE_RETRY_SECONDS, then after twice that, and
+# so on, until it's failed ALERT_QUEUE_MAX_ATTEMPTS times:
+ALERT_QUEUE_MAX_ATTEMPTS = 5
+ALERT_QUEUE_RETRY_SECONDS = 60
+
+
+class QueuedAlertAction(models.Model):
     """
-    This creates the notifications we use to send email alerts of
-    changes to people
+    A change to a person that people with alerts need to be notified of
+
+    These are created in the same transaction as the LoggedAction, so
+    saving a person doesn't have to wait for the notifications to be
+    created; create_queued_notifications does that later, e.g. from
+    the alerts_create_notifications command.
     """
+
+    logged_action = models.ForeignKey(LoggedAction)
+    created = models.BooleanField(default=False)
+    # The person's latest version when the action was logged, whose
+    # diff the notifications show; later edits may have been made by
+    # the time the queue is processed:
+    person_version = models.ForeignKey(
+        PersonVersion, blank=True, null=True, on_delete=models.SET_NULL)
+    # How many times creating the notifications has failed, the last
+    # error, and when to try again:
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    retry_after = models.DateTimeField(blank=True, null=True)
+
+
+def queue_person_notifications(sender, instance, created, **kwargs):
     if instance.action_type not in (
         'person-update', 'person-create'
     ):
         return
+    person_version = None
+    if instance.person_id is not None:
+        person_version = PersonVersion.objects \
+            .filter(person_id=instance.person_id).first()
+    QueuedAlertAction.objects.create(
+        logged_action=instance,
+        created=created,
+        person_version=person_version,
+    )
+
 
-    person = instance.person
-    content_type = ContentType.objects.get_for_model(person)
+def get_alert_targets(person):
+    """
+    Return a list of the (content type, object ID) pairs of everything
+    an alert could be set on to hear about changes to person
+    """
+    targets = [(ContentType.objects.get_for_model(Person), person.id)]
+
+    # FIXME: this doesn't handle people being removed from an area
+    area_ids = Post.objects.filter(
+        memberships__person=person,
+        extra__elections__current=True,
+        area__isnull=False,
+    ).values_list('area_id', flat=True).distinct()
+    area_content_type = ContentType.objects.get_for_model(Area)
+    targets += [(area_content_type, area_id) for area_id in area_ids]
+
+    # TODO: not sure this is the correct way to do this
+    party_ids = Membership.objects.filter(
+        person=person,
+        on_behalf_of__classification='Party',
+        extra__election__current=True
+    ).values_list('on_behalf_of_id', flat=True).distinct()
+    party_content_type = ContentType.objects.get_for_model(Organization)
+    targets += [(party_content_type, party_id) for party_id in party_ids]
+
+    return targets
+
+
+def create_person_notifications(logged_action, created, person_version):
+    """
+    This creates the notifications we use to send email alerts of
+    changes to people
+    """
+    person = logged_action.person
     verb = 'updated'
     if created:
         verb = 'created'
 
-    alerts = Alert.objects.filter(
-        target_content_type=content_type,
-        target_object_id=person.id
+    # Everyone with an alert on the person, or an area or party
+    # they're standing in or for, in one query:
+    target_filter = Q()
+    for content_type, object_id in get_alert_targets(person):
+        target_filter |= Q(
+            target_content_type=content_type,
+            target_object_id=object_id
+        )
+    user_ids = set(
+        Alert.objects.filter(target_filter)
+        .values_list('user_id', flat=True)
     )
-
-    users_alerted = set()
+    if not user_ids:
+        return
 
     # This is here to make writing tests a bit easier as
     # it means you don't need to create a versions object
     # or add an extra if it's not required
-    try:
-        changes = person.extra.version_diffs[0]
-    except (IndexError, ObjectDoesNotExist):
-        changes = None
-
-    for alert in alerts:
-        if alert.user not in users_alerted:
-            users_alerted.add(alert.user)
-            notify.send(
-                instance.user,
-                action_object=person,
-                verb=verb,
-                recipient=alert.user,
-                changes=changes
-            )
+    changes = None
+    if person_version is not None:
+        try:
+            changes = person.extra.get_version_diff(person_version)
+        except ObjectDoesNotExist:
+            pass
 
-    # FIXME: this doesn't handle people being removed from an area
-    posts = PostExtra.objects.filter(
-        base__memberships__person=person,
-        elections__current=True
-    )
+    # These are the notifications notify.send would create, but made
+    # with a single insert:
+    data = None
+    if EXTRA_DATA:
+        data = {'changes': changes}
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=user_id,
+            actor_content_type=ContentType.objects.get_for_model(User),
+            actor_object_id=logged_action.user_id,
+            verb=verb,
+            timestamp=logged_action.created,
+            action_object_content_type=ContentType.objects.get_for_model(
+                person),
+            action_object_object_id=person.id,
+            data=data,
+        )
+        for user_id in sorted(user_ids)
+    ])
 
-    for post in posts:
-        area = post.base.area
-        if area is not None:
-            content_type = ContentType.objects.get_for_model(area)
-            alerts = Alert.objects.filter(
-                target_content_type=content_type,
-                target_object_id=area.id
+
+def create_queued_notification(queued_action_id):
+    """
+    Create the notifications for one queued action, and remove it
+
+    This happens in a transaction, with the queued action locked, so
+    that if alerts_create_notifications and alerts_send_alerts are
+    run at the same time, only one of them creates its notifications.
+    Returns False if it had already been processed.
+    """
+    with transaction.atomic():
+        queued_action = QueuedAlertAction.objects.select_for_update() \
+            .filter(id=queued_action_id).first()
+        if queued_action is None:
+            return False
+        logged_action = LoggedAction.objects \
+            .select_related('person__extra').get(
+                id=queued_action.logged_action_id)
+        # Notifications need someone to say the change was made by:
+        if logged_action.person and logged_action.user_id:
+            create_person_notifications(
+                logged_action,
+                queued_action.created,
+                queued_action.person_version,
             )
+        queued_action.delete()
+    return True
 
-            for alert in alerts:
-                if alert.user not in users_alerted:
-                    users_alerted.add(alert.user)
-                    notify.send(
-                        instance.user,
-                        action_object=person,
-                        verb=verb,
-                        recipient=alert.user,
-                        changes=changes
-                    )
 
-    # TODO: not sure this is the correct way to do this
-    memberships = Membership.objects.filter(
-        person=person,
-        on_behalf_of__classification='Party',
-        extra__election__current=True
-    )
+def record_failed_attempt(queued_action_id, exception):
+    """
+    Note that creating the notifications for a queued action has failed
+
+    Unless it's failed too many times, or failed because something it
+    needs has been deleted, it's left in the queue to be tried again
+    later.  Returns True if it was dropped from the queue.
+    """
+    queued_action = QueuedAlertAction.objects \
+        .filter(id=queued_action_id).first()
+    if queued_action is None:
+        return True
+    queued_action.attempts += 1
+    queued_action.last_error = traceback.format_exc()
+    permanent = isinstance(exception, ObjectDoesNotExist)
+    if permanent or queued_action.attempts >= ALERT_QUEUE_MAX_ATTEMPTS:
+        logger.exception(
+            'Failed to create the notifications for queued alert action '
+            '%s (attempt %s); dropping it',
+            queued_action_id, queued_action.attempts)
+        queued_action.delete()
+        return True
+    logger.warning(
+        'Failed to create the notifications for queued alert action '
+        '%s (attempt %s); it will be tried again',
+        queued_action_id, queued_action.attempts, exc_info=True)
+    queued_action.retry_after = timezone.now() + timedelta(
+        seconds=ALERT_QUEUE_RETRY_SECONDS * 2 ** (queued_action.attempts - 1))
+    queued_action.save()
+    return False
+
+
+def create_queued_notifications(batch_size=ALERT_QUEUE_BATCH_SIZE):
+    """
+    Create the notifications for queued actions until none are due
+
+    If creating the notifications for an action fails, the error is
+    logged and recorded on the queued action, which is tried again
+    later (see record_failed_attempt).  Returns the number of queued
+    actions that were processed or dropped.
+    """
+    total = 0
+    while True:
+        queued_action_ids = list(
+            QueuedAlertAction.objects.filter(
+                Q(retry_after__isnull=True) |
+                Q(retry_after__lte=timezone.now())
+            ).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not queued_action_ids:
+            return total
+        for queued_action_id in queued_action_ids:
+            try:
+                if create_queued_notification(queued_action_id):
+                    total += 1
+            except Exception as e:
+                if record_failed_attempt(queued_action_id, e):
+                    total += 1
 
-    for membership in memberships:
-        party = membership.on_behalf_of
-        if party is not None:
-            content_type = ContentType.objects.get_for_model(party)
-            alerts = Alert.objects.filter(
-                target_content_type=content_type,
-                target_object_id=party.id
-            )
 
-            for alert in alerts:
-                if alert.user not in users_alerted:
-                    users_alerted.add(alert.user)
-                    notify.send(
-                        instance.user,
-                        action_object=person,
-                        verb=verb,
-                        recipient=alert.user,
-                        changes=changes
-                    )
-
-post_save.connect(send_person_signals, sender=LoggedAction)
+post_save.connect(queue_person_notifications, sender=LoggedAction)
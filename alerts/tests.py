@@ -1,11 +1,15 @@
 import re
 import pytz
+from mock import patch
 from datetime import datetime, timedelta
 
 from django_webtest import WebTest
 from django.core import mail
 from django.core.management import call_command
-from django.test.utils import override_settings
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
 
 from nose.plugins.attrib import attr
 
@@ -18,9 +22,17 @@ from candidates.tests.uk_examples import UK2015ExamplesMixin
 from django.contrib.contenttypes.models import ContentType
 
 from candidates.models import LoggedAction
+from popolo.models import Person
 from candidates.tests.auth import TestUserMixin
 
-from .models import Alert
+from notifications.models import Notification
+
+from .digest import send_digests
+from .models import (
+    ALERT_QUEUE_MAX_ATTEMPTS, Alert, QueuedAlertAction,
+    create_queued_notification, create_queued_notifications,
+    create_person_notifications
+)
 
 
 class AlertsTest(TestUserMixin, UK2015ExamplesMixin, WebTest):
@@ -315,3 +327,242 @@ class AlertsTest(TestUserMixin, UK2015ExamplesMixin, WebTest):
         self.assertTrue(re.search(r'There has been 1 change we don', msg.body))
 
         la.delete()
+
+    def test_threads_must_be_positive(self):
+        with self.assertRaisesRegexp(
+                CommandError, '--threads must be at least 1'):
+            call_command('alerts_send_alerts', '--hourly', '--threads', '0')
+        self.assertEquals(len(mail.outbox), 0)
+
+    def test_changes_are_queued(self):
+        LoggedAction.objects.create(
+            user=self.user_who_can_lock,
+            person=self.person,
+            action_type='person-update',
+            source="test_changes_are_queued"
+        )
+        LoggedAction.objects.create(
+            user=self.user_who_can_lock,
+            person=self.person,
+            action_type='set-candidate-elected',
+            source="test_changes_are_queued"
+        )
+
+        self.assertEqual(QueuedAlertAction.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        self.assertEqual(create_queued_notifications(), 1)
+        self.assertEqual(QueuedAlertAction.objects.count(), 0)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient, self.user)
+        self.assertEqual(notification.actor, self.user_who_can_lock)
+        self.assertEqual(notification.action_object, self.person)
+        self.assertEqual(notification.verb, 'created')
+        self.assertEqual(notification.data, {'changes': None})
+
+    def test_alerts_for_all_targets_found_at_once(self):
+        # Martin Jones is standing in Camberwell, which has an alert
+        # set, and now for the Liberal Democrats, which has another:
+        CandidacyExtraFactory.create(
+            election=self.election,
+            base__person=self.person2,
+            base__post=self.camberwell_post_extra.base,
+            base__on_behalf_of=self.ld_party_extra.base
+        )
+        Alert.objects.create(
+            user=self.user_who_can_merge,
+            target_content_type=ContentType.objects.get_for_model(
+                self.person2),
+            target_object_id=self.person2.id,
+            last_sent=datetime.now(pytz.utc),
+            frequency='daily'
+        )
+        LoggedAction.objects.create(
+            user=self.user_who_can_lock,
+            person=self.person2,
+            action_type='person-create',
+            source="test_alerts_for_all_targets_found_at_once"
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            create_queued_notifications()
+        self.assertEqual(
+            len([
+                query for query in context.captured_queries
+                if 'FROM "alerts_alert"' in query['sql']
+            ]),
+            1
+        )
+        self.assertEqual(
+            sorted(
+                (n.recipient.username, n.verb)
+                for n in Notification.objects.all()
+            ),
+            sorted([
+                (self.user_who_can_merge.username, 'created'),
+                (self.user_who_can_rename.username, 'created'),
+            ])
+        )
+
+    def test_queued_action_only_processed_once(self):
+        LoggedAction.objects.create(
+            user=self.user_who_can_lock,
+            person=self.person,
+            action_type='person-update',
+            source="test_queued_action_only_processed_once"
+        )
+        queued_action_id = QueuedAlertAction.objects.get().id
+        self.assertTrue(create_queued_notification(queued_action_id))
+        # As if another process had fetched it before it was deleted:
+        self.assertFalse(create_queued_notification(queued_action_id))
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_failing_action_is_retried(self):
+        for i in range(2):
+            LoggedAction.objects.create(
+                user=self.user_who_can_lock,
+                person=self.person,
+                action_type='person-update',
+                source="test_failing_action_is_retried"
+            )
+        calls = []
+
+        def fail_the_first_time(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                create_person_notifications(*args)
+                raise ValueError('Something went wrong')
+            create_person_notifications(*args)
+
+        with patch(
+                'alerts.models.create_person_notifications',
+                side_effect=fail_the_first_time
+        ):
+            self.assertEqual(create_queued_notifications(), 1)
+        # The first action's notification was rolled back, and the
+        # action left to be tried again later:
+        self.assertEqual(Notification.objects.count(), 1)
+        queued_action = QueuedAlertAction.objects.get()
+        self.assertEqual(queued_action.attempts, 1)
+        self.assertIn('Something went wrong', queued_action.last_error)
+        self.assertEqual(create_queued_notifications(), 0)
+        QueuedAlertAction.objects.update(retry_after=timezone.now())
+        self.assertEqual(create_queued_notifications(), 1)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(QueuedAlertAction.objects.count(), 0)
+
+    def test_failing_action_is_dropped_after_too_many_attempts(self):
+        LoggedAction.objects.create(
+            user=self.user_who_can_lock,
+            person=self.person,
+            action_type='person-update',
+            source="test_failing_action_is_dropped_after_too_many_attempts"
+        )
+        with patch(
+                'alerts.models.create_person_notifications',
+                side_effect=ValueError('Something went wrong')
+        ):
+            for i in range(ALERT_QUEUE_MAX_ATTEMPTS - 1):
+                QueuedAlertAction.objects.update(retry_after=None)
+                self.assertEqual(create_queued_notifications(), 0)
+            self.assertEqual(
+                QueuedAlertAction.objects.get().attempts,
+                ALERT_QUEUE_MAX_ATTEMPTS - 1
+            )
+            QueuedAlertAction.objects.update(retry_after=None)
+            self.assertEqual(create_queued_notifications(), 1)
+        self.assertEqual(QueuedAlertAction.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_action_for_deleted_object_is_dropped(self):
+        LoggedAction.objects.create(
+            user=self.user_who_can_lock,
+            person=self.person,
+            action_type='person-update',
+            source="test_action_for_deleted_object_is_dropped"
+        )
+        with patch(
+                'alerts.models.create_person_notifications',
+                side_effect=Person.DoesNotExist
+        ):
+            self.assertEqual(create_queued_notifications(), 1)
+        self.assertEqual(QueuedAlertAction.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_each_notification_has_its_own_changes(self):
+        for honorific_prefix in ('Ms', 'Dr'):
+            response = self.app.get(
+                '/person/2009/update',
+                user=self.user_who_can_lock,
+            )
+            form = response.forms['person-details']
+            form['honorific_prefix'] = honorific_prefix
+            form['source'] = "test_each_notification_has_its_own_changes"
+            form.submit()
+
+        create_queued_notifications()
+
+        values = [
+            [
+                operation['value']
+                for parent_data in notification.data['changes']['diffs']
+                for operation in parent_data['parent_diff']
+                if operation['path'] == 'honorific_prefix'
+            ]
+            for notification in Notification.objects.order_by('id')
+        ]
+        self.assertEqual(values, [['Ms'], ['Dr']])
+
+    def log_changes(self, person, count):
+        for i in range(count):
+            LoggedAction.objects.create(
+                user=self.user_who_can_lock,
+                person=person,
+                action_type='person-update',
+                source="Change {0}".format(i)
+            )
+        create_queued_notifications()
+
+    def test_one_digest_for_several_alerts(self):
+        # self.user has hourly alerts for Tessa Jowell and an area:
+        self.log_changes(self.person, 2)
+
+        call_command('alerts_send_alerts', '--hourly')
+
+        self.assertEquals(len(mail.outbox), 1)
+        msg = mail.outbox[0]
+        self.assertEquals(msg.to, [self.user.email])
+        self.assertEquals(len(re.findall(r'Changes to Tessa Jowell', msg.body)), 1)
+        self.assertTrue(re.search(r'There have been 2 changes we don', msg.body))
+        for alert in (self.alert, self.alert5):
+            alert.refresh_from_db()
+            self.assertTrue(
+                alert.last_sent > datetime.now(pytz.utc) - timedelta(hours=1))
+        self.assertFalse(self.user.notifications.unread().exists())
+
+    def test_queries_do_not_depend_on_notifications(self):
+        def count_queries():
+            mail.outbox = []
+            Alert.objects.update(
+                last_sent=datetime.now(pytz.utc) - timedelta(days=2))
+            with CaptureQueriesContext(connection) as context:
+                send_digests('daily', datetime.now(pytz.utc) - timedelta(days=1))
+            self.assertEquals(len(mail.outbox), 2)
+            return len(context.captured_queries)
+
+        # Angela Smith and Martin Jones have daily alerts:
+        self.log_changes(self.person2, 1)
+        self.log_changes(Person.objects.get(name='Angela Smith'), 1)
+        few_queries = count_queries()
+        self.log_changes(self.person2, 10)
+        self.log_changes(Person.objects.get(name='Angela Smith'), 10)
+        self.assertEquals(count_queries(), few_queries)
+
+    def test_deleted_people_are_left_out(self):
+        self.log_changes(self.person, 1)
+        self.person.delete()
+
+        call_command('alerts_send_alerts', '--hourly')
+
+        self.assertEquals(len(mail.outbox), 0)
+        self.assertFalse(self.user.notifications.unread().exists())
@@ -4,10 +4,13 @@ from __future__ import unicode_literals
 import json
 
 from django import forms
+from django.utils.functional import cached_property
 from django.utils.safestring import SafeText
 from django.utils.translation import ugettext_lazy as _
 
-from candidates.views import search_person_by_name
+from popolo.models import Membership
+
+from candidates.views import search_people_by_names
 
 
 class BaseBulkAddFormSet(forms.BaseFormSet):
@@ -38,35 +41,67 @@ class BaseBulkAddFormSet(forms.BaseFormSet):
 
 
 class BaseBulkAddReviewFormSet(BaseBulkAddFormSet):
-    def suggested_people(self, person_name):
-        sqs = search_person_by_name(person_name)
-        return sqs[:5]
+    # How many people with similar names to suggest for each name:
+    suggestion_count = 5
+
+    def suggested_people(self, person_names):
+        """
+        Find similar names for every name in the formset at once
+        """
+        return search_people_by_names(person_names, self.suggestion_count)
 
-    def format_value(self, suggestion):
+    def latest_candidacies(self, person_ids):
+        """
+        Return a dict mapping each person ID to their latest candidacy
+        """
+        candidacies = {}
+        memberships = Membership.objects.filter(
+            person_id__in=person_ids,
+            extra__election__isnull=False,
+            on_behalf_of__isnull=False,
+        ).select_related('extra__election', 'on_behalf_of') \
+            .order_by('extra__election__election_date', 'id')
+        for membership in memberships:
+            candidacies[membership.person_id] = membership
+        return candidacies
+
+    def format_value(self, suggestion, candidacy=None):
         """
         Turn the whole form in to a value string
         """
         name = suggestion.name
-        try:
-            if suggestion.object.memberships.all().exists():
-                name = "<strong>{}</strong> (previously stood in the {} as a {} candidate)".format(
-                    name,
-                    suggestion.object.memberships.all().first().extra.election,
-                    suggestion.object.memberships.all().first().on_behalf_of.name,
-                )
-                name = SafeText(name)
-        except AttributeError:
-            pass
+        if candidacy is not None:
+            name = "<strong>{}</strong> (previously stood in the {} as a {} candidate)".format(
+                name,
+                candidacy.extra.election,
+                candidacy.on_behalf_of.name,
+            )
+            name = SafeText(name)
         return [suggestion.pk, name]
 
+    @cached_property
+    def forms(self):
+        forms = super(BaseBulkAddReviewFormSet, self).forms
+        names = [form['name'].value() for form in forms]
+        suggestions = self.suggested_people(names)
+        candidacies = self.latest_candidacies(set(
+            int(suggestion.pk)
+            for name_suggestions in suggestions.values()
+            for suggestion in name_suggestions
+        ))
+        for form, name in zip(forms, names):
+            form.fields['select_person'].choices += [
+                self.format_value(
+                    suggestion, candidacies.get(int(suggestion.pk)))
+                for suggestion in suggestions.get(name, [])
+            ]
+        return forms
+
     def add_fields(self, form, index):
         super(BaseBulkAddReviewFormSet, self).add_fields(form, index)
-        suggestions = self.suggested_people(form['name'].value())
-
+        # Any suggested people are added to these choices once all
+        # the forms have been constructed:
         CHOICES = [('_new', 'Add new person')]
-        if suggestions:
-            CHOICES += [self.format_value(suggestion)
-                for suggestion in suggestions]
         form.fields['select_person'] = forms.ChoiceField(
             choices=CHOICES, widget=forms.RadioSelect())
 
@@ -1,10 +1,15 @@
-import json
-
 from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
 from django_webtest import WebTest
 from popolo.models import Person
 
+from bulk_adding.forms import BulkAddReviewFormSet
+from candidates.models.search_index import update_search_index
 from candidates.tests.auth import TestUserMixin
+from candidates.tests.factories import (
+    CandidacyExtraFactory, PersonExtraFactory
+)
 
 from official_documents.models import OfficialDocument
 
@@ -95,7 +100,7 @@ class TestBulkAdding(TestUserMixin, UK2015ExamplesMixin, WebTest):
         self.assertEqual(Person.objects.count(), 1)
         homer = Person.objects.get()
         self.assertEqual(homer.name, 'Homer Simpson')
-        homer_versions = json.loads(homer.extra.versions)
+        homer_versions = homer.extra.versions
         self.assertEqual(len(homer_versions), 2)
         self.assertEqual(
             homer_versions[0]['information_source'],
@@ -111,3 +116,55 @@ class TestBulkAdding(TestUserMixin, UK2015ExamplesMixin, WebTest):
         self.assertEqual(
             membership.post.label,
             'Member of Parliament for Dulwich and West Norwood')
+
+
+@attr(country='uk')
+@override_settings(SEARCH_BACKEND='database')
+class TestBulkAddReviewSuggestions(UK2015ExamplesMixin, TestCase):
+
+    def setUp(self):
+        super(TestBulkAddReviewSuggestions, self).setUp()
+        tessa = PersonExtraFactory.create(
+            base__id=2009, base__name='Tessa Jowell').base
+        PersonExtraFactory.create(base__id=2010, base__name='Tessa Smith')
+        PersonExtraFactory.create(base__id=2011, base__name='Frank Dobson')
+        for election, party_extra in (
+                (self.election, self.green_party_extra),
+                (self.earlier_election, self.labour_party_extra),
+        ):
+            CandidacyExtraFactory.create(
+                election=election,
+                base__person=tessa,
+                base__post=self.dulwich_post_extra.base,
+                base__on_behalf_of=party_extra.base
+            )
+        update_search_index()
+
+    def get_choices(self, names):
+        formset = BulkAddReviewFormSet(
+            initial=[{'name': name} for name in names], parties=[])
+        # One query to search for all the names, one to fetch the
+        # people found and one for their latest candidacies:
+        with self.assertNumQueries(3):
+            forms = formset.forms
+        return [form.fields['select_person'].choices for form in forms]
+
+    def test_suggestions(self):
+        self.assertEqual(
+            self.get_choices(['Tessa', 'Homer Simpson', 'Frank']),
+            [
+                [
+                    ('_new', 'Add new person'),
+                    [2009, '<strong>Tessa Jowell</strong> (previously stood '
+                           'in the 2015 General Election as a Green Party '
+                           'candidate)'],
+                    [2010, 'Tessa Smith'],
+                ],
+                [('_new', 'Add new person')],
+                [('_new', 'Add new person'), [2011, 'Frank Dobson']],
+            ]
+        )
+
+    def test_query_count_does_not_depend_on_rows(self):
+        names = ['Tessa Jowell', 'Frank Dobson', 'Homer Simpson'] * 20
+        self.assertEqual(len(self.get_choices(names)), 60)
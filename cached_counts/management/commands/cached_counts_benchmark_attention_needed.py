@@ -0,0 +1,195 @@
+from __future__ import division, print_function, unicode_literals
+
+from datetime import date
+from random import Random
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from popolo.models import Organization, Post
+
+from candidates.models import PostExtra, PostExtraElection
+from elections.models import Election
+
+from cached_counts.models import (
+    PostCount, get_attention_needed_posts, invalidate_attention_needed
+)
+
+SLUG_PREFIX = 'attention-needed-benchmark-'
+
+# The query that get_attention_needed_posts(random=True) used to make,
+# sorting every current post-election, to compare the sampler with:
+ORDER_BY_RANDOM_QUERY = '''
+SELECT pe.slug, p.label, ee.name, ee.slug, COALESCE(pc.count, 0) AS count
+  FROM popolo_post p
+    INNER JOIN candidates_postextra pe ON pe.base_id = p.id
+    INNER JOIN candidates_postextraelection cppee ON cppee.postextra_id = pe.id
+    INNER JOIN elections_election ee ON cppee.election_id = ee.id
+    LEFT OUTER JOIN cached_counts_postcount pc
+      ON pc.post_id = p.id AND pc.election_id = ee.id
+    WHERE ee.current = TRUE
+  ORDER BY count, random() LIMIT %s'''
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+
+    help = "Time picking posts that need attention for lots of made-up posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--post-elections',
+            type=int,
+            default=30000,
+            help='The number of current post-elections to make up'
+        )
+        parser.add_argument(
+            '--max-candidates',
+            type=int,
+            default=8,
+            help='The most candidates a made-up post can have'
+        )
+        parser.add_argument(
+            '--results',
+            type=int,
+            default=5,
+            help='How many posts to pick each time'
+        )
+        parser.add_argument(
+            '--repeats',
+            type=int,
+            default=20,
+            help='How many times to pick posts in each way'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='The seed for making up candidate counts'
+        )
+
+    def create_test_data(self, options):
+        random = Random(options['seed'])
+        organization = Organization.objects.create(
+            name='Attention needed benchmark council')
+        election = Election.objects.create(
+            slug=SLUG_PREFIX + 'election',
+            for_post_role='Councillor',
+            candidate_membership_role='Candidate',
+            election_date=date.today(),
+            name='Attention needed benchmark election',
+            current=True,
+            organization=organization,
+        )
+        Post.objects.bulk_create(
+            [
+                Post(
+                    label='Benchmark ward {0}'.format(i),
+                    role='Councillor',
+                    organization=organization,
+                )
+                for i in range(options['post_elections'])
+            ],
+            batch_size=1000
+        )
+        post_ids = list(
+            Post.objects.filter(organization=organization)
+            .values_list('id', flat=True)
+        )
+        PostExtra.objects.bulk_create(
+            [
+                PostExtra(base_id=post_id, slug=SLUG_PREFIX + str(post_id))
+                for post_id in post_ids
+            ],
+            batch_size=1000
+        )
+        PostExtraElection.objects.bulk_create(
+            [
+                PostExtraElection(postextra_id=post_extra_id, election=election)
+                for post_extra_id in PostExtra.objects.filter(
+                    base__organization=organization
+                ).values_list('id', flat=True)
+            ],
+            batch_size=1000
+        )
+        post_counts = []
+        for post_id in post_ids:
+            count = random.randint(0, options['max_candidates'])
+            # As with real posts, there's no PostCount if there are
+            # no candidates:
+            if count:
+                post_counts.append(
+                    PostCount(election=election, post_id=post_id, count=count))
+        PostCount.objects.bulk_create(post_counts, batch_size=1000)
+        # bulk_create doesn't send any signals:
+        invalidate_attention_needed()
+
+    def time_repeats(self, pick, before=None):
+        times = []
+        for i in range(self.options['repeats']):
+            if before is not None:
+                before()
+            start = default_timer()
+            pick()
+            times.append((default_timer() - start) * 1000)
+        return sorted(times)
+
+    def pick_with_order_by_random(self):
+        cursor = connection.cursor()
+        cursor.execute(ORDER_BY_RANDOM_QUERY, [self.options['results']])
+        return cursor.fetchall()
+
+    def pick_with_sampler(self):
+        return get_attention_needed_posts(
+            self.options['results'], random=True)
+
+    def handle(self, *args, **options):
+        self.options = options
+        # The sampler's buckets are only cached if the cache stores
+        # anything:
+        caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }
+        }
+        try:
+            with transaction.atomic(), override_settings(CACHES=caches):
+                self.create_test_data(options)
+                # Warm up Postgres's caches before timing anything:
+                self.pick_with_order_by_random()
+                timings = [
+                    (
+                        'ORDER BY count, random()',
+                        self.time_repeats(self.pick_with_order_by_random),
+                    ),
+                    (
+                        'sampler, rebuilding its buckets',
+                        self.time_repeats(
+                            self.pick_with_sampler,
+                            before=invalidate_attention_needed
+                        ),
+                    ),
+                    (
+                        'sampler, with cached buckets',
+                        self.time_repeats(self.pick_with_sampler),
+                    ),
+                ]
+                for name, times in timings:
+                    print(
+                        '{0}: mean {1:.1f}ms, median {2:.1f}ms, '
+                        'max {3:.1f}ms'.format(
+                            name,
+                            sum(times) / len(times),
+                            times[len(times) // 2],
+                            times[-1],
+                        )
+                    )
+                # Don't leave any of the made-up data behind:
+                raise Rollback()
+        except Rollback:
+            pass
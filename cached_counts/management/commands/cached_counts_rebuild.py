@@ -0,0 +1,24 @@
+from __future__ import print_function, unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from elections.models import Election
+
+from cached_counts.models import rebuild_counts
+
+
+class Command(BaseCommand):
+
+    help = "Recalculate the cached numbers of candidates per post and party"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election',
+            help='Only recalculate the counts for the election with this slug'
+        )
+
+    def handle(self, *args, **options):
+        election = None
+        if options['election']:
+            election = Election.objects.get(slug=options['election'])
+        rebuild_counts(election)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popolo', '0002_update_models_from_upstream'),
+        ('elections', '0012_election_people_elected_per_post'),
+        ('cached_counts', '0005_delete_cachedcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartyCount',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('count', models.IntegerField(default=0)),
+                ('election', models.ForeignKey(related_name='+', to='elections.Election')),
+                ('party', models.ForeignKey(related_name='+', to='popolo.Organization')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostCount',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('count', models.IntegerField(default=0)),
+                ('election', models.ForeignKey(related_name='+', to='elections.Election')),
+                ('post', models.ForeignKey(related_name='+', to='popolo.Post')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='postcount',
+            unique_together=set([('election', 'post')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='partycount',
+            unique_together=set([('election', 'party')]),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count, F
+
+
+def populate_counts(apps, schema_editor):
+    Membership = apps.get_model('popolo', 'Membership')
+    PostCount = apps.get_model('cached_counts', 'PostCount')
+    PartyCount = apps.get_model('cached_counts', 'PartyCount')
+    PostCount.objects.bulk_create([
+        PostCount(
+            election_id=row['extra__election'],
+            post_id=row['post'],
+            count=row['count'],
+        )
+        for row in Membership.objects.filter(
+            role=F('extra__election__candidate_membership_role'),
+            post__isnull=False,
+        ).values('extra__election', 'post')
+        .annotate(count=Count('pk')).order_by()
+    ])
+    PartyCount.objects.bulk_create([
+        PartyCount(
+            election_id=row['extra__election'],
+            party_id=row['on_behalf_of'],
+            count=row['count'],
+        )
+        for row in Membership.objects.filter(
+            extra__election__isnull=False,
+            on_behalf_of__isnull=False,
+        ).values('extra__election', 'on_behalf_of')
+        .annotate(count=Count('pk')).order_by()
+    ])
+
+
+def delete_counts(apps, schema_editor):
+    apps.get_model('cached_counts', 'PostCount').objects.all().delete()
+    apps.get_model('cached_counts', 'PartyCount').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0041_person_version_cached_diffs'),
+        ('cached_counts', '0006_post_count_party_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_counts, delete_counts),
+    ]
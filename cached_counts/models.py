@@ -1,38 +1,249 @@
-# There a no models needed by this application any more.
-
 from __future__ import unicode_literals
 
-from django.db import connection
+from random import sample as random_sample
+
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import Count, F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+
+from candidates.cache import get_cache_version, invalidate_cache_version
+from candidates.models import MembershipExtra, PostExtraElection
+from elections.models import Election
+from popolo.models import Membership, Organization, Post
+
+
+ATTENTION_NEEDED_VERSION_CACHE_KEY = 'attention_needed_version'
+
+# How long the post-elections grouped by candidate count are cached
+# for.  Candidacies change far too often to rebuild the groups every
+# time, so the posts picked as needing attention may be this out of
+# date (though the counts shown for them aren't):
+ATTENTION_NEEDED_BUCKETS_TIMEOUT = 60
+
+
+class PostCount(models.Model):
+    """The number of candidates standing for a post in an election
+
+    These rows (and those of PartyCount) are kept up to date as
+    candidacies are saved and deleted; if they're ever changed without
+    sending signals, run the cached_counts_rebuild command."""
+
+    election = models.ForeignKey(Election, related_name='+')
+    post = models.ForeignKey(Post, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('election', 'post')
+
+
+class PartyCount(models.Model):
+    """The number of candidates standing for a party in an election"""
+
+    election = models.ForeignKey(Election, related_name='+')
+    party = models.ForeignKey(Organization, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('election', 'party')
+
+
+def get_post_counts_queryset(election=None):
+    qs = Membership.objects.filter(
+        role=F('extra__election__candidate_membership_role'),
+        post__isnull=False,
+    )
+    if election is not None:
+        qs = qs.filter(extra__election=election)
+    return qs.values('extra__election', 'post') \
+        .annotate(count=Count('pk')).order_by()
+
+
+def get_party_counts_queryset(election=None):
+    qs = Membership.objects.filter(
+        extra__election__isnull=False,
+        on_behalf_of__isnull=False,
+    )
+    if election is not None:
+        qs = qs.filter(extra__election=election)
+    return qs.values('extra__election', 'on_behalf_of') \
+        .annotate(count=Count('pk')).order_by()
+
+
+@transaction.atomic
+def rebuild_counts(election=None):
+    """Recalculate every PostCount and PartyCount (or just an election's)"""
+    post_counts = PostCount.objects.all()
+    party_counts = PartyCount.objects.all()
+    if election is not None:
+        post_counts = post_counts.filter(election=election)
+        party_counts = party_counts.filter(election=election)
+    post_counts.delete()
+    party_counts.delete()
+    PostCount.objects.bulk_create([
+        PostCount(
+            election_id=row['extra__election'],
+            post_id=row['post'],
+            count=row['count'],
+        )
+        for row in get_post_counts_queryset(election)
+    ])
+    PartyCount.objects.bulk_create([
+        PartyCount(
+            election_id=row['extra__election'],
+            party_id=row['on_behalf_of'],
+            count=row['count'],
+        )
+        for row in get_party_counts_queryset(election)
+    ])
+    # bulk_create doesn't send any signals:
+    invalidate_attention_needed()
+
+
+def get_count_keys(membership_id):
+    """Return the counts that a membership currently contributes to
+
+    This is a set of ('post', election_id, post_id) and ('party',
+    election_id, party_id) tuples, based on what's in the database."""
+    result = set()
+    for election_id, post_id, party_id in Membership.objects \
+            .filter(pk=membership_id, extra__election__isnull=False) \
+            .values_list('extra__election', 'post', 'on_behalf_of'):
+        if post_id is not None:
+            result.add(('post', election_id, post_id))
+        if party_id is not None:
+            result.add(('party', election_id, party_id))
+    return result
+
+
+def recount(keys):
+    for count_type, election_id, object_id in keys:
+        if count_type == 'post':
+            model = PostCount
+            kwargs = {'election_id': election_id, 'post_id': object_id}
+            count = Membership.objects.filter(
+                role=F('extra__election__candidate_membership_role'),
+                extra__election_id=election_id,
+                post_id=object_id,
+            ).count()
+        else:
+            model = PartyCount
+            kwargs = {'election_id': election_id, 'party_id': object_id}
+            count = Membership.objects.filter(
+                extra__election_id=election_id,
+                on_behalf_of_id=object_id,
+            ).count()
+        if count:
+            model.objects.update_or_create(defaults={'count': count}, **kwargs)
+        else:
+            model.objects.filter(**kwargs).delete()
+
+
+def get_attention_needed_buckets():
+    """Return the IDs of current post-elections grouped by candidate count
+
+    This is a dict mapping each number of candidates to a list of the
+    IDs of the PostExtraElection objects in current elections with
+    that many candidates.  It's cached for
+    ATTENTION_NEEDED_BUCKETS_TIMEOUT seconds, or until the set of
+    current post-elections changes."""
+    version = get_cache_version(ATTENTION_NEEDED_VERSION_CACHE_KEY)
+    cache_key = 'attention_needed_buckets:{0}'.format(version)
+    if version is not None:
+        buckets = cache.get(cache_key)
+        if buckets is not None:
+            return buckets
+    cursor = connection.cursor()
+    cursor.execute('''
+SELECT COALESCE(pc.count, 0) AS count, array_agg(cppee.id)
+  FROM candidates_postextraelection cppee
+    INNER JOIN candidates_postextra pe ON cppee.postextra_id = pe.id
+    INNER JOIN elections_election ee ON cppee.election_id = ee.id
+    LEFT OUTER JOIN cached_counts_postcount pc
+      ON pc.post_id = pe.base_id AND pc.election_id = ee.id
+  WHERE ee.current = TRUE
+  GROUP BY COALESCE(pc.count, 0)
+    ''')
+    buckets = dict(cursor.fetchall())
+    if version is not None:
+        cache.set(cache_key, buckets, ATTENTION_NEEDED_BUCKETS_TIMEOUT)
+    return buckets
+
+
+def sample_attention_needed_post_elections(max_results=None):
+    """Pick current post-elections with the fewest candidates
+
+    This returns a list of (PostExtraElection ID, count) tuples, with
+    the lowest counts first and those with the same count in a random
+    order, as ORDER BY count, random() would; but rather than sorting
+    every post-election it just draws from the lowest buckets."""
+    buckets = get_attention_needed_buckets()
+    result = []
+    for count in sorted(buckets):
+        post_extra_election_ids = buckets[count]
+        wanted = len(post_extra_election_ids)
+        if max_results is not None:
+            wanted = min(wanted, max_results - len(result))
+        result += [
+            (post_extra_election_id, count)
+            for post_extra_election_id
+            in random_sample(post_extra_election_ids, wanted)
+        ]
+        if max_results is not None and len(result) >= max_results:
+            break
+    return result
 
 
 def get_attention_needed_posts(max_results=None, random=False):
     from candidates.election_specific import shorten_post_label
     cursor = connection.cursor()
-    # This is similar to the query in ConstituencyCountsView,
-    # except it's not specific to a particular election and the
-    # results are ordered with fewest candidates first:
-    query = '''
-SELECT pe.slug, p.label, ee.name, ee.slug, count(m.id) as count
+    if random:
+        sampled = sample_attention_needed_post_elections(max_results)
+        if not sampled:
+            return []
+        # The buckets may be a little out of date, so get the current
+        # counts too:
+        cursor.execute('''
+SELECT cppee.id, pe.slug, p.label, ee.name, ee.slug,
+    COALESCE(pc.count, 0) AS count
+  FROM candidates_postextraelection cppee
+    INNER JOIN candidates_postextra pe ON cppee.postextra_id = pe.id
+    INNER JOIN popolo_post p ON pe.base_id = p.id
+    INNER JOIN elections_election ee ON cppee.election_id = ee.id
+    LEFT OUTER JOIN cached_counts_postcount pc
+      ON pc.post_id = p.id AND pc.election_id = ee.id
+  WHERE cppee.id IN %s
+        ''', [tuple(pee_id for pee_id, count in sampled)])
+        id_to_row = {row[0]: row[1:] for row in cursor.fetchall()}
+        rows = sorted(
+            (
+                id_to_row[pee_id]
+                for pee_id, count in sampled
+                # In case it's been deleted since the buckets were cached:
+                if pee_id in id_to_row
+            ),
+            key=lambda row: row[-1]
+        )
+    else:
+        # This is similar to the query in ConstituencyCountsView,
+        # except it's not specific to a particular election and the
+        # results are ordered with fewest candidates first:
+        query = '''
+SELECT pe.slug, p.label, ee.name, ee.slug, COALESCE(pc.count, 0) AS count
   FROM popolo_post p
     INNER JOIN candidates_postextra pe ON pe.base_id = p.id
     INNER JOIN candidates_postextraelection cppee ON cppee.postextra_id = pe.id
     INNER JOIN elections_election ee ON cppee.election_id = ee.id
-    LEFT OUTER JOIN
-      (popolo_membership m
-        INNER JOIN candidates_membershipextra me
-        ON me.base_id = m.id)
-      ON m.role = ee.candidate_membership_role AND m.post_id = p.id AND
-         me.election_id = ee.id
+    LEFT OUTER JOIN cached_counts_postcount pc
+      ON pc.post_id = p.id AND pc.election_id = ee.id
     WHERE ee.current = TRUE
-  GROUP BY pe.slug, p.label, ee.slug, ee.name
-  ORDER BY'''
-    if random:
-        query += ' count, random()'
-    else:
-        query += ' count, ee.name, p.label'
-    if max_results is not None:
-        query += ' LIMIT {limit}'.format(limit=max_results)
-    cursor.execute(query)
+  ORDER BY count, ee.name, p.label'''
+        if max_results is not None:
+            query += ' LIMIT {limit}'.format(limit=max_results)
+        cursor.execute(query)
+        rows = cursor.fetchall()
     return [
         {
             'post_slug': row[0],
@@ -42,5 +253,57 @@ SELECT pe.slug, p.label, ee.name, ee.slug, count(m.id) as count
             'count': row[4],
             'post_short_label': shorten_post_label(row[1]),
         }
-        for row in cursor.fetchall()
+        for row in rows
     ]
+
+
+def get_membership_id(sender, instance):
+    if sender is MembershipExtra:
+        return instance.base_id
+    return instance.pk
+
+
+def remember_count_keys(sender, instance, **kwargs):
+    # Note which counts this candidacy contributed to before it
+    # changes, so that those can be updated too:
+    membership_id = get_membership_id(sender, instance)
+    if membership_id is None:
+        instance._count_keys_before = set()
+    else:
+        instance._count_keys_before = get_count_keys(membership_id)
+
+
+def update_counts_after_save(sender, instance, **kwargs):
+    keys = getattr(instance, '_count_keys_before', set())
+    keys |= get_count_keys(get_membership_id(sender, instance))
+    recount(keys)
+
+
+def update_counts_after_delete(sender, instance, **kwargs):
+    recount(getattr(instance, '_count_keys_before', set()))
+
+
+def update_counts_for_election(sender, instance, created, **kwargs):
+    # Which memberships are candidacies depends on the election's
+    # candidate_membership_role:
+    if not created:
+        rebuild_counts(instance)
+
+
+def invalidate_attention_needed(sender=None, **kwargs):
+    invalidate_cache_version(ATTENTION_NEEDED_VERSION_CACHE_KEY)
+
+
+pre_save.connect(remember_count_keys, sender=Membership)
+pre_save.connect(remember_count_keys, sender=MembershipExtra)
+pre_delete.connect(remember_count_keys, sender=Membership)
+pre_delete.connect(remember_count_keys, sender=MembershipExtra)
+post_save.connect(update_counts_after_save, sender=Membership)
+post_save.connect(update_counts_after_save, sender=MembershipExtra)
+post_delete.connect(update_counts_after_delete, sender=Membership)
+post_delete.connect(update_counts_after_delete, sender=MembershipExtra)
+post_save.connect(update_counts_for_election, sender=Election)
+post_save.connect(invalidate_attention_needed, sender=PostExtraElection)
+post_delete.connect(invalidate_attention_needed, sender=PostExtraElection)
+post_save.connect(invalidate_attention_needed, sender=Election)
+post_delete.connect(invalidate_attention_needed, sender=Election)
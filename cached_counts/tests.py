@@ -4,15 +4,23 @@ from __future__ import unicode_literals
 
 import json
 
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test.utils import override_settings
 from django_webtest import WebTest
 
-from popolo.models import Person
+from popolo.models import Membership, Person
 
 from candidates.tests import factories
 from candidates.tests.uk_examples import UK2015ExamplesMixin
 
 from compat import text_type
 
+from .models import (
+    PartyCount, PostCount, get_attention_needed_posts,
+    invalidate_attention_needed, rebuild_counts
+)
+
 
 class CachedCountTestCase(UK2015ExamplesMixin, WebTest):
     maxDiff = None
@@ -196,3 +204,134 @@ class CachedCountTestCase(UK2015ExamplesMixin, WebTest):
                  '<td>3</td>'),
             ]
         )
+
+    def get_all_counts(self):
+        return (
+            sorted(
+                PostCount.objects.values_list('election', 'post', 'count')),
+            sorted(
+                PartyCount.objects.values_list('election', 'party', 'count')),
+        )
+
+    def assertCountsMatchRebuild(self):
+        counts = self.get_all_counts()
+        rebuild_counts()
+        self.assertEqual(counts, self.get_all_counts())
+
+    def test_counts_updated_incrementally(self):
+        self.assertEqual(
+            PostCount.objects.get(
+                election=self.election,
+                post=self.edinburgh_east_post_extra.base).count,
+            10
+        )
+        membership = Membership.objects.get(
+            person_id=7000, extra__election=self.election)
+        # Move a candidacy to a different post and party:
+        membership.post = self.camberwell_post_extra.base
+        membership.on_behalf_of = self.sinn_fein_extra.base
+        membership.save()
+        self.assertEqual(
+            PostCount.objects.get(
+                election=self.election,
+                post=self.edinburgh_east_post_extra.base).count,
+            9
+        )
+        self.assertEqual(
+            PostCount.objects.get(
+                election=self.election,
+                post=self.camberwell_post_extra.base).count,
+            1
+        )
+        self.assertEqual(
+            PartyCount.objects.get(
+                election=self.election,
+                party=self.sinn_fein_extra.base).count,
+            4
+        )
+        self.assertCountsMatchRebuild()
+        # Now move it to the earlier election:
+        membership.extra.election = self.earlier_election
+        membership.extra.save()
+        self.assertFalse(
+            PostCount.objects.filter(
+                election=self.election,
+                post=self.camberwell_post_extra.base).exists()
+        )
+        self.assertCountsMatchRebuild()
+        # ... and delete it:
+        membership.delete()
+        self.assertCountsMatchRebuild()
+        response = self.app.get('/numbers/')
+        earlier_div = response.html.find(
+            'div', {'id': 'statistics-election-2010'}
+        )
+        self.assertIn('Total candidates: 2', str(earlier_div))
+
+    def test_rebuild_command(self):
+        counts = self.get_all_counts()
+        PostCount.objects.all().delete()
+        PartyCount.objects.filter(election=self.earlier_election).delete()
+        call_command('cached_counts_rebuild', election='2010')
+        self.assertEqual(counts[1], self.get_all_counts()[1])
+        call_command('cached_counts_rebuild')
+        self.assertEqual(counts, self.get_all_counts())
+
+    def test_attention_needed_random_sample(self):
+        posts = get_attention_needed_posts(random=True)
+        self.assertEqual(
+            [(p['post_slug'], p['count']) for p in posts],
+            [('65913', 0), ('14420', 3), ('65808', 5), ('14419', 10)]
+        )
+        posts = get_attention_needed_posts(2, random=True)
+        self.assertEqual(
+            [(p['post_slug'], p['count']) for p in posts],
+            [('65913', 0), ('14420', 3)]
+        )
+        self.assertEqual(
+            posts[0]['post_label'],
+            'Member of Parliament for Camberwell and Peckham'
+        )
+        self.assertEqual(posts[0]['election_slug'], '2015')
+
+    def test_attention_needed_random_sample_ties(self):
+        Membership.objects.filter(
+            post=self.edinburgh_north_post_extra.base,
+            extra__election=self.election,
+        ).delete()
+        sampled = set()
+        for i in range(50):
+            posts = get_attention_needed_posts(1, random=True)
+            self.assertEqual(posts[0]['count'], 0)
+            sampled.add(posts[0]['post_slug'])
+        self.assertEqual(sampled, {'65913', '14420'})
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+    def test_attention_needed_buckets_cached(self):
+        cache.clear()
+        get_attention_needed_posts(2, random=True)
+        with self.assertNumQueries(1):
+            get_attention_needed_posts(2, random=True)
+        # Removing the candidates for a post doesn't change its bucket
+        # until the buckets expire, but the counts are current:
+        Membership.objects.filter(
+            post=self.edinburgh_east_post_extra.base,
+            extra__election=self.election,
+        ).delete()
+        with self.assertNumQueries(1):
+            posts = get_attention_needed_posts(2, random=True)
+        self.assertEqual(
+            [(p['post_slug'], p['count']) for p in posts],
+            [('65913', 0), ('14420', 3)]
+        )
+        # As if the cached buckets had expired:
+        invalidate_attention_needed()
+        posts = get_attention_needed_posts(2, random=True)
+        self.assertEqual(
+            sorted((p['post_slug'], p['count']) for p in posts),
+            [('14419', 0), ('65913', 0)]
+        )
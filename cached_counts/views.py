@@ -3,26 +3,24 @@ from __future__ import unicode_literals
 import json
 
 from django.db import connection
-from django.db.models import Count, F
+from django.db.models import Sum
 from django.http import HttpResponse
 
 from django.views.generic import TemplateView
 
-from candidates.models import MembershipExtra
 from elections.mixins import ElectionMixin
 from elections.models import Election
-from popolo.models import Membership, Person
 
-from .models import get_attention_needed_posts
+from .models import PostCount, get_attention_needed_posts
 
 
 def get_counts(for_json=True):
     election_id_to_candidates = {
-        d['extra__election']: d['count']
-        for d in Membership.objects \
-            .filter(role=F('extra__election__candidate_membership_role')) \
-            .values('extra__election') \
-            .annotate(count=Count('extra__election'))
+        d['election']: d['count']
+        for d in PostCount.objects \
+            .values('election') \
+            .annotate(count=Sum('count')) \
+            .order_by()
     }
     grouped_elections = Election.group_and_order_elections(for_json=for_json)
     for era_data in grouped_elections:
@@ -66,16 +64,12 @@ class PartyCountsView(ElectionMixin, TemplateView):
         context = super(PartyCountsView, self).get_context_data(**kwargs)
         cursor = connection.cursor()
         cursor.execute('''
-SELECT oe.slug, o.name, count(m.id) AS count
+SELECT oe.slug, o.name, COALESCE(pc.count, 0) AS count
   FROM popolo_organization o
     INNER JOIN candidates_organizationextra oe ON o.id = oe.base_id
-    LEFT OUTER JOIN
-      (popolo_membership m
-        INNER JOIN candidates_membershipextra me ON me.base_id = m.id
-        INNER JOIN elections_election ee ON me.election_id = ee.id AND ee.id = %s)
-      ON o.id = m.on_behalf_of_id
+    LEFT OUTER JOIN cached_counts_partycount pc
+      ON pc.party_id = o.id AND pc.election_id = %s
   WHERE o.classification = 'Party'
-  GROUP BY oe.slug, o.name
   ORDER BY count DESC, o.name;
         ''', [self.election_data.id])
         context['party_counts'] = [
@@ -97,18 +91,13 @@ class ConstituencyCountsView(ElectionMixin, TemplateView):
         context = super(ConstituencyCountsView, self).get_context_data(**kwargs)
         cursor = connection.cursor()
         cursor.execute('''
-SELECT pe.slug, p.label, count(m.id) as count
+SELECT pe.slug, p.label, COALESCE(pc.count, 0) AS count
   FROM popolo_post p
     INNER JOIN candidates_postextra pe ON pe.base_id = p.id
-    INNER JOIN candidates_postextraelection cppee ON cppee.postextra_id = pe.id
-    INNER JOIN elections_election ee ON cppee.election_id = ee.id AND ee.id = %s
-    LEFT OUTER JOIN
-      (popolo_membership m
-        INNER JOIN candidates_membershipextra me
-        ON me.base_id = m.id)
-      ON m.role = ee.candidate_membership_role AND m.post_id = p.id AND
-         me.election_id = ee.id
-  GROUP BY pe.slug, p.label
+    INNER JOIN candidates_postextraelection cppee
+      ON cppee.postextra_id = pe.id AND cppee.election_id = %s
+    LEFT OUTER JOIN cached_counts_postcount pc
+      ON pc.post_id = p.id AND pc.election_id = cppee.election_id
   ORDER BY count DESC;
         ''', [self.election_data.id])
         context['post_counts'] = [
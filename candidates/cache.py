@@ -0,0 +1,23 @@
+from __future__ import unicode_literals
+
+from uuid import uuid4
+
+from django.core.cache import cache
+
+
+def get_cache_version(key):
+    """Return the current version token stored in the cache under key
+
+    Anything cached that depends on data which may change can include
+    this token in its cache key (or store it alongside the data), so
+    that it's all invalidated at once by invalidate_cache_version.
+    This returns None if the cache isn't storing anything."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_cache_version(key):
+    cache.set(key, uuid4().hex)
@@ -1,9 +1,37 @@
 from __future__ import unicode_literals
 
+import heapq
+from tempfile import TemporaryFile
+
+from django.utils.six.moves import cPickle as pickle
+
 from compat import BufferDictWriter
 from .models import CSV_ROW_FIELDS
 
 
+# The number of rows that SortedRowSpool will hold in memory before
+# sorting them and writing them out to a temporary file:
+SORT_CHUNK_SIZE = 5000
+
+# The total number of rows that all the spools in a SortedRowSpools
+# object may hold in memory between them:
+SORT_MEMORY_BUDGET = 4 * SORT_CHUNK_SIZE
+
+# SortedRowSpools won't write out a spool's buffer to keep within its
+# memory budget until it holds at least this many rows, so that lots
+# of spools with a few rows each don't make lots of tiny temporary
+# files:
+SORT_MIN_RUN_SIZE = SORT_CHUNK_SIZE // 10
+
+# Once a SortedRowSpool has more than this many temporary files, they
+# are merged into one, to limit the number of open files:
+SORT_MAX_RUNS = 16
+
+# How many rows to render into the CSV writer's buffer before writing
+# that out to the output file:
+WRITE_CHUNK_SIZE = 500
+
+
 def _candidate_sort_by_name_key(row):
     return (
         row['name'].split()[-1],
@@ -25,15 +53,207 @@ def _candidate_sort_by_post_key(row):
     )
 
 
-def list_to_csv(candidates_list, group_by_post=False):
+def get_csv_fieldnames():
     from .election_specific import EXTRA_CSV_ROW_FIELDS
-    csv_fields = CSV_ROW_FIELDS + EXTRA_CSV_ROW_FIELDS
-    writer = BufferDictWriter(fieldnames=csv_fields)
-    writer.writeheader()
+    return CSV_ROW_FIELDS + EXTRA_CSV_ROW_FIELDS
+
+
+def get_sort_key(group_by_post=False):
     if group_by_post:
-        sorted_rows = sorted(candidates_list, key=_candidate_sort_by_post_key)
-    else:
-        sorted_rows = sorted(candidates_list, key=_candidate_sort_by_name_key)
+        return _candidate_sort_by_post_key
+    return _candidate_sort_by_name_key
+
+
+def list_to_csv(candidates_list, group_by_post=False):
+    writer = BufferDictWriter(fieldnames=get_csv_fieldnames())
+    writer.writeheader()
+    sorted_rows = sorted(candidates_list, key=get_sort_key(group_by_post))
     for row in sorted_rows:
         writer.writerow(row)
     return writer.output
+
+
+def _flush_writer(writer, output_file):
+    output_file.write(writer.output.encode('utf-8'))
+    writer.f.seek(0)
+    writer.f.truncate()
+
+
+def write_csv(rows, output_file):
+    """Write an iterable of row dicts as CSV to a binary file object
+
+    Unlike list_to_csv, this doesn't sort the rows, and only ever
+    holds WRITE_CHUNK_SIZE rendered rows in memory at once."""
+
+    writer = BufferDictWriter(fieldnames=get_csv_fieldnames())
+    writer.writeheader()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % WRITE_CHUNK_SIZE == 0:
+            _flush_writer(writer, output_file)
+    _flush_writer(writer, output_file)
+
+
+def _read_run(run_file):
+    while True:
+        try:
+            yield pickle.load(run_file)
+        except EOFError:
+            return
+
+
+class SortedRowSpool(object):
+    """Collect CSV row dicts and iterate over them in sorted order
+
+    This is an external merge sort: rows are buffered in memory until
+    there are chunk_size of them, at which point the buffer is sorted
+    and pickled to a temporary file. Iterating over the spool then
+    merges those sorted runs, so memory use depends on chunk_size
+    rather than on the total number of rows added. The ordering is the
+    same (and just as stable) as that of list_to_csv.
+
+    If the rows are being split between several spools (e.g. in
+    different processes) and their output merged with
+    merge_sorted_files, 'part' should be the position of this spool's
+    rows in the original order, so that ties are broken in the same
+    way.
+
+    If there are ever more than max_runs sorted runs on disk, they are
+    merged into a single run."""
+
+    def __init__(self, group_by_post=False, chunk_size=SORT_CHUNK_SIZE,
+                 part=0, max_runs=SORT_MAX_RUNS):
+        self.key = get_sort_key(group_by_post)
+        self.chunk_size = chunk_size
+        self.part = part
+        self.max_runs = max_runs
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, row):
+        # The part and insertion index mean that rows with equal sort
+        # keys are never compared with each other, and keep their
+        # order:
+        self.buffer.append((self.key(row), self.part, self.count, row))
+        self.count += 1
+        if len(self.buffer) >= self.chunk_size:
+            self.spill()
+
+    def spill(self):
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        run_file = TemporaryFile()
+        for item in self.buffer:
+            pickle.dump(item, run_file, pickle.HIGHEST_PROTOCOL)
+        run_file.seek(0)
+        self.runs.append(run_file)
+        self.buffer = []
+        if len(self.runs) > self.max_runs:
+            self.merge_runs()
+
+    def merge_runs(self):
+        merged_file = TemporaryFile()
+        sorted_runs = [_read_run(run_file) for run_file in self.runs]
+        for item in heapq.merge(*sorted_runs):
+            pickle.dump(item, merged_file, pickle.HIGHEST_PROTOCOL)
+        merged_file.seek(0)
+        for run_file in self.runs:
+            run_file.close()
+        self.runs = [merged_file]
+
+    def sorted_items(self):
+        self.buffer.sort()
+        for run_file in self.runs:
+            run_file.seek(0)
+        sorted_runs = [_read_run(run_file) for run_file in self.runs]
+        sorted_runs.append(iter(self.buffer))
+        return heapq.merge(*sorted_runs)
+
+    def __iter__(self):
+        for item in self.sorted_items():
+            yield item[-1]
+
+    def save_sorted(self, output_file):
+        """Write every row, in order, to output_file for merge_sorted_files"""
+        for item in self.sorted_items():
+            pickle.dump(item, output_file, pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        for run_file in self.runs:
+            run_file.close()
+        self.runs = []
+        self.buffer = []
+
+
+def merge_sorted_files(filenames):
+    """Generate the rows from files written by SortedRowSpool.save_sorted
+
+    The rows come out in the same order as if they had all been added
+    to a single spool."""
+
+    run_files = [open(filename, 'rb') for filename in filenames]
+    try:
+        sorted_runs = [_read_run(run_file) for run_file in run_files]
+        for item in heapq.merge(*sorted_runs):
+            yield item[-1]
+    finally:
+        for run_file in run_files:
+            run_file.close()
+
+
+class SortedRowSpools(object):
+    """A collection of SortedRowSpool objects that share a memory budget
+
+    This is for when many output files are being generated at once: if
+    the spools between them are holding more than max_buffered_rows
+    rows in memory, the spool with the largest buffer is written out
+    to disk. That only happens once its buffer holds min_run_size
+    rows, though, so with lots of spools the rows held in memory may
+    go over max_buffered_rows, up to min_run_size rows per spool."""
+
+    def __init__(self, max_buffered_rows=SORT_MEMORY_BUDGET,
+                 chunk_size=SORT_CHUNK_SIZE, part=0,
+                 min_run_size=SORT_MIN_RUN_SIZE, max_runs=SORT_MAX_RUNS):
+        self.max_buffered_rows = max_buffered_rows
+        self.chunk_size = chunk_size
+        self.part = part
+        self.min_run_size = min_run_size
+        self.max_runs = max_runs
+        self.spools = {}
+        self.buffered_rows = 0
+
+    def __contains__(self, key):
+        return key in self.spools
+
+    def __getitem__(self, key):
+        return self.spools[key]
+
+    def items(self):
+        return self.spools.items()
+
+    def create(self, key, group_by_post=False):
+        spool = SortedRowSpool(
+            group_by_post, chunk_size=self.chunk_size, part=self.part,
+            max_runs=self.max_runs)
+        self.spools[key] = spool
+        return spool
+
+    def add(self, key, row):
+        spool = self.spools[key]
+        buffered_before = len(spool.buffer)
+        spool.add(row)
+        self.buffered_rows += len(spool.buffer) - buffered_before
+        if self.buffered_rows > self.max_buffered_rows:
+            largest = max(self.spools.values(), key=lambda s: len(s.buffer))
+            if len(largest.buffer) >= self.min_run_size:
+                self.buffered_rows -= len(largest.buffer)
+                largest.spill()
+
+    def close(self):
+        for spool in self.spools.values():
+            spool.close()
@@ -3,11 +3,12 @@
 
 from __future__ import unicode_literals
 
+from copy import deepcopy
 import re
 
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from django.utils.translation import ugettext as _
-from django.http import Http404
 
 import jsonpatch
 import jsonpointer
@@ -16,7 +17,26 @@ from candidates.models.versions import get_versions_parent_map
 from elections.models import Election
 
 
-def get_descriptive_value(election, attribute, value, leaf):
+def get_election_index():
+    """Return the election slug index, only fetching it if it's used"""
+    return SimpleLazyObject(Election.objects.name_and_current_by_slug)
+
+
+def get_election_name_and_current(election, elections):
+    """Return the name of an election, and whether it's current
+
+    'elections' is the result of get_election_index()"""
+
+    try:
+        return elections[election]
+    except KeyError:
+        # The election slug may have changed since the diff was
+        # stored.  Assume this is an older election, and use the raw
+        # ID, as it's more useful than nothing.
+        return ("{0} election".format(election), False)
+
+
+def get_descriptive_value(election, attribute, value, leaf, elections=None):
     """Get a sentence fragment describing someone's status in a particular year
 
     'attribute' is either "standing_in" or "party_membership", 'election'
@@ -24,17 +44,10 @@ def get_descriptive_value(election, attribute, value, leaf):
     be under that year in the 'standing_in' or 'party_memberships'
     dictionary (see the comment at the top of update.py)."""
 
-    try:
-        election_data = Election.objects.get_by_slug(election)
-        current_election = election_data.current
-        election_name = election_data.name
-    except Http404:
-        # The election slug may have changed since the diff was stored.
-        # Assume this is an older election
-        current_election = False
-        # Use the raw ID here, as it's more useful than nothing.
-        election_name = "{0} election".format(election)
-
+    if elections is None:
+        elections = get_election_index()
+    election_name, current_election = \
+        get_election_name_and_current(election, elections)
 
     if attribute == 'party_memberships':
         if leaf:
@@ -112,7 +125,8 @@ def get_descriptive_value(election, attribute, value, leaf):
                     message = _('was known to be standing in {party} in the {election}')
                 return message.format(party=value['name'], election=election_name)
 
-def explain_standing_in_and_party_memberships(operation, attribute, election, leaf):
+def explain_standing_in_and_party_memberships(
+        operation, attribute, election, leaf, elections=None):
     """Set 'value' and 'previous_value' in operation to a readable explanation
 
     'attribute' is one of 'standing_in' or 'party_memberships'."""
@@ -126,6 +140,7 @@ def explain_standing_in_and_party_memberships(operation, attribute, election, le
                 attribute,
                 operation[key],
                 leaf,
+                elections,
             )
         else:
             clauses = []
@@ -136,35 +151,71 @@ def explain_standing_in_and_party_memberships(operation, attribute, election, le
                     attribute,
                     value,
                     leaf,
+                    elections,
                 ))
             operation[key] = _(' and ').join(clauses)
 
-def get_version_diff(from_data, to_data):
-    """Calculate the diff (a mangled JSON patch) between from_data and to_data"""
+def match_standing_in_or_party(path):
+    return re.search(
+        r'(standing_in|party_memberships)(?:/([^/]+))?(?:/(\w+))?', path)
+
+def get_raw_version_diff(from_data, to_data):
+    """Calculate the JSON patch between from_data and to_data
+
+    Each 'replace' or 'remove' operation also has the value it
+    replaced as 'previous_value'. Unlike the result of
+    get_version_diff, this doesn't depend on the language or on which
+    elections are current, so it can be cached."""
 
-    basic_patch = jsonpatch.make_patch(from_data, to_data)
     result = []
+    basic_patch = jsonpatch.make_patch(from_data, to_data)
+    # The operations generated by jsonpatch are incremental, so we
+    # need to apply each before going on to the next; do that in place
+    # on a copy, rather than copying the whole document for every
+    # operation:
+    from_data = deepcopy(from_data)
     for operation in basic_patch:
-        op = operation['op']
-        ignore = False
-        # We deal with standing_in and party_memberships slightly
-        # differently so they can be presented in human-readable form,
-        # so match those cases first:
-        m = re.search(
-            r'(standing_in|party_memberships)(?:/([^/]+))?(?:/(\w+))?',
-            operation['path'],
-        )
-        if op in ('replace', 'remove'):
-            operation['previous_value'] = \
+        if operation['op'] in ('replace', 'remove'):
+            operation['previous_value'] = deepcopy(
                 jsonpointer.resolve_pointer(
                     from_data,
                     operation['path'],
                     default=None
                 )
+            )
+        result.append(operation)
+        operation_to_apply = deepcopy(operation)
+        if operation['op'] == 'replace' and \
+                not operation['previous_value'] and \
+                not match_standing_in_or_party(operation['path']):
+            # explain_version_diff reports this as an 'add', and the
+            # later operations expect it to have been applied as one:
+            operation_to_apply['op'] = 'add'
+        from_data = jsonpatch.apply_patch(
+            from_data, [operation_to_apply], in_place=True)
+    return result
+
+def explain_version_diff(raw_diff, elections=None):
+    """Turn a diff from get_raw_version_diff into a readable one
+
+    'elections' is the result of get_election_index(), if the caller
+    already has one."""
 
+    if elections is None:
+        elections = get_election_index()
+    result = []
+    for operation in raw_diff:
+        operation = operation.copy()
+        op = operation['op']
+        ignore = False
+        # We deal with standing_in and party_memberships slightly
+        # differently so they can be presented in human-readable form,
+        # so match those cases first:
+        m = match_standing_in_or_party(operation['path'])
         attribute, election, leaf = m.groups() if m else (None, None, None)
         if attribute:
-            explain_standing_in_and_party_memberships(operation, attribute, election, leaf)
+            explain_standing_in_and_party_memberships(
+                operation, attribute, election, leaf, elections)
         if op in ('replace', 'remove'):
             if op == 'replace' and not operation['previous_value']:
                 if operation['value']:
@@ -178,17 +229,16 @@ def get_version_diff(from_data, to_data):
             # saying 'we *know* they're not standing then'
             if (not operation['value']) and (attribute != 'standing_in'):
                 ignore = True
-        operation['path'] = re.sub(r'^/', '', operation['path'])
         if not ignore:
+            operation['path'] = operation['path'].lstrip('/')
             result.append(operation)
-        # The operations generated by jsonpatch are incremental, so we
-        # need to apply each before going on to parse the next:
-        operation['path'] = '/' + operation['path']
-        from_data = jsonpatch.apply_patch(from_data, [operation])
-    for operation in result:
-        operation['path'] = operation['path'].lstrip('/')
     return result
 
+def get_version_diff(from_data, to_data):
+    """Calculate the diff (a mangled JSON patch) between from_data and to_data"""
+
+    return explain_version_diff(get_raw_version_diff(from_data, to_data))
+
 def clean_version_data(data):
     data = data.copy()
     for election_slug, standing_in in data.get('standing_in', {}).items():
@@ -210,32 +260,57 @@ def get_parents_version_data(parents, id_to_version):
     # If there are no parents, then compare to an empty dictionary
     return [(None, {})]
 
-def get_version_diffs(versions):
+def make_version_with_diffs(version, parent_raw_diffs, elections=None):
+    """Return a copy of a version dict with readable diffs added
+
+    'parent_raw_diffs' is a list of (parent_version_id, raw_diff) pairs,
+    where the raw diffs are from get_raw_version_diff; if the version
+    has no parents, the only parent_version_id should be None."""
+
+    if elections is None:
+        elections = get_election_index()
+    version_with_diffs = version.copy()
+    version_with_diffs['data'] = clean_version_data(version['data'])
+    version_with_diffs['parent_version_ids'] = [
+        parent_version_id for parent_version_id, raw_diff in parent_raw_diffs
+        if parent_version_id is not None
+    ]
+    version_with_diffs['diffs'] = [
+        {
+            'parent_version_id': parent_version_id,
+            'parent_diff': explain_version_diff(raw_diff, elections),
+        } for parent_version_id, raw_diff in parent_raw_diffs
+    ]
+    return version_with_diffs
+
+def get_version_diffs(versions, raw_diff_cache=None):
     """Add a diff to each of an array of version dicts
 
     The first version is the most recent; the last is the original
-    version."""
+    version.
 
+    If 'raw_diff_cache' is supplied it should behave like a dictionary
+    mapping (version_id, parent_version_id) to the raw diff between
+    those versions; any diffs that are missing from it are calculated
+    and added to it."""
+
+    if raw_diff_cache is None:
+        raw_diff_cache = {}
+    elections = get_election_index()
     id_to_parent_ids = get_versions_parent_map(versions)
     id_to_version = {v['version_id']: v for v in versions}
     result = []
     for v in versions:
         version_id = v['version_id']
         v['parent_version_ids'] = id_to_parent_ids[version_id]
-        version_with_diffs = v.copy()
-        version_with_diffs['data'] = clean_version_data(
-            version_with_diffs['data'])
-        version_with_diffs['parent_version_ids'] = id_to_parent_ids[version_id]
-        version_with_diffs['diffs'] = [
-            {
-                'parent_version_id': parent_with_data[0],
-                'parent_diff': get_version_diff(
-                    clean_version_data(parent_with_data[1]),
-                    version_with_diffs['data']
-                )
-            } for parent_with_data in
-            get_parents_version_data(
-                id_to_parent_ids[version_id], id_to_version)
-        ]
-        result.append(version_with_diffs)
+        data = clean_version_data(v['data'])
+        parent_raw_diffs = []
+        for parent_version_id, parent_data in get_parents_version_data(
+                id_to_parent_ids[version_id], id_to_version):
+            key = (version_id, parent_version_id)
+            if key not in raw_diff_cache:
+                raw_diff_cache[key] = get_raw_version_diff(
+                    clean_version_data(parent_data), data)
+            parent_raw_diffs.append((parent_version_id, raw_diff_cache[key]))
+        result.append(make_version_with_diffs(v, parent_raw_diffs, elections))
     return result
@@ -96,7 +96,7 @@ class BasePersonForm(forms.Form):
         super(BasePersonForm, self).__init__(*args, **kwargs)
 
         # Add any extra fields to the person form:
-        for field in ExtraField.objects.all():
+        for field in ExtraField.objects.cached():
             if field.type == 'line':
                 self.fields[field.key] = \
                     StrippedCharField(
@@ -137,7 +137,7 @@ class BasePersonForm(forms.Form):
                     "Unknown field type: {0}".format(field.type)
                 )
 
-        for field in SimplePopoloField.objects.all():
+        for field in SimplePopoloField.objects.cached():
             opts = {
                 'label': _(field.label),
                 'required': field.required
@@ -165,7 +165,7 @@ class BasePersonForm(forms.Form):
             else:
                 self.fields[field.name] = StrippedCharField(**opts)
 
-        for field in ComplexPopoloField.objects.all():
+        for field in ComplexPopoloField.objects.cached():
             opts = {
                 'label': _(field.label),
                 'required': False
@@ -277,10 +277,16 @@ class NewPersonForm(BasePersonForm):
     def __init__(self, *args, **kwargs):
         from .election_specific import shorten_post_label
         election = kwargs.pop('election', None)
+        election_data = kwargs.pop('election_data', None)
         hidden_post_widget = kwargs.pop('hidden_post_widget', None)
+        # If you're creating lots of these forms, you can pass in the
+        # party sets and their choices so they're not fetched each time:
+        party_sets_and_party_choices = \
+            kwargs.pop('party_sets_and_party_choices', None)
         super(NewPersonForm, self).__init__(*args, **kwargs)
 
-        election_data = Election.objects.get_by_slug(election)
+        if election_data is None:
+            election_data = Election.objects.get_by_slug(election)
 
         standing_field_kwargs = {
             'label': _('Standing in %s') % election_data.name,
@@ -333,24 +339,33 @@ class NewPersonForm(BasePersonForm):
         # choice field for each such "party set" and make sure only
         # the appropriate one is shown, depending on the election and
         # selected constituency, using Javascript.
-        specific_party_set = None
-        if hidden_post_widget:
-            # Then the post can't be changed, so only add the
-            # particular party set relevant for that post:
-            post_id = kwargs['initial']['constituency_' + election]
-            specific_party_set = PartySet.objects.get(
-                postextra__slug=post_id
-            )
-
-        for party_set in PartySet.objects.all():
-            if specific_party_set and (party_set.slug != specific_party_set.slug):
-                continue
+        if party_sets_and_party_choices is None:
+            specific_party_set = None
+            if hidden_post_widget:
+                # Then the post can't be changed, so only add the
+                # particular party set relevant for that post:
+                post_id = kwargs['initial']['constituency_' + election]
+                specific_party_set = PartySet.objects.get(
+                    postextra__slug=post_id
+                )
+            party_sets_and_party_choices = [
+                (party_set, party_set.party_choices())
+                for party_set in PartySet.objects.all()
+                if not specific_party_set or
+                party_set.slug == specific_party_set.slug
+            ]
+
+        self.party_sets = [
+            party_set for party_set, party_choices
+            in party_sets_and_party_choices
+        ]
+        for party_set, party_choices in party_sets_and_party_choices:
             self.fields['party_' + party_set.slug + '_' + election] = \
                 forms.ChoiceField(
                     label=_("Party in {election}").format(
                         election=election_data.name,
                     ),
-                    choices=party_set.party_choices(),
+                    choices=party_choices,
                     required=False,
                     widget=forms.Select(
                         attrs={
@@ -407,6 +422,13 @@ class AddElectionFieldsMixin(object):
             for party_set in PartySet.objects.all()
         ]
 
+    @property
+    def party_sets(self):
+        return [
+            party_set for party_set, party_choices
+            in self.party_sets_and_party_choices
+        ]
+
     def add_elections_fields(self, elections):
         for election_data in elections:
             self.add_election_fields(election_data)
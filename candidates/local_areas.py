@@ -0,0 +1,271 @@
+"""Look up the areas for postcodes and points without calling MapIt
+
+If LOCAL_AREA_POSTCODES_FILE or LOCAL_AREA_BOUNDARIES_FILES are
+set, the postcode and point lookups in candidates.mapit (and those in
+elections.uk.mapit) try the data in those files first, and only make
+a request upstream if it doesn't know about that postcode or point,
+or doesn't have areas of every type that the lookup needs.
+
+The postcodes file is a CSV file with the columns postcode,
+area_type, area_id and (optionally) area_name, with one row for each
+area a postcode is in.  The boundaries files are GeoJSON feature
+collections of Polygon or MultiPolygon features, each with the
+properties 'type' and 'id' (and optionally 'name' and 'codes'), as
+they would be in MapIt's results.  The boundaries are taken to be
+those of the current generation of areas."""
+
+from __future__ import unicode_literals
+
+import io
+import json
+from math import ceil, sqrt
+
+from django.conf import settings
+
+from compat import BufferDictReader, text_type
+
+
+def get_bounding_box(geometry):
+    """Return (min_x, min_y, max_x, max_y) for a GeoJSON geometry"""
+    xs, ys = [], []
+    for polygon in get_polygons(geometry):
+        for ring in polygon:
+            xs += [p[0] for p in ring]
+            ys += [p[1] for p in ring]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def get_polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    elif geometry['type'] == 'GeometryCollection':
+        return [
+            polygon
+            for g in geometry['geometries']
+            for polygon in get_polygons(g)
+        ]
+    raise ValueError(
+        'Unsupported geometry type: {0}'.format(geometry['type']))
+
+
+def point_in_ring(x, y, ring):
+    # Count how many edges a ray from the point to the east crosses:
+    inside = False
+    previous_x, previous_y = ring[-1][0], ring[-1][1]
+    for point in ring:
+        point_x, point_y = point[0], point[1]
+        if (point_y > y) != (previous_y > y):
+            crossing_x = point_x + (y - point_y) * \
+                (previous_x - point_x) / (previous_y - point_y)
+            if x < crossing_x:
+                inside = not inside
+        previous_x, previous_y = point_x, point_y
+    return inside
+
+
+def point_in_geometry(x, y, geometry):
+    for polygon in get_polygons(geometry):
+        exterior, holes = polygon[0], polygon[1:]
+        if point_in_ring(x, y, exterior) and \
+                not any(point_in_ring(x, y, hole) for hole in holes):
+            return True
+    return False
+
+
+def bounding_box_contains(bounding_box, x, y):
+    min_x, min_y, max_x, max_y = bounding_box
+    return min_x <= x <= max_x and min_y <= y <= max_y
+
+
+def union_of_bounding_boxes(bounding_boxes):
+    min_xs, min_ys, max_xs, max_ys = zip(*bounding_boxes)
+    return (min(min_xs), min(min_ys), max(max_xs), max(max_ys))
+
+
+class BoundingBoxTree(object):
+    """An R-tree of bounding boxes, for finding those containing a point
+
+    The tree is built once from all the entries, which are (bounding
+    box, item) tuples, by Sort-Tile-Recursive packing: the entries are
+    sorted into vertical slices by x, then within each slice by y, and
+    grouped into nodes of node_capacity entries; this is repeated for
+    the nodes until there are few enough for the root."""
+
+    def __init__(self, entries, node_capacity=16):
+        self.node_capacity = node_capacity
+        self.root = list(entries)
+        self.height = 0
+        while len(self.root) > node_capacity:
+            self.root = self.pack(self.root)
+            self.height += 1
+
+    def pack(self, entries):
+        capacity = self.node_capacity
+        number_of_nodes = int(ceil(len(entries) / float(capacity)))
+        number_of_slices = int(ceil(sqrt(number_of_nodes)))
+        slice_size = number_of_slices * capacity
+        entries = sorted(entries, key=lambda e: e[0][0] + e[0][2])
+        nodes = []
+        for i in range(0, len(entries), slice_size):
+            vertical_slice = sorted(
+                entries[i:i + slice_size], key=lambda e: e[0][1] + e[0][3])
+            for j in range(0, len(vertical_slice), capacity):
+                children = vertical_slice[j:j + capacity]
+                nodes.append((
+                    union_of_bounding_boxes([c[0] for c in children]),
+                    children
+                ))
+        return nodes
+
+    def search(self, x, y):
+        """Return the items whose bounding boxes contain the point (x, y)"""
+        result = []
+        to_visit = [(self.root, self.height)]
+        while to_visit:
+            entries, height = to_visit.pop()
+            for bounding_box, child in entries:
+                if not bounding_box_contains(bounding_box, x, y):
+                    continue
+                if height == 0:
+                    result.append(child)
+                else:
+                    to_visit.append((child, height - 1))
+        return result
+
+
+class LocalAreaResolver(object):
+    """Postcode and point lookups from data loaded into memory
+
+    Areas are returned as MapIt would return them: a dictionary
+    mapping each area's ID to a dictionary with its 'id', 'type',
+    'name' and 'codes'."""
+
+    def __init__(self):
+        self.areas = {}
+        self.postcode_area_ids = {}
+        self.boundaries = []
+        # The types of area there's data for in each kind of file:
+        self.postcode_area_types = set()
+        self.boundary_area_types = set()
+        self.tree = BoundingBoxTree([])
+
+    def add_area(self, area_id, area_type, name='', codes=None):
+        area_id = text_type(area_id)
+        area = self.areas.setdefault(area_id, {
+            'id': area_id,
+            'type': area_type,
+            'name': name,
+            'codes': {},
+        })
+        # The same area may be in the postcodes file and the
+        # boundaries files, with different details in each:
+        area['name'] = area['name'] or name
+        area['codes'].update(codes or {})
+        return area
+
+    def load_postcodes_csv(self, csv_data):
+        from .mapit import normalise_postcode
+        for row in BufferDictReader(csv_data):
+            area = self.add_area(
+                row['area_id'], row['area_type'], row.get('area_name') or '')
+            self.postcode_area_ids.setdefault(
+                normalise_postcode(row['postcode']), []
+            ).append(area['id'])
+            self.postcode_area_types.add(area['type'])
+
+    def load_geojson(self, geojson):
+        """Add the boundaries from a GeoJSON FeatureCollection or Feature"""
+        if geojson['type'] == 'FeatureCollection':
+            features = geojson['features']
+        else:
+            features = [geojson]
+        for feature in features:
+            properties = feature['properties']
+            area = self.add_area(
+                properties['id'],
+                properties['type'],
+                properties.get('name', ''),
+                properties.get('codes'),
+            )
+            geometry = feature['geometry']
+            self.boundary_area_types.add(area['type'])
+            self.boundaries.append(
+                (get_bounding_box(geometry), (area['id'], geometry))
+            )
+        self.tree = BoundingBoxTree(self.boundaries)
+
+    @classmethod
+    def from_files(cls, postcodes_filename=None, boundaries_filenames=()):
+        resolver = cls()
+        if postcodes_filename:
+            with io.open(postcodes_filename, encoding='utf-8') as f:
+                resolver.load_postcodes_csv(f.read())
+        for filename in boundaries_filenames:
+            with io.open(filename, encoding='utf-8') as f:
+                resolver.load_geojson(json.load(f))
+        return resolver
+
+    def areas_for_postcode(self, postcode, area_types=None):
+        """Return the areas a postcode is in, or None if it's not known
+
+        If area_types is given, None is also returned unless the
+        postcodes file has areas of all those types, since otherwise
+        the postcode might be in areas that are missing from it."""
+        from .mapit import normalise_postcode
+        if area_types is not None and \
+                not set(area_types) <= self.postcode_area_types:
+            return None
+        area_ids = self.postcode_area_ids.get(normalise_postcode(postcode))
+        if area_ids is None:
+            return None
+        return {area_id: self.areas[area_id] for area_id in area_ids}
+
+    def areas_at_point(self, lon, lat, area_types=None):
+        """Return the areas (of area_types, if given) containing a point"""
+        lon, lat = float(lon), float(lat)
+        result = {}
+        for area_id, geometry in self.tree.search(lon, lat):
+            area = self.areas[area_id]
+            if area_types is not None and area['type'] not in area_types:
+                continue
+            if point_in_geometry(lon, lat, geometry):
+                result[area_id] = area
+        return result
+
+    def areas_at_coords(self, coords, latitude_first=False, area_types=None):
+        """Like areas_at_point, but for a 'lon,lat' (or 'lat,lon') string
+
+        Unlike for areas_at_point, area_types isn't a filter: it's the
+        types of area the caller needs, and if there are no boundaries
+        of some of those types, nothing is returned."""
+        if area_types is not None and \
+                not set(area_types) <= self.boundary_area_types:
+            return {}
+        try:
+            lon, lat = coords.split(',')
+            if latitude_first:
+                lon, lat = lat, lon
+            return self.areas_at_point(lon, lat)
+        except ValueError:
+            return {}
+
+
+_resolvers = {}
+
+
+def get_local_area_resolver():
+    """Return a LocalAreaResolver for the configured files, or None
+
+    The files are only read the first time this is called in each
+    process."""
+    postcodes_filename = settings.LOCAL_AREA_POSTCODES_FILE
+    boundaries_filenames = tuple(settings.LOCAL_AREA_BOUNDARIES_FILES)
+    if not (postcodes_filename or boundaries_filenames):
+        return None
+    key = (postcodes_filename, boundaries_filenames)
+    if key not in _resolvers:
+        _resolvers[key] = LocalAreaResolver.from_files(
+            postcodes_filename, boundaries_filenames)
+    return _resolvers[key]
@@ -0,0 +1,15 @@
+from __future__ import print_function, unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from candidates.mapit import AREA_LOOKUP_STATS, get_area_lookup_stats
+
+
+class Command(BaseCommand):
+
+    help = "Print how often area lookups have been answered from the cache"
+
+    def handle(self, *args, **options):
+        stats = get_area_lookup_stats()
+        for name in AREA_LOOKUP_STATS:
+            print('{0}: {1}'.format(name, stats[name]))
@@ -0,0 +1,103 @@
+from __future__ import division, print_function, unicode_literals
+
+from random import Random
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand, CommandError
+
+from candidates.models import PersonNameToken, search_people_in_database
+from candidates.views.search import haystack_search_person_by_name
+from popolo.models import Person
+
+
+def get_sample_names(count, seed):
+    '''Return names to search for, based on those of random people
+
+    There's a mix of full names, first and last names, and the starts
+    of first and last names, as people type into the search box.'''
+    random = Random(seed)
+    person_ids = list(Person.objects.values_list('id', flat=True))
+    if not person_ids:
+        raise CommandError('There are no people to search for')
+    sample_ids = [random.choice(person_ids) for i in range(count)]
+    names_by_id = dict(
+        Person.objects.filter(id__in=sample_ids).values_list('id', 'name'))
+    result = []
+    for i, person_id in enumerate(sample_ids):
+        parts = names_by_id[person_id].split()
+        if i % 3 == 1 and len(parts) > 1:
+            parts = [parts[0], parts[-1]]
+        elif i % 3 == 2:
+            parts = [part[:4] for part in parts]
+        result.append(' '.join(parts))
+    return result
+
+
+def get_percentile(sorted_times, percentile):
+    index = int(round((len(sorted_times) - 1) * percentile / 100))
+    return sorted_times[index]
+
+
+class Command(BaseCommand):
+
+    help = "Compare how long name searches take with each search backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--searches',
+            type=int,
+            default=200,
+            help='The number of names to search for'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='The seed for choosing the names to search for'
+        )
+        parser.add_argument(
+            '--results',
+            type=int,
+            default=5,
+            help='How many results to fetch for each search'
+        )
+        parser.add_argument(
+            '--skip-haystack',
+            action='store_true',
+            help="Don't time searches with haystack, e.g. if there's no "
+                 "Elasticsearch running"
+        )
+
+    def time_searches(self, names, search):
+        times = []
+        for name in names:
+            start = default_timer()
+            list(search(name)[:self.options['results']])
+            times.append((default_timer() - start) * 1000)
+        return sorted(times)
+
+    def handle(self, *args, **options):
+        self.options = options
+        if not PersonNameToken.objects.exists():
+            raise CommandError(
+                'There are no name tokens yet; with SEARCH_BACKEND set to '
+                '"database", run: candidates_update_search_index --all')
+        names = get_sample_names(options['searches'], options['seed'])
+        backends = [('database', search_people_in_database)]
+        if not options['skip_haystack']:
+            backends.append(('haystack', haystack_search_person_by_name))
+        for backend_name, search in backends:
+            # Run each search once first, so that both backends are
+            # timed with warm caches:
+            self.time_searches(names, search)
+            times = self.time_searches(names, search)
+            print(
+                '{0}: mean {1:.1f}ms, median {2:.1f}ms, '
+                '95th percentile {3:.1f}ms, max {4:.1f}ms'.format(
+                    backend_name,
+                    sum(times) / len(times),
+                    get_percentile(times, 50),
+                    get_percentile(times, 95),
+                    times[-1],
+                )
+            )
@@ -0,0 +1,193 @@
+from __future__ import print_function, unicode_literals
+
+from datetime import timedelta
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+from django.db.backends.utils import CursorWrapper
+from django.db.models import Count, F
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from popolo.models import Membership, Person
+
+from candidates.models import PersonVersion
+from candidates.models.versions import get_person_as_version_data
+from compat import text_type
+
+
+class Rollback(Exception):
+    pass
+
+
+def get_value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, text_type):
+        return len(value.encode('utf-8'))
+    if isinstance(value, bytes):
+        return len(value)
+    return len(text_type(value))
+
+
+class ByteCountingCursorWrapper(CursorWrapper):
+    """A cursor that adds up the size of the values fetched through it
+
+    The totals are kept in 'counts', a dictionary with the keys
+    'total' and 'versions' (the bytes fetched by queries on the
+    person versions table)."""
+
+    def __init__(self, cursor, db, counts):
+        super(ByteCountingCursorWrapper, self).__init__(cursor, db)
+        self.counts = counts
+        self.last_sql = ''
+
+    def execute(self, sql, params=None):
+        self.last_sql = sql
+        return super(ByteCountingCursorWrapper, self).execute(sql, params)
+
+    def count_rows(self, rows):
+        size = sum(get_value_size(value) for row in rows for value in row)
+        self.counts['total'] += size
+        if 'candidates_personversion' in self.last_sql:
+            self.counts['versions'] += size
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.count_rows([row])
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        self.count_rows(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.count_rows(rows)
+        return rows
+
+
+class Command(BaseCommand):
+
+    help = "Show how many bytes are fetched from the database for a " \
+        "constituency page and a person page, with long version histories"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--election',
+            help='The slug of the election of the constituency page to '
+                 'fetch (by default, the one with the most candidates)'
+        )
+        parser.add_argument(
+            '--post',
+            help='The slug of the post of the constituency page to fetch'
+        )
+        parser.add_argument(
+            '--versions',
+            type=int,
+            default=100,
+            help='How many made-up versions to add to each candidate'
+        )
+
+    def get_election_and_post(self, options):
+        candidacies = Membership.objects.filter(
+            role=F('extra__election__candidate_membership_role'),
+            post__isnull=False,
+        )
+        if options['election']:
+            candidacies = candidacies.filter(
+                extra__election__slug=options['election'])
+        if options['post']:
+            candidacies = candidacies.filter(
+                post__extra__slug=options['post'])
+        result = candidacies.values(
+            'extra__election__slug', 'post__extra__slug'
+        ).annotate(count=Count('pk')).order_by('-count').first()
+        if result is None:
+            raise CommandError('No candidates were found')
+        return result['extra__election__slug'], result['post__extra__slug']
+
+    def add_versions(self, people, number_of_versions):
+        now = timezone.now()
+        person_versions = []
+        for person in people:
+            data = get_person_as_version_data(person)
+            parent_version_id = None
+            for i in range(number_of_versions):
+                version_id = '{0:08x}{1:08x}'.format(person.id, i)
+                if parent_version_id:
+                    raw_diffs = {parent_version_id: []}
+                else:
+                    raw_diffs = {'': []}
+                person_versions.append(PersonVersion(
+                    person=person,
+                    version_id=version_id,
+                    timestamp=now - timedelta(
+                        minutes=number_of_versions - i),
+                    username='benchmark',
+                    information_source='Benchmark version {0}'.format(i),
+                    data=json.dumps(data),
+                    cached_diffs=json.dumps({
+                        'parent_version_ids':
+                            [parent_version_id] if parent_version_id else [],
+                        'raw_diffs': raw_diffs,
+                    }),
+                ))
+                parent_version_id = version_id
+        PersonVersion.objects.bulk_create(person_versions, batch_size=1000)
+
+    def fetch(self, client, url):
+        counts = {'total': 0, 'versions': 0}
+
+        def make_cursor(cursor):
+            return ByteCountingCursorWrapper(cursor, connection, counts)
+
+        connection.make_cursor = make_cursor
+        connection.make_debug_cursor = make_cursor
+        try:
+            response = client.get(url)
+        finally:
+            del connection.make_cursor
+            del connection.make_debug_cursor
+        if response.status_code != 200:
+            raise CommandError('Got status code {0} for {1}'.format(
+                response.status_code, url))
+        return counts
+
+    def handle(self, *args, **options):
+        election_slug, post_slug = self.get_election_and_post(options)
+        people = list(
+            Person.objects.filter(
+                memberships__extra__election__slug=election_slug,
+                memberships__post__extra__slug=post_slug,
+            ).distinct().order_by('id')
+        )
+        urls = [
+            reverse('constituency', kwargs={
+                'election': election_slug,
+                'post_id': post_slug,
+                'ignored_slug': '',
+            }),
+            reverse('person-view', kwargs={'person_id': people[0].id}),
+        ]
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['*']):
+                self.add_versions(people, options['versions'])
+                client = Client()
+                for url in urls:
+                    # Fetch each page once first, so that anything
+                    # cached is cached in both measurements:
+                    self.fetch(client, url)
+                    counts = self.fetch(client, url)
+                    print(
+                        '{0}: {1:,} bytes, {2:,} of them from versions'.format(
+                            url, counts['total'], counts['versions']))
+                # Don't leave any of the made-up versions behind:
+                raise Rollback()
+        except Rollback:
+            pass
@@ -0,0 +1,38 @@
+from __future__ import print_function, unicode_literals
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from candidates.models import PersonExtra
+
+
+class Command(BaseCommand):
+
+    help = "Save the diffs of versions that were recorded without them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--person-id',
+            help='Only save the diffs of versions of the person with this ID'
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {}
+        if options['person_id']:
+            kwargs['base__id'] = options['person_id']
+        person_extras = PersonExtra.objects.filter(
+            base__versions__cached_diffs='', **kwargs
+        ).distinct().select_related('base')
+        total = 0
+        for person_extra in person_extras:
+            with transaction.atomic():
+                saved = person_extra.cache_version_diffs()
+            if int(options['verbosity']) > 1:
+                print("Saved the diffs of {count} versions of {name} ({id})".format(
+                    count=saved,
+                    name=person_extra.base.name,
+                    id=person_extra.base.id
+                ).encode('utf-8'))
+            total += saved
+        if int(options['verbosity']) > 0:
+            print("Saved the diffs of {0} versions".format(total))
@@ -1,21 +1,45 @@
 from __future__ import unicode_literals
 
 from collections import defaultdict
+from datetime import timedelta
+import json
+from multiprocessing import Pool
 from os import chmod, rename
-from os.path import dirname
-from tempfile import NamedTemporaryFile
+from os.path import dirname, exists
+from shutil import rmtree
+from tempfile import NamedTemporaryFile, mkdtemp
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db import reset_queries
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
 
-from candidates.csv_helpers import list_to_csv
-from candidates.models import PersonExtra
+from candidates.csv_helpers import (
+    SortedRowSpools, merge_sorted_files, write_csv
+)
+from candidates.models import (
+    CSVExportCache, CSVExportCacheRow, CSVExportInvalidation, LoggedAction,
+    PersonExtra
+)
+from candidates.models.csv_cache import encode_csv_row
 from candidates.models.fields import get_complex_popolo_fields
 from elections.models import Election
+from popolo.models import Membership, Person
 
 
 FETCH_AT_A_TIME = 1000
 
+# With --workers, how many ranges of people to divide the work into for
+# each worker process:
+RANGES_PER_WORKER = 4
+
+# A change made in a transaction that started before an incremental run
+# but was committed after it looked for changes has a timestamp from
+# before that run, so each run also looks this far back before the
+# start of the last one (this should be longer than any transaction
+# that saves people):
+INCREMENTAL_OVERLAP = timedelta(minutes=10)
+
 
 def queryset_iterator(qs, complex_popolo_fields):
     # To save building up a huge list of queries when DEBUG = True,
@@ -34,18 +58,78 @@ def queryset_iterator(qs, complex_popolo_fields):
         start_index += FETCH_AT_A_TIME
 
 
-def safely_write(output_filename, people, group_by_post):
-    csv = list_to_csv(people, group_by_post)
-    # Write to a temporary file and atomically rename into place:
-    ntf = NamedTemporaryFile(
+def safely_write(output_filename, people):
+    # Stream the (already sorted) rows to a temporary file and
+    # atomically rename into place:
+    with NamedTemporaryFile(
         delete=False,
         dir=dirname(output_filename)
-    )
-    ntf.write(csv.encode('utf-8'))
+    ) as ntf:
+        write_csv(people, ntf)
     chmod(ntf.name, 0o644)
     rename(ntf.name, output_filename)
 
 
+def spool_person_range(part, pk_range, election_slugs, only_election_slug,
+                       site_base_url, output_directory):
+    """Spool the rows for people with a PersonExtra primary key in pk_range
+
+    This is run in a worker process by candidates_create_csv --workers.
+    Each non-empty spool is saved as a sorted file in output_directory,
+    and the return value maps spool keys to those filenames."""
+
+    command = Command()
+    command.options = {'site_base_url': site_base_url}
+    command.complex_popolo_fields = get_complex_popolo_fields()
+    qs = PersonExtra.objects.filter(pk__gte=pk_range[0], pk__lt=pk_range[1])
+    only_election = None
+    if only_election_slug:
+        only_election = Election.objects.get(slug=only_election_slug)
+        qs = qs.filter(
+            base__memberships__extra__election=only_election,
+            base__memberships__role=only_election.candidate_membership_role,
+        )
+    spools = command.get_people(
+        election_slugs, command.generate_rows(qs, only_election), part)
+    result = {}
+    for key, spool in spools.items():
+        if not len(spool):
+            continue
+        with NamedTemporaryFile(delete=False, dir=output_directory) as f:
+            spool.save_sorted(f)
+        result[key] = f.name
+    spools.close()
+    return result
+
+
+def spool_person_range_in_worker(args):
+    try:
+        return spool_person_range(*args)
+    finally:
+        connection.close()
+
+
+def split_pk_range(min_pk, max_pk, parts):
+    """Split the primary keys from min_pk to max_pk into half-open ranges
+
+    >>> split_pk_range(1, 10, 3)
+    [(1, 5), (5, 9), (9, 11)]
+    >>> split_pk_range(1, 2, 4)
+    [(1, 2), (2, 3)]
+    """
+
+    size = max(1, -(-(max_pk - min_pk + 1) // parts))
+    return [
+        (start, min(start + size, max_pk + 1))
+        for start in range(min_pk, max_pk + 1, size)
+    ]
+
+
+def decode_cached_rows(encoded_rows):
+    for encoded_row in encoded_rows:
+        yield json.loads(encoded_row)
+
+
 class Command(BaseCommand):
 
     help = "Output CSV files for all elections"
@@ -64,68 +148,357 @@ class Command(BaseCommand):
             metavar='ELECTION-SLUG',
             help='Only output CSV for the election with this slug'
         )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only regenerate the rows for people who have changed '
+                 'since the last incremental run, and only rewrite the '
+                 'files whose content has changed'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='The number of processes to generate the rows with'
+        )
+
+    def get_output_filename(self, kind, election_slug):
+        prefix = self.options['OUTPUT-PREFIX']
+        if election_slug is None:
+            if kind == 'all':
+                return prefix + '-all.csv'
+            return prefix + '-elected-all.csv'
+        if kind == 'all':
+            return prefix + '-' + election_slug + '.csv'
+        return prefix + '-elected-' + election_slug + '.csv'
 
-    def get_people(self, election, qs):
-        all_people = []
-        elected_people = []
+    def generate_rows(self, qs, only_election=None):
+        """Generate a tuple for each candidacy of the people in qs
+
+        Each tuple is (person_id, election_slug, election_row,
+        all_elections_row): the rows for the candidacy in that
+        election's CSV file and in the file for every election differ
+        in the election-specific extra CSV values."""
+
+        from candidates.election_specific import get_extra_csv_values
         for person_extra in queryset_iterator(
                 qs, self.complex_popolo_fields
         ):
-            for d in person_extra.as_list_of_dicts(
-                election,
+            person = person_extra.base
+            for candidacy, row in person_extra.csv_rows(
+                only_election,
                 base_url=self.options['site_base_url']
             ):
-                all_people.append(d)
-                if d['elected'] == 'True':
-                    elected_people.append(d)
-        return all_people, elected_people
+                election = candidacy.extra.election
+                election_row = row.copy()
+                election_row.update(get_extra_csv_values(
+                    person, election, candidacy.post))
+                # The extra values in the files for every election
+                # are those you get with no particular election:
+                row.update(get_extra_csv_values(
+                    person, None, candidacy.post))
+                yield person.id, election.slug, election_row, row
+
+    def create_spools(self, election_slugs, part=0):
+        spools = SortedRowSpools(part=part)
+        for election_slug in election_slugs:
+            for kind in ('all', 'elected'):
+                spools.create(
+                    (kind, election_slug),
+                    group_by_post=(election_slug is not None)
+                )
+        return spools
+
+    def add_row(self, spools, election_slug, row):
+        spools.add(('all', election_slug), row)
+        if row['elected'] == 'True':
+            spools.add(('elected', election_slug), row)
+
+    def get_people(self, election_slugs, rows, part=0):
+        """Spool the rows for every output file in one pass over rows
+
+        Rather than building up lists of every row, the rows are added
+        to spools which sort them on disk, so that memory use doesn't
+        grow with the number of candidacies. Each candidacy is sent to
+        the spools for its own election and, if None is in
+        election_slugs, also to those for the files covering every
+        election."""
+
+        spools = self.create_spools(election_slugs, part)
+        include_all = None in election_slugs
+        for person_id, election_slug, election_row, all_elections_row in rows:
+            if ('all', election_slug) in spools:
+                self.add_row(spools, election_slug, election_row)
+            if include_all:
+                self.add_row(spools, None, all_elections_row)
+        return spools
+
+    def write_files(self, spools, election_slugs):
+        for election_slug in election_slugs:
+            for kind in ('all', 'elected'):
+                safely_write(
+                    self.get_output_filename(kind, election_slug),
+                    spools[(kind, election_slug)]
+                )
+        spools.close()
 
     def handle(self, **options):
+        self.options = options
+        self.complex_popolo_fields = get_complex_popolo_fields()
+
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+        if options['incremental'] and options['workers'] > 1:
+            raise CommandError("--incremental can't be used with --workers")
         if options['election']:
+            if options['incremental']:
+                raise CommandError(
+                    "--incremental can't be used with --election")
             try:
-                all_elections = [Election.objects.get(slug=options['election'])]
+                election = Election.objects.get(slug=options['election'])
             except Election.DoesNotExist:
                 message = "Couldn't find an election with slug {election_slug}"
                 raise CommandError(message.format(election_slug=options['election']))
+            # Only get the candidates standing in that particular
+            # election:
+            qs = PersonExtra.objects.filter(
+                base__memberships__extra__election=election,
+                base__memberships__role=election.candidate_membership_role,
+            )
+            election_slugs = [election.slug]
+            if options['workers'] > 1:
+                self.handle_parallel(election_slugs, election.slug)
+                return
+            rows = self.generate_rows(qs, election)
         else:
-            all_elections = list(Election.objects.all()) + [None]
+            # Get information for every candidate in every election;
+            # None stands for the files that cover every election:
+            election_slugs = \
+                list(Election.objects.values_list('slug', flat=True)) + [None]
+            if options['incremental']:
+                self.handle_incremental(election_slugs)
+                return
+            if options['workers'] > 1:
+                self.handle_parallel(election_slugs)
+                return
+            rows = self.generate_rows(PersonExtra.objects.all())
 
-        self.options = options
-        self.complex_popolo_fields = get_complex_popolo_fields()
+        spools = self.get_people(election_slugs, rows)
+        self.write_files(spools, election_slugs)
+
+    def handle_parallel(self, election_slugs, only_election_slug=None):
+        """Generate the rows in a pool of worker processes
+
+        The PersonExtra primary keys are split into ranges (more of
+        them than there are workers, so that the work is spread evenly
+        even if some ranges are denser than others). Each worker writes
+        sorted partial files for its range, and these are then merged
+        into each output file."""
+
+        pk_bounds = PersonExtra.objects.aggregate(
+            min_pk=Min('pk'), max_pk=Max('pk'))
+        pk_ranges = []
+        if pk_bounds['min_pk'] is not None:
+            pk_ranges = split_pk_range(
+                pk_bounds['min_pk'],
+                pk_bounds['max_pk'],
+                self.options['workers'] * RANGES_PER_WORKER
+            )
+        output_directory = mkdtemp()
+        try:
+            tasks = [
+                (part, pk_range, election_slugs, only_election_slug,
+                 self.options['site_base_url'], output_directory)
+                for part, pk_range in enumerate(pk_ranges)
+            ]
+            # Each worker process needs its own database connection,
+            # so make sure that they don't inherit this one:
+            connection.close()
+            pool = Pool(self.options['workers'])
+            try:
+                partial_filenames = pool.map(spool_person_range_in_worker, tasks)
+            finally:
+                pool.close()
+                pool.join()
+            for election_slug in election_slugs:
+                for kind in ('all', 'elected'):
+                    key = (kind, election_slug)
+                    safely_write(
+                        self.get_output_filename(kind, election_slug),
+                        merge_sorted_files(
+                            [p[key] for p in partial_filenames if key in p])
+                    )
+        finally:
+            rmtree(output_directory)
 
-        for election in all_elections:
-            if election is None:
-                # Get information for every candidate in every
-                # election.
-                qs = PersonExtra.objects.all()
-                all_people, elected_people = self.get_people(election, qs)
-                output_filenames = {
-                    'all': options['OUTPUT-PREFIX'] + '-all.csv',
-                    'elected': options['OUTPUT-PREFIX'] + '-elected-all.csv'
-                }
+    def handle_incremental(self, election_slugs):
+        started = timezone.now()
+        with transaction.atomic():
+            cache, created = CSVExportCache.objects.select_for_update() \
+                .get_or_create(site_base_url=self.options['site_base_url'] or '')
+            invalidation_ids = self.get_invalidation_ids(cache, started)
+            if self.all_rows_invalid(cache, invalidation_ids):
+                # There's no usable cache yet, so generate every row,
+                # saving them to the cache on the way:
+                cache.rows.all().delete()
+                rows = self.cache_rows(
+                    cache, self.generate_rows(PersonExtra.objects.all()))
+                spools = self.get_people(election_slugs, rows)
+                self.write_files(spools, election_slugs)
             else:
-                # Only get the candidates standing in that particular
-                # election
-                role = election.candidate_membership_role
-                qs = PersonExtra.objects.filter(
-                    base__memberships__extra__election=election,
-                    base__memberships__role=role,
+                changed_election_slugs = self.update_cached_rows(
+                    cache, self.get_changed_person_ids(cache))
+                if changed_election_slugs:
+                    # Any change affects the files for every election:
+                    changed_election_slugs.add(None)
+                self.write_files_from_cache(
+                    cache,
+                    [
+                        election_slug for election_slug in election_slugs
+                        if election_slug in changed_election_slugs
+                        or self.output_missing(election_slug)
+                    ]
                 )
-                all_people, elected_people = self.get_people(election, qs)
-                output_filenames = {
-                    'all': options['OUTPUT-PREFIX'] + \
-                        '-' + election.slug + '.csv',
-                    'elected': options['OUTPUT-PREFIX'] +
-                        '-elected-' + election.slug + '.csv',
-                }
-            group_by_post = election is not None
-            safely_write(
-                output_filenames['all'],
-                all_people,
-                group_by_post,
-            )
-            safely_write(
-                output_filenames['elected'],
-                elected_people,
-                group_by_post,
-            )
+            cache.rows_updated = started
+            cache.handled_invalidation_ids = json.dumps(
+                sorted(invalidation_ids))
+            cache.save()
+            # Invalidations from before every cache's last run are of
+            # no further use:
+            oldest_rows_updated = CSVExportCache.objects.aggregate(
+                Min('rows_updated'))['rows_updated__min']
+            CSVExportInvalidation.objects.filter(
+                created__lt=oldest_rows_updated - INCREMENTAL_OVERLAP
+            ).delete()
+
+    def get_changes_since(self, cache):
+        return cache.rows_updated - INCREMENTAL_OVERLAP
+
+    def get_invalidation_ids(self, cache, started):
+        """Return the IDs of recent invalidations of every row
+
+        These are those from since the start of the last run, less
+        INCREMENTAL_OVERLAP, which may include some that the last run
+        has already dealt with."""
+        if cache.rows_updated is None:
+            since = started - INCREMENTAL_OVERLAP
+        else:
+            since = self.get_changes_since(cache)
+        return set(
+            CSVExportInvalidation.objects.filter(
+                created__gte=since, person_id__isnull=True
+            ).values_list('id', flat=True)
+        )
+
+    def all_rows_invalid(self, cache, invalidation_ids):
+        if cache.rows_updated is None:
+            return True
+        handled_invalidation_ids = set(
+            json.loads(cache.handled_invalidation_ids or '[]'))
+        return bool(invalidation_ids - handled_invalidation_ids)
+
+    def output_missing(self, election_slug):
+        return not all(
+            exists(self.get_output_filename(kind, election_slug))
+            for kind in ('all', 'elected')
+        )
+
+    def get_changed_person_ids(self, cache):
+        since = self.get_changes_since(cache)
+        person_ids = set(
+            LoggedAction.objects.filter(
+                created__gte=since, person__isnull=False
+            ).values_list('person_id', flat=True)
+        )
+        person_ids.update(
+            CSVExportInvalidation.objects.filter(
+                created__gte=since, person_id__isnull=False
+            ).values_list('person_id', flat=True)
+        )
+        person_ids.update(
+            Person.objects.filter(updated_at__gte=since) \
+                .values_list('id', flat=True)
+        )
+        person_ids.update(
+            Membership.objects.filter(
+                updated_at__gte=since, person__isnull=False
+            ).values_list('person_id', flat=True)
+        )
+        # Also include anyone who's been deleted (e.g. after being
+        # merged into someone else) since their rows were cached:
+        person_ids.update(
+            cache.rows.exclude(
+                person_id__in=Person.objects.values('id')
+            ).values_list('person_id', flat=True)
+        )
+        return sorted(person_ids)
+
+    def cache_rows(self, cache, rows):
+        """Save each row to the cache as it's passed through"""
+        to_create = []
+        for person_id, election_slug, election_row, all_elections_row in rows:
+            to_create.append(CSVExportCacheRow(
+                cache=cache,
+                person_id=person_id,
+                election_slug=election_slug,
+                election_row=encode_csv_row(election_row),
+                all_elections_row=encode_csv_row(all_elections_row),
+            ))
+            if len(to_create) >= FETCH_AT_A_TIME:
+                CSVExportCacheRow.objects.bulk_create(to_create)
+                to_create = []
+            yield person_id, election_slug, election_row, all_elections_row
+        CSVExportCacheRow.objects.bulk_create(to_create)
+
+    def update_cached_rows(self, cache, person_ids):
+        """Regenerate the cached rows for person_ids
+
+        This returns the set of slugs of elections for which any row
+        has been added, removed or changed."""
+
+        changed_election_slugs = set()
+        for i in range(0, len(person_ids), FETCH_AT_A_TIME):
+            person_ids_chunk = person_ids[i:i + FETCH_AT_A_TIME]
+            cached_rows_qs = cache.rows.filter(person_id__in=person_ids_chunk)
+            old_rows = defaultdict(list)
+            for cached_row in cached_rows_qs:
+                old_rows[(cached_row.person_id, cached_row.election_slug)] \
+                    .append((cached_row.election_row,
+                             cached_row.all_elections_row))
+            new_rows = defaultdict(list)
+            for person_id, election_slug, election_row, all_elections_row in \
+                    self.generate_rows(PersonExtra.objects.filter(
+                        base__id__in=person_ids_chunk)):
+                new_rows[(person_id, election_slug)].append(
+                    (encode_csv_row(election_row),
+                     encode_csv_row(all_elections_row)))
+            for key in set(old_rows.keys()) | set(new_rows.keys()):
+                if sorted(old_rows[key]) != sorted(new_rows[key]):
+                    changed_election_slugs.add(key[1])
+            cached_rows_qs.delete()
+            CSVExportCacheRow.objects.bulk_create([
+                CSVExportCacheRow(
+                    cache=cache,
+                    person_id=person_id,
+                    election_slug=election_slug,
+                    election_row=election_row,
+                    all_elections_row=all_elections_row,
+                )
+                for (person_id, election_slug), encoded_rows in new_rows.items()
+                for election_row, all_elections_row in encoded_rows
+            ])
+        return changed_election_slugs
+
+    def write_files_from_cache(self, cache, election_slugs):
+        spools = self.create_spools(election_slugs)
+        for election_slug in election_slugs:
+            if election_slug is None:
+                encoded_rows = cache.rows.order_by('person_id', 'id') \
+                    .values_list('all_elections_row', flat=True)
+            else:
+                encoded_rows = cache.rows.filter(election_slug=election_slug) \
+                    .order_by('person_id', 'id') \
+                    .values_list('election_row', flat=True)
+            for row in decode_cached_rows(encoded_rows.iterator()):
+                self.add_row(spools, election_slug, row)
+        self.write_files(spools, election_slugs)
@@ -346,11 +346,11 @@ class Command(BaseCommand):
                 self.add_related(
                     p, pmodels.Link, person_data['links']
                 )
-                kwargs = {
-                    'base': p,
-                    'versions': json.dumps(person_data['versions'])
-                }
-                pe = models.PersonExtra.objects.create(**kwargs)
+                models.PersonExtra.objects.create(base=p)
+                models.PersonVersion.objects.bulk_create([
+                    models.PersonVersion.from_dict(p, version)
+                    for version in reversed(person_data['versions'])
+                ])
                 # Look for any data in ExtraFields
                 for extra_field_data in person_data['extra_fields']:
                     p.extra_field_values.create(
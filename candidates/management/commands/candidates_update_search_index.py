@@ -0,0 +1,83 @@
+from __future__ import print_function, unicode_literals
+
+from datetime import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from candidates.models.search_index import (
+    SEARCH_INDEX_BATCH_SIZE, queue_search_index_updates,
+    update_search_index
+)
+from popolo.models import Person
+
+
+def parse_since(value):
+    since = parse_datetime(value)
+    if since is None:
+        since_date = parse_date(value)
+        if since_date is None:
+            raise CommandError(
+                'Unrecognized date or time for --since: {0}'.format(value))
+        since = datetime.combine(since_date, datetime.min.time())
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.get_current_timezone())
+    return since
+
+
+class Command(BaseCommand):
+
+    help = "Send queued changes to people to the search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SEARCH_INDEX_BATCH_SIZE,
+            help='How many queued updates to send to the index at a time'
+        )
+        parser.add_argument(
+            '--since',
+            metavar='DATE-OR-TIME',
+            help='To catch up, first queue everyone who has been edited '
+                 'since this date or time, e.g. if the index has missed '
+                 'some changes'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='To catch up, first queue everyone in the database'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep running, checking for queued updates every "
+                 "--sleep seconds"
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5,
+            help='With --loop, how long to wait when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        verbose = int(options['verbosity']) > 1
+        if options['all'] or options['since']:
+            people = Person.objects.all()
+            if not options['all']:
+                people = people.filter(
+                    updated_at__gte=parse_since(options['since']))
+            person_ids = list(people.values_list('id', flat=True))
+            queue_search_index_updates(person_ids)
+            if verbose:
+                print('Queued {0} people to catch up'.format(len(person_ids)))
+        while True:
+            processed = update_search_index(options['batch_size'])
+            if verbose and processed:
+                print('Processed {0} queued updates'.format(processed))
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
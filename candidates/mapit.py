@@ -1,19 +1,63 @@
 # coding=utf-8
 from __future__ import unicode_literals
 
+import hashlib
+import re
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
 
 from django.conf import settings
 from django.utils.http import urlquote
 from django.core.cache import cache
 from django.utils.six.moves.urllib_parse import urljoin
-from django.utils.translation import ugettext as _
+from django.utils import translation
+from django.utils.translation import ugettext as _, ugettext_noop
 
 from elections.models import AreaType
 
+from compat import text_type
+
+from .local_areas import get_local_area_resolver
+
+# Coordinates are rounded to this many decimal places (about a metre)
+# in cache keys, so that lookups of almost the same point share a
+# cache entry:
+COORDINATES_PRECISION = 5
+
+# While one request is looking up some areas, others that want the
+# same areas wait for its result (for up to AREA_LOOKUP_WAIT_SECONDS)
+# rather than making the same request upstream:
+AREA_LOOKUP_LOCK_SECONDS = 10
+AREA_LOOKUP_WAIT_SECONDS = 5
+AREA_LOOKUP_POLL_SECONDS = 0.05
+
+AREA_LOOKUP_STATS = ('hit', 'negative_hit', 'miss', 'coalesced')
+
+# Give up on a request to MapIt after this long, and on looking up
+# the areas at a point in several generations after this long in all:
+AREA_LOOKUP_TIMEOUT_SECONDS = 5
+AREA_LOOKUPS_DEADLINE_SECONDS = 8
+
+# This is shared so that connections to MapIt are kept open and reused:
+session = requests.Session()
+
 
 class BaseMapItException(Exception):
-    pass
+
+    untranslated_message = None
+    message_args = ()
+
+    @classmethod
+    def translatable(cls, untranslated_message, *args):
+        """Make the exception with a message translated into the current
+        language, keeping the untranslated message so that it can be
+        translated again (see CachedAreaLookupError)"""
+        exception = cls(_(untranslated_message).format(*args))
+        exception.untranslated_message = untranslated_message
+        exception.message_args = args
+        return exception
 
 
 class BadPostcodeException(BaseMapItException):
@@ -28,6 +72,139 @@ class UnknownMapitException(BaseMapItException):
     pass
 
 
+def normalise_postcode(postcode):
+    return re.sub(r'\s+', '', postcode).upper()
+
+
+def normalise_coords(coords):
+    """Round comma-separated coordinates to COORDINATES_PRECISION places
+
+    If they can't be parsed, they're returned unchanged."""
+    try:
+        return ','.join(
+            '{0:.{1}f}'.format(float(c), COORDINATES_PRECISION)
+            for c in coords.split(',')
+        )
+    except ValueError:
+        return coords
+
+
+def get_area_lookup_cache_key(prefix, *parts):
+    """Return a cache key for an area lookup
+
+    The parts should be normalised already; if they contain anything
+    that memcached wouldn't allow in a key (they may come straight
+    from user input), or would make the key too long, they're hashed
+    instead."""
+    key_parts = ':'.join(parts)
+    if len(key_parts) > 200 or re.search(r'[^-A-Za-z0-9_.,:+]', key_parts):
+        key_parts = hashlib.md5(key_parts.encode('utf-8')).hexdigest()
+    return prefix + ':' + key_parts
+
+
+def increment_area_lookup_stat(name):
+    key = 'area-lookup-stats:' + name
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Either this is the first time, or it's a cache (like the
+        # dummy cache) that doesn't store anything:
+        cache.add(key, 1, None)
+
+
+def get_area_lookup_stats():
+    """Return the numbers of hits, misses, etc. of the area lookup cache"""
+    keys = {'area-lookup-stats:' + name: name for name in AREA_LOOKUP_STATS}
+    values = cache.get_many(list(keys.keys()))
+    return {name: values.get(key, 0) for key, name in keys.items()}
+
+
+class CachedAreaLookupError(object):
+    """What's cached for a lookup that raised an exception
+
+    This is the exception's class and message, rather than the
+    exception itself, so that a message made with translatable() is
+    translated into the language of each request that gets it from
+    the cache, not just that of the first one."""
+
+    def __init__(self, exception):
+        self.exception_class = exception.__class__
+        self.args = exception.args
+        self.untranslated_message = exception.untranslated_message
+        self.message_args = exception.message_args
+
+    def make_exception(self):
+        if self.untranslated_message is None:
+            return self.exception_class(*self.args)
+        return self.exception_class.translatable(
+            self.untranslated_message, *self.message_args)
+
+
+def wait_for_area_lookup(cache_key, lock_key):
+    waited = 0
+    while waited < AREA_LOOKUP_WAIT_SECONDS:
+        time.sleep(AREA_LOOKUP_POLL_SECONDS)
+        waited += AREA_LOOKUP_POLL_SECONDS
+        values = cache.get_many([cache_key, lock_key])
+        if cache_key in values:
+            return values[cache_key]
+        if lock_key not in values:
+            # The other lookup must have failed without a result:
+            break
+    return None
+
+
+def cached_area_lookup(cache_key, lookup):
+    """Return the result of lookup(), cached under cache_key
+
+    Successful results are cached for MAPIT_CACHE_SECONDS.  If the
+    lookup raises BadPostcodeException or BadCoordinatesException,
+    that's cached for MAPIT_NEGATIVE_CACHE_SECONDS and raised again
+    for the same lookup, so that bad input isn't sent upstream every
+    time.  If another request is already doing the same lookup, this
+    waits for that result rather than duplicating the request."""
+    locked = False
+    result = cache.get(cache_key)
+    if result is None:
+        lock_key = cache_key + ':lock'
+        locked = cache.add(lock_key, True, AREA_LOOKUP_LOCK_SECONDS)
+        if not locked:
+            result = wait_for_area_lookup(cache_key, lock_key)
+            if result is not None:
+                increment_area_lookup_stat('coalesced')
+    if result is None:
+        increment_area_lookup_stat('miss')
+        try:
+            result = lookup()
+        except (BadPostcodeException, BadCoordinatesException) as e:
+            cache.set(
+                cache_key,
+                CachedAreaLookupError(e),
+                settings.MAPIT_NEGATIVE_CACHE_SECONDS
+            )
+            raise
+        else:
+            cache.set(cache_key, result, settings.MAPIT_CACHE_SECONDS)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        return result
+    if isinstance(result, CachedAreaLookupError):
+        increment_area_lookup_stat('negative_hit')
+        raise result.make_exception()
+    increment_area_lookup_stat('hit')
+    return result
+
+
+def get_from_mapit(url, **kwargs):
+    try:
+        return session.get(
+            url, timeout=AREA_LOOKUP_TIMEOUT_SECONDS, **kwargs)
+    except requests.RequestException as e:
+        raise UnknownMapitException(
+            _('The area lookup failed: {0}').format(e))
+
+
 def fetch_area_ids(**kwargs):
     if kwargs['postcode']:
         areas = get_areas_from_postcode(kwargs['postcode'])
@@ -52,8 +229,12 @@ def format_code_from_area(area):
     return code
 
 
+def get_known_area_type_names():
+    return set(AreaType.objects.values_list('name', flat=True))
+
+
 def get_known_area_types(mapit_result):
-        known_area_types = set(AreaType.objects.values_list('name', flat=True))
+        known_area_types = get_known_area_type_names()
         return [
             (a['type'], str(a['id']))
             for a in mapit_result.values()
@@ -62,63 +243,147 @@ def get_known_area_types(mapit_result):
 
 
 def get_areas_from_postcode(postcode):
-    cache_key = 'mapit-postcode:' + postcode
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
-    url = urljoin(settings.MAPIT_BASE_URL, '/postcode/' + urlquote(postcode))
-    r = requests.get(url)
-    if r.status_code == 200:
-        mapit_result = r.json()
-        areas = get_known_area_types(mapit_result['areas'])
-        cache.set(cache_key, areas, settings.MAPIT_CACHE_SECONDS)
-        return areas
-    elif r.status_code == 400:
-        mapit_result = r.json()
-        raise BadPostcodeException(mapit_result['error'])
-    elif r.status_code == 404:
-        raise BadPostcodeException(
-            _('The postcode “{0}” couldn’t be found').format(
+    resolver = get_local_area_resolver()
+    if resolver is not None:
+        local_result = resolver.areas_for_postcode(
+            postcode, get_known_area_type_names())
+        if local_result is not None:
+            return get_known_area_types(local_result)
+
+    def lookup():
+        url = urljoin(
+            settings.MAPIT_BASE_URL, '/postcode/' + urlquote(postcode))
+        r = get_from_mapit(url)
+        if r.status_code == 200:
+            mapit_result = r.json()
+            return get_known_area_types(mapit_result['areas'])
+        elif r.status_code == 400:
+            mapit_result = r.json()
+            raise BadPostcodeException(mapit_result['error'])
+        elif r.status_code == 404:
+            raise BadPostcodeException.translatable(
+                ugettext_noop('The postcode “{0}” couldn’t be found'),
                 postcode
             )
-        )
-    else:
-        raise UnknownMapitException(
-            _('Unknown MapIt error for postcode "{0}"').format(
-                postcode
+        else:
+            raise UnknownMapitException(
+                _('Unknown MapIt error for postcode "{0}"').format(
+                    postcode
+                )
             )
-        )
+
+    cache_key = get_area_lookup_cache_key(
+        'mapit-postcode', normalise_postcode(postcode))
+    return cached_area_lookup(cache_key, lookup)
 
 
 def get_areas_from_coords(coords):
-    url = urljoin(
-        settings.MAPIT_BASE_URL,
-        '/point/4326/' + urlquote(coords)
-        )
+    resolver = get_local_area_resolver()
+    if resolver is not None:
+        local_result = resolver.areas_at_coords(
+            coords, area_types=get_known_area_type_names())
+        if local_result:
+            return get_known_area_types(local_result)
 
-    cache_key = 'mapit-postcode:' + coords
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
-
-    r = requests.get(url)
-    if r.status_code == 200:
-        mapit_result = r.json()
-        areas = get_known_area_types(mapit_result)
-        cache.set(url, areas, settings.MAPIT_CACHE_SECONDS)
-        return areas
-    elif r.status_code == 400:
-        mapit_result = r.json()
-        raise BadCoordinatesException(mapit_result['error'])
-    elif r.status_code == 404:
-        raise BadCoordinatesException(
-            'The coordinates "{0}" could not be found'.format(
-                coords
-            )
+    def lookup():
+        url = urljoin(
+            settings.MAPIT_BASE_URL,
+            '/point/4326/' + urlquote(coords)
         )
-    else:
-        raise UnknownMapitException(
-            'Unknown MapIt error for coordinates "{0}"'.format(
-                coords
+        r = get_from_mapit(url)
+        if r.status_code == 200:
+            mapit_result = r.json()
+            return get_known_area_types(mapit_result)
+        elif r.status_code == 400:
+            mapit_result = r.json()
+            raise BadCoordinatesException(mapit_result['error'])
+        elif r.status_code == 404:
+            raise BadCoordinatesException(
+                'The coordinates "{0}" could not be found'.format(
+                    coords
+                )
+            )
+        else:
+            raise UnknownMapitException(
+                'Unknown MapIt error for coordinates "{0}"'.format(
+                    coords
+                )
             )
+
+    cache_key = get_area_lookup_cache_key(
+        'mapit-coords', normalise_coords(coords))
+    return cached_area_lookup(cache_key, lookup)
+
+
+def get_areas_from_point(lon, lat, area_types, generation):
+    """Return MapIt's areas of some types and generation at a point
+
+    This is the JSON of MapIt's result, a dictionary mapping each
+    area's ID to its details.  If MapIt returns an error, this raises
+    BadCoordinatesException with that error message.  If there are
+    local boundaries of areas of every one of area_types at the
+    point, those are returned instead, whatever the generation."""
+    resolver = get_local_area_resolver()
+    if resolver is not None:
+        local_result = resolver.areas_at_point(lon, lat, area_types)
+        local_area_types = set(a['type'] for a in local_result.values())
+        if local_result and set(area_types) <= local_area_types:
+            return local_result
+
+    def lookup():
+        url = urljoin(
+            settings.MAPIT_BASE_URL,
+            'point/4326/{lon},{lat}'.format(lon=lon, lat=lat)
         )
+        url += '?type=' + ','.join(area_types)
+        url += '&generation={0}'.format(generation)
+        mapit_json = get_from_mapit(
+            url, headers={'User-Agent': 'scraper/sym', }).json()
+        if 'error' in mapit_json:
+            raise BadCoordinatesException(mapit_json['error'])
+        return mapit_json
+
+    cache_key = get_area_lookup_cache_key(
+        'mapit-point',
+        normalise_coords('{0},{1}'.format(lon, lat)),
+        ','.join(sorted(area_types)),
+        text_type(generation),
+    )
+    return cached_area_lookup(cache_key, lookup)
+
+
+def get_areas_from_point_in_generations(lon, lat, generations_and_types):
+    """Look up the areas at a point in several generations at once
+
+    generations_and_types is a list of (generation, area types)
+    tuples; this returns a list of the results of get_areas_from_point
+    for each of them.  The lookups are made concurrently, so this
+    only takes as long as the slowest of them.  If any of them fails,
+    or they haven't all finished within AREA_LOOKUPS_DEADLINE_SECONDS,
+    this raises an exception."""
+    if len(generations_and_types) < 2:
+        return [
+            get_areas_from_point(lon, lat, area_types, generation)
+            for generation, area_types in generations_and_types
+        ]
+    # The active language is per thread, so set this request's
+    # language in each thread too, for any error messages:
+    language = translation.get_language()
+
+    def lookup(area_types, generation):
+        with translation.override(language):
+            return get_areas_from_point(lon, lat, area_types, generation)
+
+    executor = ThreadPoolExecutor(max_workers=len(generations_and_types))
+    try:
+        futures = [
+            executor.submit(lookup, area_types, generation)
+            for generation, area_types in generations_and_types
+        ]
+        done, not_done = wait(futures, timeout=AREA_LOOKUPS_DEADLINE_SECONDS)
+        if not_done:
+            raise UnknownMapitException(_('The area lookup timed out'))
+        return [future.result() for future in futures]
+    finally:
+        # Don't wait for any lookups that timed out:
+        executor.shutdown(wait=False)
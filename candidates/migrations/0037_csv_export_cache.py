@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0036_postextra_election_unique_togther'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CSVExportCache',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('site_base_url', models.CharField(unique=True, max_length=512, blank=True)),
+                ('rows_updated', models.DateTimeField(null=True, blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CSVExportCacheRow',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('person_id', models.IntegerField()),
+                ('election_slug', models.CharField(max_length=128)),
+                ('election_row', models.TextField()),
+                ('all_elections_row', models.TextField()),
+                ('cache', models.ForeignKey(related_name='rows', to='candidates.CSVExportCache')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='csvexportcacherow',
+            index_together=set([('cache', 'person_id'), ('cache', 'election_slug')]),
+        ),
+    ]
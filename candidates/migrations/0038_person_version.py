@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popolo', '0002_update_models_from_upstream'),
+        ('candidates', '0037_csv_export_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonVersion',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('version_id', models.CharField(max_length=32, db_index=True)),
+                ('timestamp', models.DateTimeField()),
+                ('username', models.CharField(max_length=150, blank=True)),
+                ('information_source', models.TextField(blank=True)),
+                ('data', models.TextField()),
+                ('person', models.ForeignKey(related_name='versions', to='popolo.Person')),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, unicode_literals
+
+from datetime import datetime
+import json
+
+from django.db import migrations
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+# The timestamp given to a version if none of a person's versions
+# have one that can be parsed:
+DEFAULT_TIMESTAMP = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_timestamp(timestamp):
+    """Return the timestamp of a version as a datetime, or None if it's
+    missing or malformed"""
+    try:
+        parsed = parse_datetime(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def get_timestamps(person_id, versions):
+    """Return the timestamps of versions, oldest first
+
+    A version whose timestamp is missing or malformed is given the
+    timestamp of the version before it (or, if it's the oldest, the
+    first one after it that has one), so that it stays in the same
+    place in the history."""
+    timestamps = []
+    for version in versions:
+        timestamp = parse_timestamp(version.get('timestamp'))
+        if timestamp is None:
+            print(
+                "Bad timestamp {0!r} in version {1} of person {2}".format(
+                    version.get('timestamp'), version.get('version_id'),
+                    person_id))
+        timestamps.append(timestamp)
+    default = next(
+        (timestamp for timestamp in timestamps if timestamp is not None),
+        DEFAULT_TIMESTAMP)
+    for i, timestamp in enumerate(timestamps):
+        if timestamp is None:
+            timestamps[i] = timestamps[i - 1] if i else default
+    return timestamps
+
+
+def versions_to_table(apps, schema_editor):
+    PersonExtra = apps.get_model('candidates', 'PersonExtra')
+    PersonVersion = apps.get_model('candidates', 'PersonVersion')
+    person_extras = PersonExtra.objects.exclude(versions='') \
+        .only('base_id', 'versions')
+    for person_extra in person_extras.iterator():
+        # The versions are stored most recent first; create them in
+        # the reverse order so that the primary keys reflect the order
+        # they were recorded in:
+        versions = list(reversed(json.loads(person_extra.versions)))
+        timestamps = get_timestamps(person_extra.base_id, versions)
+        PersonVersion.objects.bulk_create([
+            PersonVersion(
+                person_id=person_extra.base_id,
+                version_id=version['version_id'],
+                timestamp=timestamp,
+                username=version.get('username') or '',
+                information_source=version.get('information_source', ''),
+                data=json.dumps(version['data']),
+            )
+            for version, timestamp in zip(versions, timestamps)
+        ])
+
+
+def table_to_versions(apps, schema_editor):
+    PersonExtra = apps.get_model('candidates', 'PersonExtra')
+    PersonVersion = apps.get_model('candidates', 'PersonVersion')
+    for person_extra in PersonExtra.objects.iterator():
+        versions = []
+        person_versions = PersonVersion.objects \
+            .filter(person_id=person_extra.base_id).order_by('-id')
+        for person_version in person_versions:
+            version = {
+                'version_id': person_version.version_id,
+                'timestamp': timezone.make_naive(
+                    person_version.timestamp, timezone.utc
+                ).strftime('%Y-%m-%dT%H:%M:%S.%f'),
+                'information_source': person_version.information_source,
+                'data': json.loads(person_version.data),
+            }
+            if person_version.username:
+                version['username'] = person_version.username
+            versions.append(version)
+        person_extra.versions = json.dumps(versions)
+        person_extra.save()
+    PersonVersion.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0038_person_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            versions_to_table,
+            table_to_versions,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0039_migrate_person_versions'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='personextra',
+            name='versions',
+        ),
+    ]
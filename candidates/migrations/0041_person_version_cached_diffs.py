@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0040_remove_personextra_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='personversion',
+            name='cached_diffs',
+            field=models.TextField(blank=True),
+        ),
+    ]
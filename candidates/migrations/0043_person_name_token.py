@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def create_token_index(apps, schema_editor):
+    # Prefix searches on token find the person_id in the same index.
+    # On PostgreSQL, the index needs varchar_pattern_ops to be used
+    # for LIKE 'prefix%' unless the database's collation is "C":
+    if schema_editor.connection.vendor == 'postgresql':
+        opclass = ' varchar_pattern_ops'
+    else:
+        opclass = ''
+    schema_editor.execute(
+        'CREATE INDEX candidates_personnametoken_token_person_id '
+        'ON candidates_personnametoken (token{0}, person_id)'.format(opclass)
+    )
+
+
+def drop_token_index(apps, schema_editor):
+    schema_editor.execute(
+        'DROP INDEX candidates_personnametoken_token_person_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popolo', '0002_update_models_from_upstream'),
+        ('candidates', '0042_search_index_update'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonNameToken',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('token', models.CharField(max_length=512)),
+                ('person', models.ForeignKey(related_name='name_tokens', to='popolo.Person')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='personnametoken',
+            unique_together=set([('person', 'token')]),
+        ),
+        migrations.RunPython(create_token_index, drop_token_index),
+    ]
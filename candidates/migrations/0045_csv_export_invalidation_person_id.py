@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0044_csv_export_invalidation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvexportinvalidation',
+            name='person_id',
+            field=models.IntegerField(null=True, blank=True),
+        ),
+    ]
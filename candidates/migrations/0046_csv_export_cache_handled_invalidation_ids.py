@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidates', '0045_csv_export_invalidation_person_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvexportcache',
+            name='handled_invalidation_ids',
+            field=models.TextField(blank=True),
+        ),
+    ]
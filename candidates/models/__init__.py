@@ -1,6 +1,7 @@
 from .auth import get_constituency_lock
 from .auth import get_constituency_lock_from_person_data
 from .auth import get_edits_allowed
+from .auth import get_locked_post_elections
 from .auth import is_post_locked
 
 from .constraints import check_constraints
@@ -12,6 +13,7 @@ from .merge import merge_popit_people
 from .popolo_extra import AreaExtra
 from .popolo_extra import MultipleTwitterIdentifiers
 from .popolo_extra import PersonExtra
+from .popolo_extra import PersonVersion
 from .popolo_extra import OrganizationExtra
 from .popolo_extra import PostExtra
 from .popolo_extra import MembershipExtra
@@ -31,6 +33,21 @@ from .db import LoggedAction
 from .db import PersonRedirect
 from .db import UserTermsAgreement
 
+from .csv_cache import CSVExportCache
+from .csv_cache import CSVExportCacheRow
+from .csv_cache import CSVExportInvalidation
+
+from .search_index import SearchIndexUpdate
+
+from .name_search import PersonNameToken
+from .name_search import search_people_in_database
+from .name_search import search_people_by_names_in_database
+
+from .postcode_cache import POSTCODE_RESULTS_CACHE_SECONDS
+from .postcode_cache import POSTCODE_RESULTS_VERSION_CACHE_KEY
+from .postcode_cache import get_candidates_cache_key
+from .postcode_cache import get_post_elections_cache_key
+
 from .needs_review import needs_review_fns
 
 from .auth import TRUSTED_TO_MERGE_GROUP_NAME
@@ -4,13 +4,14 @@ from collections import defaultdict
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.utils.six.moves.urllib_parse import urljoin
 from django.utils.text import slugify
 from django.utils.translation import ugettext as _
 
 from pygeocoder import Geocoder, GeocoderError
-import requests
 
+from candidates.mapit import (
+    BaseMapItException, get_areas_from_point_in_generations
+)
 from elections.models import Election
 
 # We use this both for validation of address and the results of the
@@ -34,19 +35,19 @@ def check_address(address_string, country=None):
     for election in Election.objects.current().prefetch_related('area_types'):
         area_types = election.area_types.values_list('name', flat=True)
         queries_to_try[election.area_generation].update(area_types)
-    for area_generation, area_types in queries_to_try.items():
-        mapit_lookup_url = urljoin(settings.MAPIT_BASE_URL,
-                                   'point/4326/{lon},{lat}'.format(
-                                       lon=lon,
-                                       lat=lat,
-                                       ))
-        mapit_lookup_url += '?type=' + ','.join(area_types)
-        mapit_lookup_url += '&generation={0}'.format(election.area_generation)
-        mapit_result = requests.get(mapit_lookup_url, headers={'User-Agent': 'scraper/sym', })
-        mapit_json = mapit_result.json()
-        if 'error' in mapit_json:
-            message = _("The area lookup returned an error: '{error}'")
-            raise ValidationError(message.format(error=mapit_json['error']))
+    try:
+        mapit_results = get_areas_from_point_in_generations(
+            lon,
+            lat,
+            [
+                (area_generation, sorted(area_types))
+                for area_generation, area_types in queries_to_try.items()
+            ]
+        )
+    except BaseMapItException as e:
+        message = _("The area lookup returned an error: '{error}'")
+        raise ValidationError(message.format(error=e))
+    for mapit_json in mapit_results:
         all_mapit_json += mapit_json.items()
     sorted_mapit_results = sorted(
         all_mapit_json,
@@ -5,6 +5,8 @@ from django.utils.translation import ugettext as _
 
 from auth_helpers.views import user_in_group
 
+from .popolo_extra import PostExtraElection
+
 TRUSTED_TO_MERGE_GROUP_NAME = 'Trusted To Merge'
 TRUSTED_TO_LOCK_GROUP_NAME = 'Trusted To Lock'
 TRUSTED_TO_RENAME_GROUP_NAME = 'Trusted To Rename'
@@ -16,7 +18,34 @@ class NameChangeDisallowedException(Exception):
 class ChangeToLockedConstituencyDisallowedException(Exception):
     pass
 
-def is_post_locked(post, election):
+def get_locked_post_elections(posts_and_elections):
+    """Return which of some (post, election) pairs have candidates locked
+
+    The result is a set of (post ID, election ID) tuples, found with a
+    single query, which can be passed to is_post_locked (or
+    get_constituency_lock) to check each pair without any further
+    queries.  Pairs without a post are ignored, as get_constituency_lock
+    never treats them as locked."""
+    post_ids = set()
+    election_ids = set()
+    for post, election in posts_and_elections:
+        if post is None:
+            continue
+        post_ids.add(post.id)
+        election_ids.add(election.id)
+    if not post_ids:
+        return set()
+    return set(
+        PostExtraElection.objects.filter(
+            postextra__base_id__in=post_ids,
+            election_id__in=election_ids,
+            candidates_locked=True,
+        ).values_list('postextra__base_id', 'election_id')
+    )
+
+def is_post_locked(post, election, locked_post_elections=None):
+    if locked_post_elections is not None:
+        return (post.id, election.id) in locked_post_elections
     return post.extra.postextraelection_set.filter(
         election=election,
         candidates_locked=True,
@@ -35,29 +64,34 @@ def get_constituency_lock_from_person_data(user, api, election, person_popit_dat
 
 def get_edits_allowed(user, candidates_locked):
     return user.is_authenticated() and (
-        user_in_group(user, TRUSTED_TO_LOCK_GROUP_NAME) or
-        (not candidates_locked)
+        (not candidates_locked) or
+        user_in_group(user, TRUSTED_TO_LOCK_GROUP_NAME)
     )
 
-def get_constituency_lock(user, post, election):
+def get_constituency_lock(user, post, election, locked_post_elections=None):
     """Return whether the constituency is locked and whether this user can edit
 
     You should make sure that 'extra' is populated on the post that's
-    passed in to avoid an extra query."""
+    passed in to avoid an extra query, or pass in the result of
+    get_locked_post_elections as locked_post_elections."""
 
     if post is None:
         return False, True
     # Use the cached version because it'll be faster than going to
     # PopIt, even if it brings in embeds that we don't need:
-    candidates_locked = is_post_locked(post, election)
+    candidates_locked = is_post_locked(post, election, locked_post_elections)
     edits_allowed = get_edits_allowed(user, candidates_locked)
     return candidates_locked, edits_allowed
 
 def check_creation_allowed(user, new_candidacies):
-    for candidacy in new_candidacies:
-        post = candidacy.post
-        election = candidacy.extra.election
-        dummy, edits_allowed = get_constituency_lock(user, post, election)
+    posts_and_elections = [
+        (candidacy.post, candidacy.extra.election)
+        for candidacy in new_candidacies
+    ]
+    locked_post_elections = get_locked_post_elections(posts_and_elections)
+    for post, election in posts_and_elections:
+        dummy, edits_allowed = get_constituency_lock(
+            user, post, election, locked_post_elections)
         if not edits_allowed:
             raise ChangeToLockedConstituencyDisallowedException(
                 _("The candidates for this post are locked now")
@@ -78,8 +112,10 @@ def check_update_allowed(user, old_name, old_candidacies, new_name, new_candidac
     # joining were locked:
     old_posts = set((c.post, c.extra.election) for c in old_candidacies)
     new_posts = set((c.post, c.extra.election) for c in new_candidacies)
+    locked_post_elections = get_locked_post_elections(old_posts | new_posts)
     for post, election in old_posts ^ new_posts:
-        dummy, edits_allowed = get_constituency_lock(user, post, election)
+        dummy, edits_allowed = get_constituency_lock(
+            user, post, election, locked_post_elections)
         if not edits_allowed:
             raise ChangeToLockedConstituencyDisallowedException(
                 _("That update isn't allowed because candidates for a locked "
@@ -92,7 +128,8 @@ def check_update_allowed(user, old_name, old_candidacies, new_name, new_candidac
     for post, election in old_posts & new_posts:
         old_party = next(c.on_behalf_of for c in old_candidacies if c.post == post)
         new_party = next(c.on_behalf_of for c in new_candidacies if c.post == post)
-        dummy, edits_allowed = get_constituency_lock(user, post, election)
+        dummy, edits_allowed = get_constituency_lock(
+            user, post, election, locked_post_elections)
         if not edits_allowed and (old_party != new_party):
             raise ChangeToLockedConstituencyDisallowedException(
                 _("That update isn't allowed because you can't change the party "
@@ -0,0 +1,141 @@
+from __future__ import unicode_literals
+
+import json
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+
+from elections.models import Election
+from images.models import Image
+from popolo.models import Area, Identifier, Organization, Person, Post
+
+from .popolo_extra import (
+    ImageExtra, OrganizationExtra, PersonExtra, PostExtra
+)
+
+
+def encode_csv_row(row):
+    # Sort the keys so that the encoded rows can be compared to tell
+    # whether anything in them has changed:
+    return json.dumps(row, cls=DjangoJSONEncoder, sort_keys=True)
+
+
+class CSVExportCache(models.Model):
+    '''The state of the rows cached for candidates_create_csv --incremental
+
+    The CSV rows include image URLs that depend on the base URL of the
+    site, so there is one of these for each base URL that the command
+    has been run with. rows_updated is the time that the last
+    incremental run started; anyone who has been edited since then
+    (or shortly before, in case of changes that hadn't been committed
+    when it looked) will have their rows regenerated on the next run.
+    If there's been a CSVExportInvalidation for no particular person
+    since then, everyone's will be, unless its ID is in
+    handled_invalidation_ids, the JSON list of those the last run had
+    already seen.'''
+
+    site_base_url = models.CharField(max_length=512, blank=True, unique=True)
+    rows_updated = models.DateTimeField(blank=True, null=True)
+    handled_invalidation_ids = models.TextField(blank=True)
+
+
+class CSVExportCacheRow(models.Model):
+    '''The cached CSV rows for a single candidacy
+
+    The rows for a candidacy differ between the per-election CSV file
+    and the file for all elections (in the election-specific extra
+    fields) so both are stored, as JSON.'''
+
+    cache = models.ForeignKey(CSVExportCache, related_name='rows')
+    person_id = models.IntegerField()
+    election_slug = models.CharField(max_length=128)
+    election_row = models.TextField()
+    all_elections_row = models.TextField()
+
+    class Meta:
+        index_together = [
+            ('cache', 'person_id'),
+            ('cache', 'election_slug'),
+        ]
+
+
+class CSVExportInvalidation(models.Model):
+    '''A change that might affect the cached CSV rows
+
+    The rows include the names of elections, parties and posts, and
+    details of people's images and identifiers, none of which changes
+    to are logged against the people affected.  So when one of those
+    is saved or deleted, one of these is created, and the next
+    incremental run of candidates_create_csv regenerates the rows
+    affected: if person_id is set (for a person's own images and
+    identifiers) just that person's rows, and otherwise every row.
+    (Rather than clearing CSVExportCache.rows_updated, which would
+    have to wait for any incremental run in progress, since that
+    locks the row.)'''
+
+    created = models.DateTimeField(auto_now_add=True)
+    person_id = models.IntegerField(blank=True, null=True)
+
+
+def invalidate_csv_export_cache(sender, instance, **kwargs):
+    CSVExportInvalidation.objects.create()
+
+
+def invalidate_csv_export_rows_for_object(content_type_id, object_id):
+    '''Invalidate the rows affected by an image or identifier of an object
+
+    If the object is a person, that's only their rows.'''
+    if content_type_id is None or object_id is None:
+        return
+    model = ContentType.objects.get_for_id(content_type_id).model_class()
+    if model is Person:
+        person_id = object_id
+    elif model is PersonExtra:
+        person_id = PersonExtra.objects.filter(pk=object_id) \
+            .values_list('base_id', flat=True).first()
+        if person_id is None:
+            # The person has been deleted, and their rows will be
+            # removed anyway:
+            return
+    else:
+        CSVExportInvalidation.objects.create()
+        return
+    CSVExportInvalidation.objects.create(person_id=person_id)
+
+
+def invalidate_csv_export_rows_for_generic(sender, instance, **kwargs):
+    invalidate_csv_export_rows_for_object(
+        instance.content_type_id, instance.object_id)
+
+
+def invalidate_csv_export_rows_for_image_extra(sender, instance, **kwargs):
+    image = Image.objects.filter(pk=instance.base_id) \
+        .values('content_type_id', 'object_id').first()
+    # If the image itself has been deleted, that invalidates the rows:
+    if image is not None:
+        invalidate_csv_export_rows_for_object(
+            image['content_type_id'], image['object_id'])
+
+
+post_save.connect(invalidate_csv_export_cache, sender=Area)
+post_delete.connect(invalidate_csv_export_cache, sender=Area)
+post_save.connect(invalidate_csv_export_cache, sender=Election)
+post_delete.connect(invalidate_csv_export_cache, sender=Election)
+post_save.connect(invalidate_csv_export_rows_for_generic, sender=Identifier)
+post_delete.connect(invalidate_csv_export_rows_for_generic, sender=Identifier)
+post_save.connect(invalidate_csv_export_rows_for_generic, sender=Image)
+post_delete.connect(invalidate_csv_export_rows_for_generic, sender=Image)
+post_save.connect(
+    invalidate_csv_export_rows_for_image_extra, sender=ImageExtra)
+post_delete.connect(
+    invalidate_csv_export_rows_for_image_extra, sender=ImageExtra)
+post_save.connect(invalidate_csv_export_cache, sender=Organization)
+post_delete.connect(invalidate_csv_export_cache, sender=Organization)
+post_save.connect(invalidate_csv_export_cache, sender=OrganizationExtra)
+post_delete.connect(invalidate_csv_export_cache, sender=OrganizationExtra)
+post_save.connect(invalidate_csv_export_cache, sender=Post)
+post_delete.connect(invalidate_csv_export_cache, sender=Post)
+post_save.connect(invalidate_csv_export_cache, sender=PostExtra)
+post_delete.connect(invalidate_csv_export_cache, sender=PostExtra)
@@ -40,8 +40,8 @@ class LoggedActionQuerySet(models.QuerySet):
 class LoggedAction(models.Model):
     '''A model for logging the actions of users on the site
 
-    We record the changes that have been made to a person in PopIt in
-    that person's 'versions' field, but is not much help for queries
+    We record the changes that have been made to a person as
+    PersonVersion objects, but that is not much help for queries
     like "what has John Q User been doing on the site?". The
     LoggedAction model makes that kind of query easy, however, and
     should be helpful in tracking down both bugs and the actions of
@@ -1,20 +1,57 @@
 from __future__ import unicode_literals
 
+from collections import OrderedDict
+
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 
 from popolo.models import Person
 
 from compat import python_2_unicode_compatible
 
+from ..cache import get_cache_version, invalidate_cache_version
+
+
+FIELD_DEFINITIONS_VERSION_CACHE_KEY = 'person_field_definitions_version'
+
+# The field definitions loaded by this process, as a mapping from the
+# model to a (version, list of definitions) tuple:
+_loaded_field_definitions = {}
+
+
+def invalidate_field_definitions(sender, **kwargs):
+    _loaded_field_definitions.clear()
+    invalidate_cache_version(FIELD_DEFINITIONS_VERSION_CACHE_KEY)
+
+
+class FieldDefinitionManager(models.Manager):
+
+    def cached(self):
+        """Return a list of all the field definitions, in order
+
+        The definitions are only fetched from the database once per
+        process, and again whenever any of them is saved or deleted
+        (in this or any other process), so this doesn't usually need a
+        query.  The objects returned are shared, so don't modify them."""
+        version = get_cache_version(FIELD_DEFINITIONS_VERSION_CACHE_KEY)
+        loaded_version, definitions = \
+            _loaded_field_definitions.get(self.model, (None, None))
+        if version is None or version != loaded_version:
+            definitions = list(self.all())
+            _loaded_field_definitions[self.model] = (version, definitions)
+        return list(definitions)
+
 
 def get_complex_popolo_fields():
     """Return a mapping of field name to ComplexField object
 
     This returns a dict mapping the name of the field to the
     ComplexField object which defines where the value is stored in the
-    django-popolo models
+    django-popolo models, in the order the fields should be shown.
     """
-    return {cf.name: cf for cf in ComplexPopoloField.objects.all()}
+    return OrderedDict(
+        (cf.name, cf) for cf in ComplexPopoloField.objects.cached()
+    )
 
 
 @python_2_unicode_compatible
@@ -23,6 +60,8 @@ class SimplePopoloField(models.Model):
     class Meta:
         ordering = ('order',)
 
+    objects = FieldDefinitionManager()
+
     VALID_FIELDS = (
         ('name', 'Name'),
         ('family_name', 'Family Name'),
@@ -81,6 +120,8 @@ class ComplexPopoloField(models.Model):
     class Meta:
         ordering = ('order',)
 
+    objects = FieldDefinitionManager()
+
     VALID_ARRAYS = (
         ('links', 'Links'),
         ('contact_details', 'Contact Details'),
@@ -139,6 +180,8 @@ class ExtraField(models.Model):
     class Meta:
         ordering = ('order',)
 
+    objects = FieldDefinitionManager()
+
     LINE = 'line'
     LONGER_TEXT = 'longer-text'
     URL = 'url'
@@ -171,3 +214,11 @@ class PersonExtraFieldValue(models.Model):
     person = models.ForeignKey(Person, related_name='extra_field_values')
     field = models.ForeignKey(ExtraField)
     value = models.TextField(blank=True)
+
+
+post_save.connect(invalidate_field_definitions, sender=SimplePopoloField)
+post_delete.connect(invalidate_field_definitions, sender=SimplePopoloField)
+post_save.connect(invalidate_field_definitions, sender=ComplexPopoloField)
+post_delete.connect(invalidate_field_definitions, sender=ComplexPopoloField)
+post_save.connect(invalidate_field_definitions, sender=ExtraField)
+post_delete.connect(invalidate_field_definitions, sender=ExtraField)
@@ -0,0 +1,198 @@
+from __future__ import unicode_literals
+
+import re
+
+from django.db import connection, models
+from django.utils.six.moves import html_parser
+
+from popolo.models import Person
+
+from ..utils import strip_accents
+
+# Query tokens shorter than this only match whole words, since a
+# prefix that short would match a large part of the table:
+MINIMUM_PREFIX_LENGTH = 2
+
+# Nobody looks through more results than this:
+MAXIMUM_RESULTS = 200
+
+
+def get_name_tokens(name):
+    '''Split a name into accent-stripped, lower-cased words
+
+    Names from the search form may have been HTML-escaped (e.g. an
+    apostrophe as &#39;) so they're unescaped first.'''
+    name = strip_accents(html_parser.HTMLParser().unescape(name)).lower()
+    tokens = []
+    for token in re.findall(r'[^\W_]+', name, re.UNICODE):
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+class PersonNameToken(models.Model):
+    '''A word from one of the names of a person, for name searches
+
+    These are only kept up to date when the database search backend
+    is in use (SEARCH_BACKEND: 'database'), and are updated along
+    with the search index from the queue in SearchIndexUpdate.  The
+    index for prefix matches on token (which includes person_id, so
+    the table itself needn't be read) is created in the migration.'''
+
+    person = models.ForeignKey(Person, related_name='name_tokens')
+    token = models.CharField(max_length=512)
+
+    class Meta:
+        unique_together = ('person', 'token')
+
+
+def get_person_name_tokens(person):
+    names = [
+        person.name, person.given_name, person.family_name,
+        person.additional_name
+    ]
+    names += [other_name.name for other_name in person.other_names.all()]
+    tokens = set()
+    for name in names:
+        tokens.update(get_name_tokens(name or ''))
+    return tokens
+
+
+def update_person_name_tokens(people):
+    PersonNameToken.objects.filter(person__in=people).delete()
+    PersonNameToken.objects.bulk_create([
+        PersonNameToken(person=person, token=token)
+        for person in people
+        for token in sorted(get_person_name_tokens(person))
+    ])
+
+
+def get_token_pattern(token):
+    # Tokens only contain letters and digits, so they can't contain
+    # any of LIKE's special characters:
+    if len(token) < MINIMUM_PREFIX_LENGTH:
+        return token
+    return token + '%'
+
+
+class PersonNameSearchResult(object):
+    '''A person found by search_people_in_database
+
+    This has the attributes of haystack's SearchResult that the
+    search page and bulk adding use.'''
+
+    def __init__(self, person):
+        self.object = person
+        self.pk = person.pk
+        self.name = person.name
+
+
+class PersonNameSearchResults(object):
+    '''The results of search_people_in_database, in order
+
+    Like a SearchQuerySet, this can be paginated or sliced, and only
+    the people in the slice are fetched.'''
+
+    def __init__(self, person_ids):
+        self.person_ids = person_ids
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, k):
+        if not isinstance(k, slice):
+            return self[k:(k + 1) or None][0]
+        person_ids = self.person_ids[k]
+        people = Person.objects.select_related('extra').in_bulk(person_ids)
+        return [
+            PersonNameSearchResult(people[person_id])
+            for person_id in person_ids
+        ]
+
+
+def get_name_search_sql(tokens, limit):
+    '''Return SQL and parameters to find the IDs of the people matching tokens
+
+    Each word's matching tokens are found with a separate scan of the
+    index on (token, person_id), and then ranked; result_number is
+    each person's position in that ranking, starting from 1.'''
+    matches_sql = ' UNION ALL '.join(
+        '''SELECT person_id, {0} AS word,
+             CASE WHEN token = %s THEN {0} END AS exact_word
+           FROM candidates_personnametoken WHERE token LIKE %s'''.format(i)
+        for i in range(len(tokens))
+    )
+    ordering_sql = '''COUNT(DISTINCT word) DESC,
+    COUNT(DISTINCT exact_word) DESC, person_id'''
+    sql = '''
+SELECT person_id, ROW_NUMBER() OVER (ORDER BY {ordering_sql}) AS result_number
+  FROM ({matches_sql}) AS matches
+  GROUP BY person_id
+  HAVING MAX(CASE WHEN word = 0 THEN 1 ELSE 0 END) = 1
+    AND MAX(CASE WHEN word = %s THEN 1 ELSE 0 END) = 1
+  ORDER BY {ordering_sql}
+  LIMIT %s
+    '''.format(matches_sql=matches_sql, ordering_sql=ordering_sql)
+    parameters = [
+        parameter
+        for token in tokens
+        for parameter in (token, get_token_pattern(token))
+    ] + [len(tokens) - 1, limit]
+    return sql, parameters
+
+
+def search_people_in_database(name):
+    '''Find people with a name like name, best matches first
+
+    Each word in name matches any of a person's names that starts
+    with it.  As with search_person_by_name, if there are more than
+    two words a person only needs to match the first and last of
+    them; those who match more words, and whole words, are ranked
+    higher.'''
+    tokens = get_name_tokens(name)
+    if not tokens:
+        return PersonNameSearchResults([])
+    sql, parameters = get_name_search_sql(tokens, MAXIMUM_RESULTS)
+    cursor = connection.cursor()
+    cursor.execute(sql, parameters)
+    return PersonNameSearchResults([row[0] for row in cursor.fetchall()])
+
+
+def search_people_by_names_in_database(names, limit):
+    '''Find the best limit matches for each of names in one query
+
+    Returns a dict mapping each name to a list of
+    PersonNameSearchResult, as search_people_in_database would have
+    found for it.'''
+    results = {name: [] for name in names}
+    searches_sql = []
+    parameters = []
+    for name_index, name in enumerate(names):
+        tokens = get_name_tokens(name)
+        if not tokens:
+            continue
+        sql, search_parameters = get_name_search_sql(tokens, limit)
+        searches_sql.append(
+            'SELECT {0} AS name_index, person_id, result_number '
+            'FROM ({1}) AS search_{0}'.format(name_index, sql)
+        )
+        parameters += search_parameters
+    if not searches_sql:
+        return results
+    cursor = connection.cursor()
+    cursor.execute(
+        'SELECT name_index, person_id FROM ({0}) AS searches '
+        'ORDER BY name_index, result_number'.format(
+            ' UNION ALL '.join(searches_sql)),
+        parameters
+    )
+    rows = cursor.fetchall()
+    people = Person.objects.select_related('extra').in_bulk(
+        set(person_id for name_index, person_id in rows))
+    for name_index, person_id in rows:
+        results[names[name_index]].append(
+            PersonNameSearchResult(people[person_id]))
+    return results
@@ -1,5 +1,6 @@
 from __future__ import unicode_literals
 
+from collections import defaultdict
 from datetime import date
 import json
 from os.path import join
@@ -8,12 +9,15 @@ import re
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.storage import FileSystemStorage
 from django.core.urlresolvers import reverse
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.utils.functional import cached_property
-from django.utils.translation import ugettext as _
+from django.utils.translation import get_language, ugettext as _
 from django.utils.translation import ugettext_lazy as _l
 from django.utils.six.moves.urllib_parse import urljoin, quote_plus
 
@@ -23,18 +27,26 @@ from django_date_extensions.fields import ApproximateDate
 
 from elections.models import Election, AreaType
 from popolo.models import (
-    ContactDetail, Person, Organization, Post, Membership, Area, Identifier
+    ContactDetail, Person, Organization, Post, Membership, Area, Identifier,
+    OtherName,
 )
 from images.models import Image, HasImageMixin
 
 from compat import python_2_unicode_compatible
+from ..cache import get_cache_version, invalidate_cache_version
 from .fields import (
     ExtraField, PersonExtraFieldValue, SimplePopoloField, ComplexPopoloField,
     get_complex_popolo_fields,
 )
-from ..diffs import get_version_diffs
+from ..diffs import (
+    clean_version_data, get_raw_version_diff, get_version_diffs,
+    make_version_with_diffs,
+)
 from ..twitter_api import update_twitter_user_id, TwitterAPITokenMissing
-from .versions import get_person_as_version_data
+from .versions import (
+    get_person_as_version_data, get_new_version_parents,
+    parse_version_timestamp, format_version_timestamp,
+)
 
 """Extensions to the base django-popolo classes for YourNextRepresentative
 
@@ -55,11 +67,11 @@ def update_person_from_form(person, person_extra, form):
         form_data['birth_date'] = repr(birth_date_date).replace("-00-00", "")
     else:
         form_data['birth_date'] = ''
-    for field in SimplePopoloField.objects.all():
+    for field in SimplePopoloField.objects.cached():
         setattr(person, field.name, form_data[field.name])
-    for field in ComplexPopoloField.objects.all():
+    for field in ComplexPopoloField.objects.cached():
         person_extra.update_complex_field(field, form_data[field.name])
-    for extra_field in ExtraField.objects.all():
+    for extra_field in ExtraField.objects.cached():
         if extra_field.key in form_data:
             PersonExtraFieldValue.objects.update_or_create(
                 person=person, field=extra_field,
@@ -185,10 +197,11 @@ class PersonExtraQuerySet(models.QuerySet):
             base__memberships__extra__election__current=True
         )
         # The field can be one of several types:
-        simple_field = SimplePopoloField.objects.filter(name=field).first()
-        if simple_field:
+        simple_field_names = [
+            f.name for f in SimplePopoloField.objects.cached()]
+        if field in simple_field_names:
             return people_in_current_elections.filter(**{'base__' + field: ''})
-        complex_field = ComplexPopoloField.objects.filter(name=field).first()
+        complex_field = get_complex_popolo_fields().get(field)
         if complex_field:
             kwargs = {
                 'base__{relation}__{key}'.format(
@@ -198,7 +211,8 @@ class PersonExtraQuerySet(models.QuerySet):
                 complex_field.info_type
             }
             return people_in_current_elections.exclude(**kwargs)
-        extra_field = ExtraField.objects.filter(key=field).first()
+        extra_field = next(
+            (f for f in ExtraField.objects.cached() if f.key == field), None)
         if extra_field:
             # This case is a bit more complicated because the
             # PersonExtraFieldValue class allows a blank value.
@@ -242,10 +256,6 @@ class MultipleTwitterIdentifiers(Exception):
 class PersonExtra(HasImageMixin, models.Model):
     base = models.OneToOneField(Person, related_name='extra')
 
-    # This field stores JSON data with previous version information
-    # (as it did in PopIt).
-    versions = models.TextField(blank=True)
-
     images = GenericRelation(Image)
 
     objects = PersonExtraQuerySet.as_manager()
@@ -254,23 +264,47 @@ class PersonExtra(HasImageMixin, models.Model):
     def complex_popolo_fields(self):
         return get_complex_popolo_fields()
 
+    @cached_property
+    def complex_field_values(self):
+        """Return a dict mapping each complex field's name to its value
+
+        This is built from a single pass over each of the related
+        objects that the complex fields are stored in, so that
+        (particularly if those have been prefetched) looking up lots
+        of complex fields doesn't mean repeatedly scanning them.
+        update_complex_field clears this."""
+        # A map from popolo_array to info_type_key to info_type to
+        # the fields stored there:
+        locations = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        for field in self.complex_popolo_fields.values():
+            for info_type in (field.info_type, field.old_info_type):
+                if info_type:
+                    locations[field.popolo_array][field.info_type_key] \
+                        [info_type].append(field)
+        result = {}
+        for popolo_array, by_info_type_key in locations.items():
+            # Iterate rather than using filter because that would
+            # cause an extra query when the relation has already been
+            # populated via prefetch_related:
+            for e in getattr(self.base, popolo_array).all():
+                for info_type_key, by_info_type in by_info_type_key.items():
+                    info_type = getattr(e, info_type_key)
+                    for field in by_info_type.get(info_type, []):
+                        result.setdefault(
+                            field.name, getattr(e, field.info_value_key))
+        return result
+
+    def invalidate_complex_field_values(self):
+        self.__dict__.pop('complex_field_values', None)
+
     def __getattr__(self, name):
         # We don't want to trigger the population of the
         # complex_popolo_fields property just because Django is
         # checking whether the prefetch objects cache is there:
         if name == '_prefetched_objects_cache':
             return super(PersonExtra, self).__getattr__(self, name)
-        field = self.complex_popolo_fields.get(name)
-        if field:
-            # Iterate rather than using filter because that would
-            # cause an extra query when the relation has already been
-            # populated via select_related:
-            for e in getattr(self.base, field.popolo_array).all():
-                info_type_key = getattr(e, field.info_type_key)
-                if (info_type_key == field.info_type) or \
-                   (info_type_key == field.old_info_type):
-                    return getattr(e, field.info_value_key)
-            return ''
+        if name in self.complex_popolo_fields:
+            return self.complex_field_values.get(name, '')
         else:
             message = _("'PersonExtra' object has no attribute '{name}'")
             raise AttributeError(message.format(name=name))
@@ -418,21 +452,98 @@ class PersonExtra(HasImageMixin, models.Model):
                 _(msg).format(name=self.base.name, id=self.base.id))
         return user_id, screen_name
 
+    @property
+    def versions(self):
+        """Return this person's versions as a list of dicts
+
+        The most recent version is first. This is the structure that
+        used to be stored as JSON in this model (as it was in PopIt),
+        which get_version_diffs and get_versions_parent_map expect."""
+        return [v.as_dict() for v in self.base.versions.all()]
+
     @property
     def version_diffs(self):
-        versions = self.versions
-        if not versions:
-            versions = []
-        return get_version_diffs(json.loads(versions))
+        person_versions = list(self.base.versions.all())
+        return get_version_diffs(
+            [v.as_dict() for v in person_versions],
+            PersonVersionDiffCache(person_versions),
+        )
+
+    @property
+    def latest_version_diff(self):
+        """Return the most recent version with its diffs, or None
+
+        This is the first element of version_diffs, but only needs the
+        most recent version, whose diffs were calculated when it was
+        recorded."""
+        latest_version = self.base.versions.first()
+        if latest_version is None:
+            return None
+        return self.get_version_diff(latest_version)
+
+    def cache_version_diffs(self):
+        """Save the diffs of any of this person's versions without them
+
+        These are versions recorded before diffs were cached when a
+        version was recorded.  Returns the number of versions whose
+        diffs were saved."""
+        person_versions = list(self.base.versions.all())
+        versions = [v.as_dict() for v in person_versions]
+        diff_cache = PersonVersionDiffCache(person_versions)
+        # This adds 'parent_version_ids' to each of the version dicts:
+        get_version_diffs(versions, diff_cache)
+        saved = 0
+        for person_version, version in zip(person_versions, versions):
+            if person_version.get_cached_diffs()['parent_version_ids'] \
+                    is not None:
+                continue
+            cached_diffs = diff_cache.cached_diffs[person_version.version_id]
+            cached_diffs['parent_version_ids'] = version['parent_version_ids']
+            person_version.cached_diffs = json.dumps(cached_diffs)
+            person_version.save(update_fields=['cached_diffs'])
+            saved += 1
+        return saved
+
+    def get_version_diff(self, person_version):
+        """Return one of this person's versions with its diffs
+
+        This is the element of version_diffs for person_version (a
+        PersonVersion), but unless the version was recorded before
+        diffs were cached, it only needs that version."""
+        version_with_diffs = person_version.get_version_with_diffs()
+        if version_with_diffs is None:
+            for version_with_diffs in self.version_diffs:
+                if version_with_diffs['version_id'] == \
+                        person_version.version_id:
+                    return version_with_diffs
+        return version_with_diffs
+
+    def iter_versions_before(self, timestamp, batch_size=10):
+        """Generate the versions from before timestamp, most recent first
+
+        These are fetched in batches, so that callers that only need
+        the last few versions don't fetch the whole history."""
+        qs = self.base.versions.filter(timestamp__lt=timestamp) \
+            .order_by('-timestamp', '-id')
+        start = 0
+        while True:
+            batch = list(qs[start:start + batch_size])
+            for person_version in batch:
+                yield person_version.as_dict()
+            if len(batch) < batch_size:
+                return
+            start += batch_size
 
     def record_version(self, change_metadata):
-        versions = []
-        if self.versions:
-            versions = json.loads(self.versions)
         new_version = change_metadata.copy()
         new_version['data'] = get_person_as_version_data(self.base)
-        versions.insert(0, new_version)
-        self.versions = json.dumps(versions)
+        person_version = PersonVersion.from_dict(self.base, new_version)
+        parents = get_new_version_parents(
+            new_version,
+            self.iter_versions_before(person_version.timestamp)
+        )
+        person_version.cache_parent_diffs(new_version['data'], parents)
+        person_version.save()
 
     def update_complex_field(self, location, new_value):
         existing_info_types = [location.info_type]
@@ -450,12 +561,13 @@ class PersonExtra(HasImageMixin, models.Model):
                 location.info_value_key: new_value,
             }
             related_manager.create(**kwargs)
+        self.invalidate_complex_field_values()
 
     def get_initial_form_data(self):
         initial_data = {}
-        for field in SimplePopoloField.objects.all():
+        for field in SimplePopoloField.objects.cached():
             initial_data[field.name] = getattr(self.base, field.name)
-        for field in ComplexPopoloField.objects.all():
+        for field in ComplexPopoloField.objects.cached():
             initial_data[field.name] = getattr(self, field.name)
         for extra_field_value in PersonExtraFieldValue.objects.filter(
                 person=self.base
@@ -509,7 +621,23 @@ class PersonExtra(HasImageMixin, models.Model):
         return person_extra
 
     def as_list_of_dicts(self, election, base_url=None):
+        from ..election_specific import get_extra_csv_values
         result = []
+        for candidacy, row in self.csv_rows(election, base_url):
+            extra_csv_data = get_extra_csv_values(
+                self.base, election, candidacy.post)
+            row.update(extra_csv_data)
+            result.append(row)
+        return result
+
+    def csv_rows(self, election, base_url=None):
+        """Generate a (candidacy, row) tuple for each relevant candidacy
+
+        If election is None, this includes the candidacies in every
+        election. The rows don't include any election-specific extra
+        CSV values, since those depend on which election the output
+        is for - as_list_of_dicts adds those."""
+
         if not base_url:
             base_url = ''
         # Find the list of relevant candidacies. So as not to cause
@@ -530,16 +658,15 @@ class PersonExtra(HasImageMixin, models.Model):
             else:
                 if m_extra.election == election and expected_role == m.role:
                     candidacies.append(m)
+        if not candidacies:
+            return
+        person_row = self.csv_person_values(base_url)
         for candidacy in candidacies:
             candidacy_extra = candidacy.extra
             party = candidacy.on_behalf_of
             post = candidacy.post
             elected = candidacy_extra.elected
             elected_for_csv = ''
-            image_copyright = ''
-            image_uploading_user = ''
-            image_uploading_user_notes = ''
-            proxy_image_url_template = ''
             if elected is not None:
                 elected_for_csv = str(elected)
             mapit_identifier = None
@@ -550,38 +677,8 @@ class PersonExtra(HasImageMixin, models.Model):
                 mapit_url = mapit_identifier.identifier
             else:
                 mapit_url = ''
-            primary_image = None
-            for image in self.images.all():
-                if image.is_primary:
-                    primary_image = image
-            primary_image_url = None
-            if primary_image:
-                primary_image_url = urljoin(base_url, primary_image.image.url)
-                if settings.IMAGE_PROXY_URL and base_url:
-                    encoded_url = quote_plus(primary_image_url)
-                    proxy_image_url_template = settings.IMAGE_PROXY_URL + \
-                        encoded_url + '/{height}/{width}.{extension}'
-
-                try:
-                    image_copyright = primary_image.extra.copyright
-                    user = primary_image.extra.uploading_user
-                    if user is not None:
-                        image_uploading_user = primary_image.extra.uploading_user.username
-                    image_uploading_user_notes = primary_image.extra.user_notes
-                except ObjectDoesNotExist:
-                    pass
-            twitter_user_id = ''
-            for identifier in self.base.identifiers.all():
-                if identifier.scheme == 'twitter':
-                    twitter_user_id = identifier.identifier
-
-            row = {
-                'id': self.base.id,
-                'name': self.base.name,
-                'honorific_prefix': self.base.honorific_prefix,
-                'honorific_suffix': self.base.honorific_suffix,
-                'gender': self.base.gender,
-                'birth_date': self.base.birth_date,
+            row = person_row.copy()
+            row.update({
                 'election': candidacy_extra.election.slug,
                 'election_date': candidacy_extra.election.election_date,
                 'election_current': candidacy_extra.election.current,
@@ -593,27 +690,63 @@ class PersonExtra(HasImageMixin, models.Model):
                 'post_label': post.extra.short_label,
                 'mapit_url': mapit_url,
                 'elected': elected_for_csv,
-                'email': self.base.email,
-                'twitter_username': self.twitter_username,
-                'twitter_user_id': twitter_user_id,
-                'facebook_page_url': self.facebook_page_url,
-                'linkedin_url': self.linkedin_url,
-                'party_ppc_page_url': self.party_ppc_page_url,
-                'facebook_personal_url': self.facebook_personal_url,
-                'homepage_url': self.homepage_url,
-                'wikipedia_url': self.wikipedia_url,
-                'image_url': primary_image_url,
-                'proxy_image_url_template': proxy_image_url_template,
-                'image_copyright': image_copyright,
-                'image_uploading_user': image_uploading_user,
-                'image_uploading_user_notes': image_uploading_user_notes,
-            }
-            from ..election_specific import get_extra_csv_values
-            extra_csv_data = get_extra_csv_values(self.base, election, post)
-            row.update(extra_csv_data)
-            result.append(row)
+            })
+            yield candidacy, row
+
+    def csv_person_values(self, base_url):
+        """Return the CSV values that are the same for every candidacy"""
+
+        image_copyright = ''
+        image_uploading_user = ''
+        image_uploading_user_notes = ''
+        proxy_image_url_template = ''
+        primary_image = None
+        for image in self.images.all():
+            if image.is_primary:
+                primary_image = image
+        primary_image_url = None
+        if primary_image:
+            primary_image_url = urljoin(base_url, primary_image.image.url)
+            if settings.IMAGE_PROXY_URL and base_url:
+                encoded_url = quote_plus(primary_image_url)
+                proxy_image_url_template = settings.IMAGE_PROXY_URL + \
+                    encoded_url + '/{height}/{width}.{extension}'
 
-        return result
+            try:
+                image_copyright = primary_image.extra.copyright
+                user = primary_image.extra.uploading_user
+                if user is not None:
+                    image_uploading_user = primary_image.extra.uploading_user.username
+                image_uploading_user_notes = primary_image.extra.user_notes
+            except ObjectDoesNotExist:
+                pass
+        twitter_user_id = ''
+        for identifier in self.base.identifiers.all():
+            if identifier.scheme == 'twitter':
+                twitter_user_id = identifier.identifier
+
+        return {
+            'id': self.base.id,
+            'name': self.base.name,
+            'honorific_prefix': self.base.honorific_prefix,
+            'honorific_suffix': self.base.honorific_suffix,
+            'gender': self.base.gender,
+            'birth_date': self.base.birth_date,
+            'email': self.base.email,
+            'twitter_username': self.twitter_username,
+            'twitter_user_id': twitter_user_id,
+            'facebook_page_url': self.facebook_page_url,
+            'linkedin_url': self.linkedin_url,
+            'party_ppc_page_url': self.party_ppc_page_url,
+            'facebook_personal_url': self.facebook_personal_url,
+            'homepage_url': self.homepage_url,
+            'wikipedia_url': self.wikipedia_url,
+            'image_url': primary_image_url,
+            'proxy_image_url_template': proxy_image_url_template,
+            'image_copyright': image_copyright,
+            'image_uploading_user': image_uploading_user,
+            'image_uploading_user_notes': image_uploading_user_notes,
+        }
 
     not_standing = models.ManyToManyField(
         Election, related_name='persons_not_standing'
@@ -626,6 +759,128 @@ class PersonExtra(HasImageMixin, models.Model):
         return self.base.name
 
 
+class PersonVersion(models.Model):
+    '''A version of a person's data, recorded each time they're edited
+
+    The versions are ordered by when they were recorded, most recent
+    first. data is the JSON from get_person_as_version_data.'''
+
+    person = models.ForeignKey(Person, related_name='versions')
+    version_id = models.CharField(max_length=32, db_index=True)
+    timestamp = models.DateTimeField()
+    username = models.CharField(max_length=150, blank=True)
+    information_source = models.TextField(blank=True)
+    data = models.TextField()
+    # JSON with the raw diffs (see get_raw_version_diff) between this
+    # version and its parents, keyed by parent version ID (or '' for
+    # the diff from nothing, if there are no parents), and the IDs of
+    # the parents this version had when it was recorded:
+    cached_diffs = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    @classmethod
+    def from_dict(cls, person, version):
+        """Make an unsaved PersonVersion from a version dict"""
+        return cls(
+            person=person,
+            version_id=version['version_id'],
+            timestamp=parse_version_timestamp(version['timestamp']),
+            username=version.get('username') or '',
+            information_source=version.get('information_source', ''),
+            data=json.dumps(version['data']),
+        )
+
+    def as_dict(self):
+        result = {
+            'version_id': self.version_id,
+            'timestamp': format_version_timestamp(self.timestamp),
+            'information_source': self.information_source,
+            'data': json.loads(self.data),
+        }
+        if self.username:
+            result['username'] = self.username
+        return result
+
+    def get_cached_diffs(self):
+        if self.cached_diffs:
+            return json.loads(self.cached_diffs)
+        return {'parent_version_ids': None, 'raw_diffs': {}}
+
+    def cache_parent_diffs(self, data, parents):
+        """Cache the raw diffs from this version's parents
+
+        'data' is this version's data, and 'parents' is a list of
+        version dicts."""
+        data = clean_version_data(data)
+        if parents:
+            raw_diffs = {
+                parent['version_id']: get_raw_version_diff(
+                    clean_version_data(parent['data']), data)
+                for parent in parents
+            }
+        else:
+            raw_diffs = {'': get_raw_version_diff({}, data)}
+        self.cached_diffs = json.dumps({
+            'parent_version_ids': [p['version_id'] for p in parents],
+            'raw_diffs': raw_diffs,
+        })
+
+    def get_version_with_diffs(self, elections=None):
+        """Return this version as get_version_diffs would, if possible
+
+        This uses the diffs cached when the version was recorded; if
+        there weren't any, it returns None."""
+        cached_diffs = self.get_cached_diffs()
+        parent_version_ids = cached_diffs['parent_version_ids']
+        if parent_version_ids is None:
+            return None
+        raw_diffs = cached_diffs['raw_diffs']
+        if parent_version_ids:
+            parent_raw_diffs = [
+                (parent_version_id, raw_diffs[parent_version_id])
+                for parent_version_id in parent_version_ids
+            ]
+        else:
+            parent_raw_diffs = [(None, raw_diffs[''])]
+        return make_version_with_diffs(
+            self.as_dict(), parent_raw_diffs, elections)
+
+
+class PersonVersionDiffCache(object):
+    """The cached raw diffs of a person's versions, for get_version_diffs
+
+    This behaves like a dictionary mapping (version_id,
+    parent_version_id) to the raw diff between those versions.  Diffs
+    that are added to it are only kept in memory, so that showing a
+    person's history never writes to the database; they're saved by
+    PersonExtra.cache_version_diffs."""
+
+    def __init__(self, person_versions):
+        self.person_versions = {v.version_id: v for v in person_versions}
+        self.cached_diffs = {
+            version_id: person_version.get_cached_diffs()
+            for version_id, person_version in self.person_versions.items()
+        }
+
+    def __contains__(self, key):
+        version_id, parent_version_id = key
+        cached_diffs = self.cached_diffs.get(version_id)
+        return cached_diffs is not None and \
+            (parent_version_id or '') in cached_diffs['raw_diffs']
+
+    def __getitem__(self, key):
+        version_id, parent_version_id = key
+        return self.cached_diffs[version_id]['raw_diffs'][
+            parent_version_id or '']
+
+    def __setitem__(self, key, raw_diff):
+        version_id, parent_version_id = key
+        cached_diffs = self.cached_diffs[version_id]
+        cached_diffs['raw_diffs'][parent_version_id or ''] = raw_diff
+
+
 @python_2_unicode_compatible
 class OrganizationExtra(HasImageMixin, models.Model):
     base = models.OneToOneField(Organization, related_name='extra')
@@ -721,6 +976,47 @@ class AreaExtra(models.Model):
         return self.base.name
 
 
+PARTY_CHOICES_VERSION_CACHE_KEY = 'party_choices_version'
+
+JOINT_DESCRIPTION_RE = re.compile(r'joint descriptions? with')
+
+
+def get_party_candidacy_counts():
+    """Return the numbers of candidacies overall and for each party
+
+    This is a dict with the total number of candidacies in 'total',
+    the number in current elections in 'current', and in 'parties' a
+    dict mapping each party's ID to a (current, total) tuple of the
+    numbers of candidacies on behalf of that party.  It's cached
+    along with the party choices."""
+    version = get_cache_version(PARTY_CHOICES_VERSION_CACHE_KEY)
+    cache_key = 'party_candidacy_counts:{0}'.format(version)
+    if version is not None:
+        result = cache.get(cache_key)
+        if result is not None:
+            return result
+    result = {'current': 0, 'total': 0, 'parties': {}}
+    for row in MembershipExtra.objects.values('election__current') \
+            .annotate(count=models.Count('pk')).order_by():
+        result['total'] += row['count']
+        if row['election__current']:
+            result['current'] += row['count']
+    party_counts = defaultdict(lambda: [0, 0])
+    for row in Membership.objects.filter(on_behalf_of__isnull=False) \
+            .values('on_behalf_of', 'extra__election__current') \
+            .annotate(count=models.Count('pk')).order_by():
+        counts = party_counts[row['on_behalf_of']]
+        counts[1] += row['count']
+        if row['extra__election__current']:
+            counts[0] += row['count']
+    result['parties'] = {
+        party_id: tuple(counts) for party_id, counts in party_counts.items()
+    }
+    if version is not None:
+        cache.set(cache_key, result)
+    return result
+
+
 @python_2_unicode_compatible
 class PartySet(models.Model):
     slug = models.CharField(max_length=256, unique=True)
@@ -738,6 +1034,44 @@ class PartySet(models.Model):
     def party_choices(self,
             include_descriptions=True, exclude_deregistered=False,
             include_description_ids=False):
+        """Return the choices for a party dropdown for this party set
+
+        These are cached until any candidacy, party, party description,
+        party set or election changes; see calculate_party_choices for
+        what the arguments mean."""
+        version = get_cache_version(PARTY_CHOICES_VERSION_CACHE_KEY)
+        if version is None:
+            return self.calculate_party_choices(
+                include_descriptions, exclude_deregistered,
+                include_description_ids)
+        # Whether a party is shown as deregistered depends on today's
+        # date, and the choices' labels are translated, so both of
+        # those are part of the key too:
+        cache_key = 'party_choices:{version}:{pk}:{flags}:{language}:{today}'
+        cache_key = cache_key.format(
+            version=version,
+            pk=self.pk,
+            flags=''.join(
+                str(int(bool(flag))) for flag in (
+                    include_descriptions,
+                    exclude_deregistered,
+                    include_description_ids,
+                )
+            ),
+            language=get_language(),
+            today=date.today().isoformat(),
+        )
+        result = cache.get(cache_key)
+        if result is None:
+            result = self.calculate_party_choices(
+                include_descriptions, exclude_deregistered,
+                include_description_ids)
+            cache.set(cache_key, result)
+        return result
+
+    def calculate_party_choices(self,
+            include_descriptions=True, exclude_deregistered=False,
+            include_description_ids=False):
         # For various reasons, we've found it's best to order the
         # parties by those that have the most candidates - this means
         # that the commonest parties to select are at the top of the
@@ -746,83 +1080,71 @@ class PartySet(models.Model):
         # makes sense.  Otherwise the fallback is to rank
         # alphabetically.
 
-        candidacies_ever_qs = self.parties.all().annotate(
-                membership_count=models.Count('memberships_on_behalf_of__pk')
-            ).order_by('-membership_count', 'name').only('end_date', 'name')
-
-        parties_current_qs = self.parties.filter(
-            memberships_on_behalf_of__extra__election__current=True
-            ).annotate(
-                membership_count=models.Count('memberships_on_behalf_of__pk')
-            ).order_by('-membership_count', 'name').only('end_date', 'name')
-
-        parties_notcurrent_qs = self.parties.filter(
-                ~models.Q(
-                    memberships_on_behalf_of__extra__election__current=True)
-            ).annotate(
-                membership_count=models.Value(0, models.IntegerField()),
-            ).order_by('-membership_count', 'name').only('end_date', 'name')
-
-
         minimum_count = settings.CANDIDATES_REQUIRED_FOR_WEIGHTED_PARTY_LIST
 
-        total_memberships = MembershipExtra.objects.all()
-        current_memberships = total_memberships.filter(election__current=True)
+        candidacy_counts = get_party_candidacy_counts()
 
-        queries = []
-        if current_memberships.count() > minimum_count:
-            queries.append(parties_current_qs)
-            queries.append(parties_notcurrent_qs)
-        elif total_memberships.count() > minimum_count:
-            queries.append(candidacies_ever_qs)
+        if candidacy_counts['current'] > minimum_count:
+            # Only count candidacies in current elections:
+            count_index = 0
+        elif candidacy_counts['total'] > minimum_count:
+            count_index = 1
         else:
             return self.party_choices_basic()
 
+        def membership_count(party):
+            return candidacy_counts['parties'].get(party.pk, (0, 0))[count_index]
+
+        parties = self.parties.order_by('name', 'pk').only('end_date', 'name')
+        if include_descriptions:
+            parties = parties.prefetch_related('other_names')
+        # The sort is stable, so parties with the same number of
+        # candidates stay in alphabetical order:
+        parties = sorted(parties, key=lambda p: -membership_count(p))
+
         result = [('', '')]
-        parties_with_candidates = []
 
-        for qs in queries:
-            if include_descriptions:
-                qs = qs.prefetch_related('other_names')
-            for party in qs:
-                parties_with_candidates.append(party)
-                count_string = ""
-                if party.membership_count:
-                    count_string = " ({} candidates)".format(
-                        party.membership_count)
-
-                name = _('{party_name}{count_string}').format(
-                    party_name=party.name,
-                    count_string=count_string
-                )
+        for party in parties:
+            count_string = ""
+            party_membership_count = membership_count(party)
+            if party_membership_count:
+                count_string = " ({} candidates)".format(
+                    party_membership_count)
 
-                if party.end_date:
-                    party_end_date = parser.parse(party.end_date).date()
-                    if date.today() > party_end_date:
-                        if exclude_deregistered:
-                            continue
-                        name = "{} (Deregistered {})".format(
-                            name, party.end_date
-                        )
+            name = _('{party_name}{count_string}').format(
+                party_name=party.name,
+                count_string=count_string
+            )
 
-                if include_descriptions and party.other_names.exists():
-                    names = [(party.pk, party.name),]
-                    for other_name in party.other_names.all():
-                        joint_text = re.compile(r'joint descriptions? with')
-                        party_id_str = str(party.pk)
-                        if include_description_ids:
-                            party_id_str = "{}__{}".format(
-                                party_id_str,
-                                other_name.pk
-                            )
-                        if not joint_text.search(other_name.name.lower()):
-                            names.append((party_id_str, other_name.name))
-                    party_names = (name, (names))
-                else:
-                    party_names = (str(party.pk), name)
+            if party.end_date:
+                party_end_date = parser.parse(party.end_date).date()
+                if date.today() > party_end_date:
+                    if exclude_deregistered:
+                        continue
+                    name = "{} (Deregistered {})".format(
+                        name, party.end_date
+                    )
+
+            other_names = []
+            if include_descriptions:
+                other_names = party.other_names.all()
+            if other_names:
+                names = [(party.pk, party.name),]
+                for other_name in other_names:
+                    party_id_str = str(party.pk)
+                    if include_description_ids:
+                        party_id_str = "{}__{}".format(
+                            party_id_str,
+                            other_name.pk
+                        )
+                    if not JOINT_DESCRIPTION_RE.search(other_name.name.lower()):
+                        names.append((party_id_str, other_name.name))
+                party_names = (name, (names))
+            else:
+                party_names = (str(party.pk), name)
 
 
-                result.append(party_names)
+            result.append(party_names)
         return result
 
 
@@ -889,3 +1211,26 @@ class ImageExtra(models.Model):
     notes = models.TextField(blank=True)
 
     objects = ImageExtraManager()
+
+
+def invalidate_party_choices(sender, **kwargs):
+    invalidate_cache_version(PARTY_CHOICES_VERSION_CACHE_KEY)
+
+
+def invalidate_party_choices_for_other_name(sender, instance, **kwargs):
+    # Only parties' other names are used in the party choices:
+    organization_content_type = ContentType.objects.get_for_model(Organization)
+    if instance.content_type_id == organization_content_type.id:
+        invalidate_party_choices(sender, **kwargs)
+
+post_save.connect(invalidate_party_choices, sender=Membership)
+post_delete.connect(invalidate_party_choices, sender=Membership)
+post_save.connect(invalidate_party_choices, sender=MembershipExtra)
+post_delete.connect(invalidate_party_choices, sender=MembershipExtra)
+post_save.connect(invalidate_party_choices, sender=Organization)
+post_delete.connect(invalidate_party_choices, sender=Organization)
+post_save.connect(invalidate_party_choices, sender=Election)
+post_delete.connect(invalidate_party_choices, sender=Election)
+m2m_changed.connect(invalidate_party_choices, sender=PartySet.parties.through)
+post_save.connect(invalidate_party_choices_for_other_name, sender=OtherName)
+post_delete.connect(invalidate_party_choices_for_other_name, sender=OtherName)
@@ -0,0 +1,152 @@
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.core.cache import cache
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+
+from elections.models import Election
+from popolo.models import Area, Membership, Organization, Person, Post
+
+from ..cache import get_cache_version, invalidate_cache_version
+from .db import LoggedAction
+from .popolo_extra import (
+    AreaExtra, MembershipExtra, OrganizationExtra, PostExtra,
+    PostExtraElection
+)
+
+POSTCODE_RESULTS_VERSION_CACHE_KEY = 'postcode_results_version'
+
+# Signals are sent before the transaction that made a change is
+# committed, so a request at the same time might cache results from
+# just before it; this limits how long those could be served for.
+POSTCODE_RESULTS_CACHE_SECONDS = 60 * 10
+
+
+def get_post_elections_cache_key(version, area_ids):
+    """Return the cache key for the post-elections in some areas
+
+    The area identifiers are hashed, since there might be too many of
+    them to fit in a memcached key."""
+    area_ids_hash = hashlib.md5(
+        ','.join(sorted(area_ids)).encode('utf-8')
+    ).hexdigest()
+    return 'postcode_post_elections:{0}:{1}'.format(version, area_ids_hash)
+
+
+def get_candidates_cache_key(version, post_id, election_id):
+    return 'postcode_candidates:{0}:{1}:{2}'.format(
+        version, post_id, election_id
+    )
+
+
+def invalidate_candidates_for_post_elections(post_and_election_ids):
+    """Remove the cached candidates for some (post ID, election ID) pairs"""
+    version = get_cache_version(POSTCODE_RESULTS_VERSION_CACHE_KEY)
+    if version is None:
+        return
+    cache.delete_many([
+        get_candidates_cache_key(version, post_id, election_id)
+        for post_id, election_id in post_and_election_ids
+    ])
+
+
+def get_candidacy_post_and_election_ids(person_id):
+    return set(
+        Membership.objects.filter(
+            person_id=person_id,
+            post__isnull=False,
+            extra__election__isnull=False,
+        ).values_list('post_id', 'extra__election_id')
+    )
+
+
+def remember_candidacy_post_and_election(sender, instance, **kwargs):
+    # Note which post and election this candidacy was for before it
+    # changes, since once it's been moved or deleted that can't be
+    # looked up:
+    instance._postcode_post_and_election_ids_before = set()
+    if get_cache_version(POSTCODE_RESULTS_VERSION_CACHE_KEY) is None:
+        return
+    if sender is MembershipExtra:
+        membership_id = instance.base_id
+    else:
+        membership_id = instance.pk
+    if membership_id is None:
+        return
+    instance._postcode_post_and_election_ids_before = set(
+        Membership.objects.filter(
+            pk=membership_id,
+            post__isnull=False,
+            extra__election__isnull=False,
+        ).values_list('post_id', 'extra__election_id')
+    )
+
+
+def invalidate_postcode_results(sender, instance, **kwargs):
+    # Adding a PostExtraElection changes which elections are found
+    # for a postcode, but locking one or setting its winner_count
+    # doesn't:
+    if sender is PostExtraElection and not kwargs.get('created', True):
+        return
+    invalidate_cache_version(POSTCODE_RESULTS_VERSION_CACHE_KEY)
+
+
+def invalidate_cached_candidates(sender, instance, **kwargs):
+    # Every candidacy of someone is included in the data for each of
+    # their candidacies, so they all need to be invalidated:
+    if get_cache_version(POSTCODE_RESULTS_VERSION_CACHE_KEY) is None:
+        return
+    post_and_election_ids = set(
+        getattr(instance, '_postcode_post_and_election_ids_before', set()))
+    if sender is Person:
+        person_id = instance.id
+    elif sender is MembershipExtra:
+        person_id = instance.base.person_id
+        post_and_election_ids.add(
+            (instance.base.post_id, instance.election_id))
+    else:
+        person_id = instance.person_id
+    if person_id is not None:
+        post_and_election_ids |= \
+            get_candidacy_post_and_election_ids(person_id)
+    if sender is LoggedAction and instance.post_id is not None:
+        post_and_election_ids.update(
+            PostExtraElection.objects.filter(
+                postextra__base_id=instance.post_id
+            ).values_list('postextra__base_id', 'election_id')
+        )
+    invalidate_candidates_for_post_elections(post_and_election_ids)
+
+
+post_save.connect(invalidate_postcode_results, sender=Area)
+post_delete.connect(invalidate_postcode_results, sender=Area)
+post_save.connect(invalidate_postcode_results, sender=AreaExtra)
+post_delete.connect(invalidate_postcode_results, sender=AreaExtra)
+post_save.connect(invalidate_postcode_results, sender=Election)
+post_delete.connect(invalidate_postcode_results, sender=Election)
+post_save.connect(invalidate_postcode_results, sender=Organization)
+post_delete.connect(invalidate_postcode_results, sender=Organization)
+post_save.connect(invalidate_postcode_results, sender=OrganizationExtra)
+post_delete.connect(invalidate_postcode_results, sender=OrganizationExtra)
+post_save.connect(invalidate_postcode_results, sender=Post)
+post_delete.connect(invalidate_postcode_results, sender=Post)
+post_save.connect(invalidate_postcode_results, sender=PostExtra)
+post_delete.connect(invalidate_postcode_results, sender=PostExtra)
+post_save.connect(invalidate_postcode_results, sender=PostExtraElection)
+post_delete.connect(invalidate_postcode_results, sender=PostExtraElection)
+pre_save.connect(remember_candidacy_post_and_election, sender=Membership)
+pre_delete.connect(remember_candidacy_post_and_election, sender=Membership)
+pre_save.connect(
+    remember_candidacy_post_and_election, sender=MembershipExtra)
+pre_delete.connect(
+    remember_candidacy_post_and_election, sender=MembershipExtra)
+post_save.connect(invalidate_cached_candidates, sender=Membership)
+post_delete.connect(invalidate_cached_candidates, sender=Membership)
+post_save.connect(invalidate_cached_candidates, sender=MembershipExtra)
+post_delete.connect(invalidate_cached_candidates, sender=MembershipExtra)
+post_save.connect(invalidate_cached_candidates, sender=Person)
+post_delete.connect(invalidate_cached_candidates, sender=Person)
+post_save.connect(invalidate_cached_candidates, sender=LoggedAction)
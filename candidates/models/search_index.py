@@ -0,0 +1,87 @@
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import models
+
+from haystack import connection_router, connections
+
+from popolo.models import Person
+
+from .name_search import update_person_name_tokens
+
+# How many queued updates to send to the search backend at a time:
+SEARCH_INDEX_BATCH_SIZE = 500
+
+
+class SearchIndexUpdate(models.Model):
+    '''A person whose entry in the search index needs to be updated
+
+    These are created by QueuedSignalProcessor (in
+    candidates.search_signals) when a person or one of their other
+    names is saved or deleted.  Since they're created in the same
+    transaction as the change, they only become visible if it's
+    committed.  update_search_index sends them to the search backend
+    in batches; the same person may be queued many times, but is only
+    indexed once per batch. person_id isn't a foreign key, since the
+    person may have been deleted, in which case they're removed from
+    the index.'''
+
+    person_id = models.IntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+
+def queue_search_index_update(person_id):
+    SearchIndexUpdate.objects.create(person_id=person_id)
+
+
+def queue_search_index_updates(person_ids):
+    SearchIndexUpdate.objects.bulk_create(
+        [SearchIndexUpdate(person_id=person_id) for person_id in person_ids],
+        batch_size=SEARCH_INDEX_BATCH_SIZE,
+    )
+
+
+def update_search_index_batch(batch_size=SEARCH_INDEX_BATCH_SIZE):
+    '''Index the people in the oldest batch of queued updates
+
+    Returns the number of queued updates that were processed.'''
+    updates = list(
+        SearchIndexUpdate.objects.order_by('id')
+        .values_list('id', 'person_id')[:batch_size]
+    )
+    if not updates:
+        return 0
+    person_ids = set(person_id for update_id, person_id in updates)
+    people = list(
+        Person.objects.filter(id__in=person_ids)
+        .prefetch_related('other_names')
+    )
+    deleted_person_ids = person_ids - set(person.id for person in people)
+    for using in connection_router.for_write():
+        backend = connections[using].get_backend()
+        index = connections[using].get_unified_index().get_index(Person)
+        if people:
+            backend.update(index, people)
+        for person_id in deleted_person_ids:
+            backend.remove('popolo.person.{0}'.format(person_id))
+    # The name tokens of deleted people are deleted along with them:
+    if settings.SEARCH_BACKEND == 'database':
+        update_person_name_tokens(people)
+    # Only delete the updates that were processed: any made since
+    # they were fetched are left for the next batch.
+    SearchIndexUpdate.objects.filter(
+        id__in=[update_id for update_id, person_id in updates]
+    ).delete()
+    return len(updates)
+
+
+def update_search_index(batch_size=SEARCH_INDEX_BATCH_SIZE):
+    '''Process queued updates until there are none left
+
+    Returns the number of queued updates that were processed.'''
+    total = 0
+    while True:
+        processed = update_search_index_batch(batch_size)
+        if not processed:
+            return total
+        total += processed
@@ -7,6 +7,8 @@ import re
 from .fields import ExtraField, SimplePopoloField, ComplexPopoloField
 
 from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from ..twitter_api import update_twitter_user_id, TwitterAPITokenMissing
 
@@ -18,9 +20,9 @@ def get_person_as_version_data(person):
     result = {}
     person_extra = person.extra
     result['id'] = str(person.id)
-    for field in SimplePopoloField.objects.all():
+    for field in SimplePopoloField.objects.cached():
         result[field.name] = getattr(person, field.name) or ''
-    for field in ComplexPopoloField.objects.all():
+    for field in ComplexPopoloField.objects.cached():
         result[field.name] = getattr(person_extra, field.name)
     extra_values = {
         extra_value.field.key: extra_value.value
@@ -28,7 +30,7 @@ def get_person_as_version_data(person):
     }
     extra_fields = {
         extra_field.key: extra_values.get(extra_field.key, '')
-        for extra_field in ExtraField.objects.all()
+        for extra_field in ExtraField.objects.cached()
     }
     if extra_fields:
         result['extra_fields'] = extra_fields
@@ -87,7 +89,7 @@ def revert_person_from_version_data(person, person_extra, version_data):
     from candidates.models import MembershipExtra
     from elections.models import Election
 
-    for field in SimplePopoloField.objects.all():
+    for field in SimplePopoloField.objects.cached():
         new_value = version_data.get(field.name)
         if new_value:
             setattr(person, field.name, new_value)
@@ -95,13 +97,14 @@ def revert_person_from_version_data(person, person_extra, version_data):
             setattr(person, field.name, '')
 
     # Remove any old values in complex fields:
-    for field in ComplexPopoloField.objects.all():
+    for field in ComplexPopoloField.objects.cached():
         related_manager = getattr(person, field.popolo_array)
         type_kwargs = {field.info_type_key: field.info_type}
         related_manager.filter(**type_kwargs).delete()
+    person_extra.invalidate_complex_field_values()
 
     # Then recreate any that should be there:
-    for field in ComplexPopoloField.objects.all():
+    for field in ComplexPopoloField.objects.cached():
         new_value = version_data.get(field.name, '')
         if new_value:
             person_extra.update_complex_field(field, version_data[field.name])
@@ -109,7 +112,7 @@ def revert_person_from_version_data(person, person_extra, version_data):
     # Remove any extra field data and create them from the JSON:
     person.extra_field_values.all().delete()
     extra_fields_from_version = version_data.get('extra_fields', {})
-    for extra_field in ExtraField.objects.all():
+    for extra_field in ExtraField.objects.cached():
         value = extra_fields_from_version.get(extra_field.key)
         if value is not None:
             person.extra_field_values.create(
@@ -177,8 +180,28 @@ def revert_person_from_version_data(person, person_extra, version_data):
     except TwitterAPITokenMissing:
         pass
 
+VERSION_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+def parse_version_timestamp(timestamp):
+    """Turn a version's timestamp string into an aware UTC datetime
+
+    The timestamps are generated with datetime.utcnow().isoformat(), so
+    are naive; that also means that the microseconds are missing if
+    they happened to be zero."""
+    parsed = parse_datetime(timestamp)
+    if parsed is None:
+        raise ValueError("Unknown version timestamp format: {0}".format(
+            timestamp))
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+def format_version_timestamp(timestamp):
+    return timezone.make_naive(timestamp, timezone.utc).strftime(
+        VERSION_TIMESTAMP_FORMAT)
+
 def version_timestamp_key(version):
-    return datetime.strptime(version['timestamp'], '%Y-%m-%dT%H:%M:%S.%f')
+    return datetime.strptime(version['timestamp'], VERSION_TIMESTAMP_FORMAT)
 
 def is_a_merge(version):
     m = re.search(
@@ -187,6 +210,28 @@ def is_a_merge(version):
         return m.group(1)
     return None
 
+def get_new_version_parents(new_version, earlier_versions):
+    """Return the parents that a new version will have
+
+    These are the versions that get_versions_parent_map would give as
+    the parents of new_version, if it's more recent than every version
+    in earlier_versions. earlier_versions may be any iterable that
+    generates versions in the order that get_versions_parent_map would
+    put them in, but reversed (i.e. the most recent first); it's only
+    consumed as far as necessary."""
+    person_id = new_version['data']['id']
+    merged_from = is_a_merge(new_version)
+    parent = merged_parent = None
+    for version in earlier_versions:
+        version_person_id = version['data']['id']
+        if parent is None and version_person_id == person_id:
+            parent = version
+        if merged_parent is None and version_person_id == merged_from:
+            merged_parent = version
+        if parent and (merged_parent or not merged_from):
+            break
+    return [v for v in (parent, merged_parent) if v is not None]
+
 def get_versions_parent_map(versions_data):
     version_id_to_parent_ids = {}
     if not versions_data:
@@ -0,0 +1,47 @@
+from __future__ import unicode_literals
+
+from django.db.models import signals
+
+from haystack.signals import BaseSignalProcessor
+
+
+def get_indexed_person_id(sender, instance):
+    '''Return the ID of the person whose index entry a change affects
+
+    That's the person themselves, or the person an other name is for;
+    for changes to anything else, this returns None.'''
+    # This module is imported by haystack before the models are
+    # loaded, so they can't be imported at the top:
+    from django.contrib.contenttypes.models import ContentType
+    from popolo.models import OtherName, Person
+    if issubclass(sender, Person):
+        return instance.id
+    if issubclass(sender, OtherName) and instance.content_type_id == \
+            ContentType.objects.get_for_model(Person).id:
+        return instance.object_id
+    return None
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    '''Queue changed people to be indexed later, rather than right away
+
+    With haystack's RealtimeSignalProcessor every save of a person
+    would make a request to the search backend in the middle of the
+    transaction; instead, this queues them, and the
+    candidates_update_search_index command indexes them in batches.'''
+
+    def setup(self):
+        signals.post_save.connect(self.handle_save)
+        signals.post_delete.connect(self.handle_delete)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.handle_save)
+        signals.post_delete.disconnect(self.handle_delete)
+
+    def handle_save(self, sender, instance, **kwargs):
+        from candidates.models.search_index import queue_search_index_update
+        person_id = get_indexed_person_id(sender, instance)
+        if person_id is not None:
+            queue_search_index_update(person_id)
+
+    handle_delete = handle_save
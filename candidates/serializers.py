@@ -1,7 +1,5 @@
 from __future__ import unicode_literals
 
-import json
-
 from rest_framework import serializers
 from rest_framework.reverse import reverse
 from sorl_thumbnail_serializer.fields import HyperlinkedSorlImageField
@@ -300,11 +298,6 @@ class PostElectionSerializer(serializers.HyperlinkedModelSerializer):
     election = MinimalElectionSerializer(read_only=True)
 
 
-class JSONSerializerField(serializers.Field):
-    def to_representation(self, value):
-        return json.loads(value)
-
-
 class PersonExtraFieldSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = candidates_models.PersonExtraFieldValue
@@ -345,7 +338,7 @@ class PersonSerializer(MinimalPersonSerializer):
     other_names = OtherNameSerializer(many=True, read_only=True)
     images = ImageSerializer(many=True, read_only=True, source='extra.images')
 
-    versions = JSONSerializerField(source='extra.versions', read_only=True)
+    versions = serializers.ReadOnlyField(source='extra.versions')
 
     memberships = MembershipSerializer(many=True, read_only=True)
 
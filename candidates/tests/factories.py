@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 
 from datetime import date, timedelta
+import json
 
 import factory
 
@@ -186,7 +187,18 @@ class PersonExtraFactory(factory.DjangoModelFactory):
         model = 'candidates.PersonExtra'
 
     base = factory.SubFactory(PersonFactory)
-    versions = '[]'
+
+    @factory.post_generation
+    def versions(self, create, extracted, **kwargs):
+        # The versions can be given as JSON, in the same order as
+        # PersonExtra.versions returns them, i.e. most recent first:
+        if not (create and extracted):
+            return
+        PersonVersion = self.base.versions.model
+        PersonVersion.objects.bulk_create([
+            PersonVersion.from_dict(self.base, version)
+            for version in reversed(json.loads(extracted))
+        ])
 
 
 class MembershipFactory(factory.DjangoModelFactory):
@@ -0,0 +1,137 @@
+"""Helpers for measuring the database queries made by pages and the API
+
+make_dataset creates a synthetic dataset of a given size from the
+factories, and measure_request records how many queries a request
+for a URL makes, how long they took and how long the whole request
+took.  test_query_counts uses these to check that the number of
+queries each page makes doesn't grow with the size of the dataset."""
+
+from __future__ import unicode_literals
+
+from collections import namedtuple
+import json
+from timeit import default_timer
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from . import factories
+
+DatasetSize = namedtuple(
+    'DatasetSize', ['elections', 'posts', 'candidates_per_post'])
+
+Measurement = namedtuple(
+    'Measurement', ['queries', 'sql_time', 'wall_time'])
+
+NUMBER_OF_PARTIES = 3
+
+
+class Dataset(object):
+
+    def __init__(self, size):
+        self.size = size
+        self.elections = []
+        self.posts = []
+        self.parties = []
+        self.people = []
+
+
+def make_dataset(size):
+    """Create elections, posts, parties and candidates for a DatasetSize
+
+    Every post is contested in every election, by
+    size.candidates_per_post different people in each, who stand for
+    the parties in turn."""
+    dataset = Dataset(size)
+    area_type = factories.AreaTypeFactory.create(name='WMC')
+    party_set = factories.PartySetFactory.create(slug='gb', name='GB')
+    commons = factories.ParliamentaryChamberExtraFactory.create().base
+    for i in range(size.elections):
+        dataset.elections.append(
+            factories.ElectionFactory.create(
+                slug='election-{0}'.format(i),
+                name='Election {0}'.format(i),
+                for_post_role='Member of Parliament',
+                organization=commons,
+                area_types=(area_type,),
+            )
+        )
+    for i in range(NUMBER_OF_PARTIES):
+        party_extra = factories.PartyExtraFactory.create(
+            slug='party:{0}'.format(i),
+            base__name='Party {0}'.format(i),
+        )
+        party_set.parties.add(party_extra.base)
+        dataset.parties.append(party_extra)
+    for i in range(size.posts):
+        area_extra = factories.AreaExtraFactory.create(
+            base__identifier='area-{0}'.format(i),
+            base__name='Area {0}'.format(i),
+            type=area_type,
+        )
+        dataset.posts.append(
+            factories.PostExtraFactory.create(
+                elections=dataset.elections,
+                base__organization=commons,
+                base__area=area_extra.base,
+                slug='post-{0}'.format(i),
+                base__label='Member of Parliament for Area {0}'.format(i),
+                party_set=party_set,
+                group='Group {0}'.format(i % 2),
+            )
+        )
+    for election in dataset.elections:
+        for post_extra in dataset.posts:
+            for i in range(size.candidates_per_post):
+                person_extra = factories.PersonExtraFactory.create(
+                    base__name='Candidate {0}'.format(len(dataset.people)),
+                )
+                factories.CandidacyExtraFactory.create(
+                    election=election,
+                    base__person=person_extra.base,
+                    base__post=post_extra.base,
+                    base__on_behalf_of=dataset.parties[
+                        i % NUMBER_OF_PARTIES].base,
+                )
+                dataset.people.append(person_extra)
+    return dataset
+
+
+def measure_request(client, url):
+    """Request url with client, returning a Measurement of the request
+
+    The URL is requested once before it's measured, so that what
+    Django caches for the life of the process (e.g. content types)
+    doesn't count; the cache is cleared before the measured request,
+    so it's as if it were the first request after a change."""
+    client.get(url)
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        start = default_timer()
+        response = client.get(url)
+        wall_time = default_timer() - start
+    if response.status_code != 200:
+        raise Exception('Got status code {0} from {1}'.format(
+            response.status_code, url))
+    return Measurement(
+        queries=len(context.captured_queries),
+        sql_time=sum(float(q['time']) for q in context.captured_queries),
+        wall_time=wall_time,
+    )
+
+
+def write_report(filename, results):
+    """Write the measurements to a JSON file
+
+    results should map each page's name to a list of (DatasetSize,
+    Measurement) tuples."""
+    report = {
+        name: [
+            dict(size._asdict(), **measurement._asdict())
+            for size, measurement in measurements
+        ]
+        for name, measurements in results.items()
+    }
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=4, sort_keys=True)
@@ -4,6 +4,9 @@ from __future__ import unicode_literals
 
 import re
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from django_webtest import WebTest
 
 from .auth import TestUserMixin
@@ -359,3 +362,35 @@ class TestAreasView(TestUserMixin, UK2015ExamplesMixin, WebTest):
             expect_errors=True
         )
         self.assertEqual(response.status_code, 404)
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+    def test_query_count_does_not_grow_with_areas(self):
+        cache.clear()
+        CandidacyExtraFactory.create(
+            election=self.election,
+            base__person=PersonExtraFactory.create(
+                base__id='2010',
+                base__name='Harriet Harman',
+            ).base,
+            base__post=self.camberwell_post_extra.base,
+            base__on_behalf_of=self.labour_party_extra.base
+        )
+
+        def count_queries(url):
+            # The first request fills the cache of field definitions
+            # and party choices:
+            self.app.get(url, user=self.user)
+            with CaptureQueriesContext(connection) as context:
+                response = self.app.get(url, user=self.user)
+            self.assertEqual(response.status_code, 200)
+            return len(context.captured_queries)
+
+        one_area_queries = count_queries(
+            '/areas/WMC--65913/camberwell-and-peckham')
+        three_areas_queries = count_queries(
+            '/areas/WMC--65913,WMC--65808,WMC--65730/three-areas')
+        self.assertEqual(one_area_queries, three_areas_queries)
@@ -0,0 +1,132 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from mock import patch, Mock
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import translation
+
+from candidates.mapit import (
+    UnknownMapitException, get_areas_from_point_in_generations
+)
+from candidates.models.address import check_address
+
+from .factories import AreaTypeFactory, ElectionFactory
+
+
+MAPIT_RESULTS = {
+    'http://global.mapit.mysociety.org/point/4326/-0.143207,51.5?type=WMC&generation=22': {
+        "65759": {
+            "id": 65759,
+            "name": "Cities of London and Westminster",
+            "type": "WMC",
+        },
+    },
+    'http://global.mapit.mysociety.org/point/4326/-0.143207,51.5?type=LAC&generation=23': {
+        "11816": {
+            "id": 11816,
+            "name": "West Central",
+            "type": "LAC",
+        },
+    },
+}
+
+
+def fake_requests_for_mapit(url, **kwargs):
+    return Mock(**{
+        'json.return_value': MAPIT_RESULTS.get(
+            url, {'error': 'There was an error'}),
+        'status_code': 200,
+    })
+
+
+@patch('candidates.mapit.session')
+class TestCheckAddress(TestCase):
+
+    def setUp(self):
+        ElectionFactory.create(
+            slug='2015',
+            area_types=(AreaTypeFactory.create(name='WMC'),),
+            area_generation=22,
+        )
+        ElectionFactory.create(
+            slug='2016-london',
+            area_types=(AreaTypeFactory.create(name='LAC'),),
+            area_generation=23,
+        )
+
+    @patch('candidates.models.address.Geocoder')
+    def test_each_generation_is_looked_up(self, mock_geocoder, mock_session):
+        mock_geocoder.geocode.return_value = [
+            Mock(coordinates=(51.5, -0.143207))
+        ]
+        mock_session.get.side_effect = fake_requests_for_mapit
+        self.assertEqual(
+            check_address('10 Downing Street'),
+            {
+                'type_and_area_ids': 'LAC--11816,WMC--65759',
+                'ignored_slug': 'west-central-cities-of-london-and-westminster',
+            }
+        )
+        self.assertEqual(mock_session.get.call_count, 2)
+
+    @patch('candidates.models.address.Geocoder')
+    def test_lookup_error(self, mock_geocoder, mock_session):
+        mock_geocoder.geocode.return_value = [Mock(coordinates=(0, 0))]
+        mock_session.get.side_effect = fake_requests_for_mapit
+        with self.assertRaisesRegexp(ValidationError, 'There was an error'):
+            check_address('Null Island')
+
+
+@patch('candidates.mapit.session')
+class TestConcurrentLookups(TestCase):
+
+    def test_lookups_are_concurrent(self, mock_session):
+        calls = []
+        all_started = threading.Event()
+
+        def wait_for_other_lookup(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 2:
+                all_started.set()
+            # If the lookups were made one after another, this would
+            # time out in the first one:
+            self.assertTrue(all_started.wait(5))
+            return fake_requests_for_mapit(url)
+
+        mock_session.get.side_effect = wait_for_other_lookup
+        self.assertEqual(
+            [
+                list(areas.keys()) for areas in
+                get_areas_from_point_in_generations(
+                    '-0.143207', '51.5', [(22, ['WMC']), (23, ['LAC'])])
+            ],
+            [['65759'], ['11816']]
+        )
+
+    def test_lookups_use_the_active_language(self, mock_session):
+        languages = []
+
+        def record_language(url, **kwargs):
+            languages.append(translation.get_language())
+            return fake_requests_for_mapit(url)
+
+        mock_session.get.side_effect = record_language
+        with translation.override('cy-gb'):
+            get_areas_from_point_in_generations(
+                '-0.143207', '51.5', [(22, ['WMC']), (23, ['LAC'])])
+        self.assertEqual(languages, ['cy-gb', 'cy-gb'])
+
+    @patch('candidates.mapit.AREA_LOOKUPS_DEADLINE_SECONDS', 0.1)
+    def test_deadline(self, mock_session):
+        def slow_lookup(url, **kwargs):
+            time.sleep(0.5)
+            return fake_requests_for_mapit(url)
+
+        mock_session.get.side_effect = slow_lookup
+        with self.assertRaisesRegexp(UnknownMapitException, 'timed out'):
+            get_areas_from_point_in_generations(
+                '-0.143207', '51.5', [(22, ['WMC']), (23, ['LAC'])])
@@ -36,8 +36,9 @@ class ComplexFieldsTests(TestUserMixin, UK2015ExamplesMixin, WebTest):
         self.person = Person.objects.create(
             name="John the Well-Described",
         )
-        self.person_extra = PersonExtra.objects.create(base=self.person, versions='[]')
+        self.person_extra = PersonExtra.objects.create(base=self.person)
         self.person_extra.update_complex_field(an_field, 'http://example.com/additional')
+        self.an_field = an_field
 
     def test_create_form_has_fields(self):
         response = self.app.get(
@@ -109,3 +110,34 @@ class ComplexFieldsTests(TestUserMixin, UK2015ExamplesMixin, WebTest):
         an_dt = response.html.find('dt', text=u'Additional Link')
         an_dd = get_next_dd(an_dt)
         self.assertEqual(an_dd.text.strip(), 'http://example.com/additional')
+
+    def test_complex_fields_from_prefetched_relations(self):
+        self.person.contact_details.create(
+            contact_type='twitter', value='johnwelldescribed')
+        person_extra = PersonExtra.objects.joins_for_csv_output() \
+            .get(pk=self.person_extra.pk)
+        field_names = [f.name for f in ComplexPopoloField.objects.all()]
+        # Only the query for the complex fields themselves is needed:
+        with self.assertNumQueries(1):
+            values = {name: getattr(person_extra, name) for name in field_names}
+        self.assertEqual(values['twitter_username'], 'johnwelldescribed')
+        self.assertEqual(values['additional_link'], 'http://example.com/additional')
+        self.assertEqual(values['homepage_url'], '')
+
+    def test_update_complex_field_clears_values(self):
+        self.assertEqual(
+            self.person_extra.additional_link, 'http://example.com/additional')
+        self.person_extra.update_complex_field(
+            self.an_field, 'http://example.com/changed')
+        self.assertEqual(
+            self.person_extra.additional_link, 'http://example.com/changed')
+        self.person_extra.update_complex_field(self.an_field, '')
+        self.assertEqual(self.person_extra.additional_link, '')
+
+    def test_old_info_type(self):
+        self.an_field.old_info_type = 'extra_link'
+        self.an_field.save()
+        self.person.links.all().delete()
+        self.person.links.create(note='extra_link', url='http://example.com/old')
+        person_extra = PersonExtra.objects.get(pk=self.person_extra.pk)
+        self.assertEqual(person_extra.additional_link, 'http://example.com/old')
@@ -3,7 +3,10 @@ from __future__ import unicode_literals
 from django_webtest import WebTest
 from popolo.models import Person
 
-from candidates.models import PostExtra
+from candidates.models import (
+    PostExtra, get_constituency_lock, get_locked_post_elections,
+    is_post_locked
+)
 
 from .auth import TestUserMixin
 from .factories import CandidacyExtraFactory, PersonExtraFactory
@@ -128,6 +131,56 @@ class TestConstituencyLockAndUnlock(TestUserMixin, UK2015ExamplesMixin, WebTest)
         self.assertNotIn('Camberwell', response.text)
 
 
+class TestLockedPostElections(UK2015ExamplesMixin, WebTest):
+
+    def test_locked_post_elections_single_query(self):
+        update_lock(self.camberwell_post_extra, self.election, True)
+        posts_and_elections = [
+            (self.camberwell_post_extra.base, self.election),
+            (self.camberwell_post_extra.base, self.earlier_election),
+            (self.dulwich_post_extra.base, self.election),
+        ]
+        with self.assertNumQueries(1):
+            locked_post_elections = \
+                get_locked_post_elections(posts_and_elections)
+        self.assertEqual(
+            locked_post_elections,
+            {(self.camberwell_post_extra.base.id, self.election.id)}
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [
+                    is_post_locked(post, election, locked_post_elections)
+                    for post, election in posts_and_elections
+                ],
+                [True, False, False]
+            )
+
+    def test_no_post_elections_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(get_locked_post_elections([]), set())
+
+    def test_pairs_without_a_post_are_ignored(self):
+        update_lock(self.camberwell_post_extra, self.election, True)
+        posts_and_elections = [
+            (None, self.election),
+            (self.camberwell_post_extra.base, self.election),
+        ]
+        locked_post_elections = get_locked_post_elections(posts_and_elections)
+        self.assertEqual(
+            locked_post_elections,
+            {(self.camberwell_post_extra.base.id, self.election.id)}
+        )
+        self.assertEqual(
+            get_constituency_lock(
+                None, None, self.election, locked_post_elections),
+            (False, True)
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                get_locked_post_elections([(None, self.election)]), set())
+
+
 class TestConstituencyLockWorks(TestUserMixin, UK2015ExamplesMixin, WebTest):
 
     def setUp(self):
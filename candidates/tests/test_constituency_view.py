@@ -1,5 +1,7 @@
 from __future__ import unicode_literals
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.six import text_type
 from django_webtest import WebTest
 
@@ -102,6 +104,18 @@ class TestConstituencyDetailView(TestUserMixin, UK2015ExamplesMixin, WebTest):
         self.assertEqual(2, len(response.forms))
         self.assertEqual(response.forms[0].id, 'person_search_header')
 
+    def test_constituency_page_does_not_fetch_versions(self):
+        person_extra = PersonExtra.objects.get(base__id=2009)
+        person_extra.record_version({
+            'information_source': 'An initial version',
+            'version_id': '5469de7db0cbd155',
+            'timestamp': '2014-10-01T15:12:34.732426',
+        })
+        with CaptureQueriesContext(connection) as context:
+            self.app.get('/election/2015/post/65808/dulwich-and-west-norwood')
+        for query in context.captured_queries:
+            self.assertNotIn('candidates_personversion', query['sql'])
+
     def test_any_constituency_page(self):
         # Just a smoke test for the moment:
         response = self.app.get(
@@ -3,13 +3,29 @@
 from __future__ import unicode_literals
 
 from datetime import timedelta
+import io
+from os import listdir
 from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
 
 from django.conf import settings
+from django.core.management import call_command
 from django.test import TestCase
 
-from candidates.models import PersonExtra, ImageExtra
-from ..csv_helpers import list_to_csv
+from popolo.models import Person
+
+from candidates.models import (
+    CSVExportCache, CSVExportInvalidation, LoggedAction, PersonExtra,
+    ImageExtra
+)
+from ..csv_helpers import (
+    get_sort_key, list_to_csv, merge_sorted_files, write_csv,
+    SortedRowSpool, SortedRowSpools
+)
+from ..management.commands.candidates_create_csv import (
+    spool_person_range, split_pk_range
+)
 
 from . import factories
 from .auth import TestUserMixin
@@ -155,3 +171,257 @@ class CSVTests(TestUserMixin, UK2015ExamplesMixin, TestCase):
             list_of_dicts = gb_person_extra.as_list_of_dicts(None)
             list_of_dicts += ni_person_extra.as_list_of_dicts(None)
         self.assertEqual(list_to_csv(list_of_dicts), example_output)
+
+    def test_sorted_row_spool_matches_list_to_csv(self):
+        gb_person_extra = get_person_extra_with_joins(self.gb_person_extra.id)
+        ni_person_extra = get_person_extra_with_joins(self.ni_person_extra.id)
+        list_of_dicts = gb_person_extra.as_list_of_dicts(None)
+        list_of_dicts += ni_person_extra.as_list_of_dicts(None)
+        for group_by_post in (False, True):
+            # A chunk size of 1 means every row is spilled to its own
+            # temporary file before being merged back together:
+            spool = SortedRowSpool(group_by_post, chunk_size=1)
+            for row in list_of_dicts:
+                spool.add(row)
+            self.assertEqual(len(spool), 4)
+            self.assertEqual(len(spool.runs), 4)
+            output = io.BytesIO()
+            write_csv(spool, output)
+            spool.close()
+            self.assertEqual(
+                output.getvalue().decode('utf-8'),
+                list_to_csv(list_of_dicts, group_by_post)
+            )
+
+    def test_sorted_row_spools_limit_open_runs(self):
+        # With lots of elections and a tiny memory budget, each spill
+        # used to write out just a row or two to a new temporary file:
+        spools = SortedRowSpools(
+            max_buffered_rows=2, min_run_size=5, max_runs=4)
+        election_slugs = ['election-{0}'.format(i) for i in range(100)]
+        for election_slug in election_slugs:
+            spools.create(election_slug)
+        rows_added = {}
+        for i in range(30):
+            for election_slug in election_slugs:
+                row = {
+                    'name': 'Candidate {0}'.format((i * 7) % 30),
+                    'election_current': True,
+                    'election_date': '2015-05-07',
+                    'election': election_slug,
+                    'post_label': 'Post {0}'.format(i),
+                }
+                spools.add(election_slug, row)
+                rows_added.setdefault(election_slug, []).append(row)
+        runs = [len(spool.runs) for key, spool in spools.items()]
+        self.assertLessEqual(max(runs), 4)
+        self.assertLessEqual(sum(runs), 30 * 100 // 5)
+        for election_slug, spool in spools.items():
+            self.assertEqual(
+                list(spool),
+                sorted(rows_added[election_slug], key=get_sort_key())
+            )
+        spools.close()
+
+    def get_expected_csv(self, election):
+        list_of_dicts = []
+        for person_extra_id in (self.ni_person_extra.id, self.gb_person_extra.id):
+            person_extra = get_person_extra_with_joins(person_extra_id)
+            list_of_dicts += person_extra.as_list_of_dicts(election)
+        return list_to_csv(list_of_dicts, group_by_post=election is not None)
+
+    def read_output_directory(self, output_directory):
+        result = {}
+        for filename in listdir(output_directory):
+            with open(join(output_directory, filename), 'rb') as f:
+                result[filename] = f.read().decode('utf-8')
+        return result
+
+    def run_create_csv_command(self, *args):
+        output_directory = mkdtemp()
+        try:
+            prefix = join(output_directory, 'candidates')
+            call_command('candidates_create_csv', prefix, *args)
+            return self.read_output_directory(output_directory)
+        finally:
+            rmtree(output_directory)
+
+    def test_create_csv_command(self):
+        output = self.run_create_csv_command()
+        self.assertEqual(
+            sorted(output.keys()),
+            [
+                'candidates-2010.csv',
+                'candidates-2015.csv',
+                'candidates-all.csv',
+                'candidates-elected-2010.csv',
+                'candidates-elected-2015.csv',
+                'candidates-elected-all.csv',
+            ]
+        )
+        self.assertEqual(
+            output['candidates-all.csv'], self.get_expected_csv(None))
+        self.assertEqual(
+            output['candidates-2015.csv'],
+            self.get_expected_csv(self.election))
+        self.assertEqual(
+            output['candidates-2010.csv'],
+            self.get_expected_csv(self.earlier_election))
+        all_rows = output['candidates-all.csv'].splitlines()
+        self.assertEqual(len(all_rows), 5)
+        # Sorted by last name:
+        self.assertTrue(all_rows[1].startswith('2009,Tessa Jowell,'))
+        self.assertTrue(all_rows[3].startswith('1953,Daith\xed McKay,'))
+        election_rows = output['candidates-2015.csv'].splitlines()
+        self.assertEqual(len(election_rows), 3)
+        # Sorted by post label:
+        self.assertIn('Camberwell and Peckham', election_rows[1])
+        self.assertIn('North Antrim', election_rows[2])
+        self.assertEqual(
+            len(output['candidates-elected-2015.csv'].splitlines()), 1)
+
+    def test_create_csv_command_single_election(self):
+        output = self.run_create_csv_command('--election', '2010')
+        self.assertEqual(
+            sorted(output.keys()),
+            ['candidates-2010.csv', 'candidates-elected-2010.csv']
+        )
+        self.assertEqual(
+            output['candidates-2010.csv'],
+            self.get_expected_csv(self.earlier_election))
+
+    def test_create_csv_command_incremental(self):
+        output_directory = mkdtemp()
+        prefix = join(output_directory, 'candidates')
+
+        def mark_as_stale(*election_slugs):
+            for election_slug in election_slugs:
+                with open(prefix + '-' + election_slug + '.csv', 'wb') as f:
+                    f.write(b'stale')
+
+        try:
+            # The first incremental run has to generate everything:
+            call_command('candidates_create_csv', prefix, '--incremental')
+            self.assertEqual(
+                self.read_output_directory(output_directory),
+                self.run_create_csv_command()
+            )
+            # If nothing has changed, no files should be rewritten:
+            mark_as_stale('2010', '2015', 'all')
+            call_command('candidates_create_csv', prefix, '--incremental')
+            output = self.read_output_directory(output_directory)
+            self.assertEqual(output['candidates-2010.csv'], 'stale')
+            self.assertEqual(output['candidates-2015.csv'], 'stale')
+            self.assertEqual(output['candidates-all.csv'], 'stale')
+            # Now mark someone as elected in 2015; only the files for
+            # 2015 and for all elections should be rewritten:
+            candidacy = self.gb_person_extra.base.memberships.get(
+                extra__election=self.election)
+            candidacy.extra.elected = True
+            candidacy.extra.save()
+            LoggedAction.objects.create(
+                user=self.user,
+                person=self.gb_person_extra.base,
+                action_type='set-candidate-elected',
+                source='Just for tests...',
+            )
+            call_command('candidates_create_csv', prefix, '--incremental')
+            output = self.read_output_directory(output_directory)
+            self.assertEqual(output['candidates-2010.csv'], 'stale')
+            expected_output = self.run_create_csv_command()
+            for filename in (
+                    'candidates-2015.csv',
+                    'candidates-elected-2015.csv',
+                    'candidates-all.csv',
+                    'candidates-elected-all.csv',
+            ):
+                self.assertEqual(output[filename], expected_output[filename])
+            self.assertEqual(
+                len(output['candidates-elected-2015.csv'].splitlines()), 2)
+            # Deleting someone should remove their rows:
+            mark_as_stale('2010')
+            self.ni_person_extra.base.delete()
+            call_command('candidates_create_csv', prefix, '--incremental')
+            self.assertEqual(
+                self.read_output_directory(output_directory),
+                self.run_create_csv_command()
+            )
+            # A new identifier for someone only needs their rows to be
+            # regenerated:
+            self.gb_person_extra.base.identifiers.create(
+                scheme='twitter', identifier='1234567')
+            self.assertEqual(
+                list(CSVExportInvalidation.objects.filter(
+                    created__gte=CSVExportCache.objects.get().rows_updated
+                ).values_list('person_id', flat=True)),
+                [2009]
+            )
+            call_command('candidates_create_csv', prefix, '--incremental')
+            output = self.read_output_directory(output_directory)
+            self.assertIn('1234567', output['candidates-2015.csv'])
+            self.assertEqual(output, self.run_create_csv_command())
+            # A change committed after the last run looked for changes,
+            # but made before it started, should still be picked up:
+            rows_updated = CSVExportCache.objects.get().rows_updated
+            Person.objects.filter(pk=2009).update(
+                name='Tessa Jowell-Mills',
+                updated_at=rows_updated - timedelta(minutes=1)
+            )
+            call_command('candidates_create_csv', prefix, '--incremental')
+            output = self.read_output_directory(output_directory)
+            self.assertIn('Tessa Jowell-Mills', output['candidates-2015.csv'])
+            self.assertEqual(output, self.run_create_csv_command())
+            # Renaming a party isn't logged against anyone, but
+            # should still update everyone's rows:
+            party = self.gb_person_extra.base.memberships.get(
+                extra__election=self.election).on_behalf_of
+            party.name = 'The Renamed Party'
+            party.save()
+            call_command('candidates_create_csv', prefix, '--incremental')
+            output = self.read_output_directory(output_directory)
+            self.assertIn('The Renamed Party', output['candidates-2015.csv'])
+            self.assertEqual(output, self.run_create_csv_command())
+        finally:
+            rmtree(output_directory)
+
+    def test_parallel_partial_files_merge_to_same_output(self):
+        # This runs what each worker process would do in
+        # candidates_create_csv --workers, but in this process, with
+        # a range for each person:
+        output_directory = mkdtemp()
+        try:
+            pk_ranges = sorted(
+                (pk, pk + 1) for pk in
+                PersonExtra.objects.values_list('pk', flat=True)
+            )
+            election_slugs = ['2010', '2015', None]
+            partial_filenames = [
+                spool_person_range(
+                    part, pk_range, election_slugs, None, None,
+                    output_directory
+                )
+                for part, pk_range in enumerate(pk_ranges)
+            ]
+            key = ('all', None)
+            self.assertEqual(
+                sum(1 for p in partial_filenames if key in p), 2)
+            output = io.BytesIO()
+            write_csv(
+                merge_sorted_files(
+                    [p[key] for p in partial_filenames if key in p]),
+                output
+            )
+            self.assertEqual(
+                output.getvalue().decode('utf-8'),
+                self.get_expected_csv(None)
+            )
+        finally:
+            rmtree(output_directory)
+
+    def test_split_pk_range_covers_every_pk(self):
+        pk_ranges = split_pk_range(3, 1002, 8)
+        self.assertEqual(len(pk_ranges), 8)
+        self.assertEqual(pk_ranges[0][0], 3)
+        self.assertEqual(pk_ranges[-1][1], 1003)
+        for previous_range, next_range in zip(pk_ranges, pk_ranges[1:]):
+            self.assertEqual(previous_range[1], next_range[0])
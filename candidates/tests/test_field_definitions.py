@@ -0,0 +1,58 @@
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from candidates.models import ComplexPopoloField, ExtraField
+from candidates.models.fields import (
+    FIELD_DEFINITIONS_VERSION_CACHE_KEY, get_complex_popolo_fields
+)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class TestFieldDefinitionCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cv_field = ExtraField.objects.create(
+            key='cv', type='longer-text', label='CV', order=2)
+
+    def test_cached_field_definitions(self):
+        self.assertEqual(
+            [f.key for f in ExtraField.objects.cached()], ['cv'])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [f.key for f in ExtraField.objects.cached()], ['cv'])
+
+    def test_saving_a_field_definition_reloads_them(self):
+        ExtraField.objects.cached()
+        ExtraField.objects.create(
+            key='slogan', type='line', label='Slogan', order=1)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                [f.key for f in ExtraField.objects.cached()],
+                ['slogan', 'cv']
+            )
+        self.cv_field.delete()
+        self.assertEqual(
+            [f.key for f in ExtraField.objects.cached()], ['slogan'])
+
+    def test_changes_in_another_process_reload_them(self):
+        get_complex_popolo_fields()
+        # Updating the table directly doesn't send any signals, so
+        # this process doesn't know about it yet:
+        ComplexPopoloField.objects.filter(name='twitter_username') \
+            .update(name='twitter')
+        self.assertIn('twitter_username', get_complex_popolo_fields())
+        # ... until the version changes, as it would if the change had
+        # been saved in another process:
+        cache.set(FIELD_DEFINITIONS_VERSION_CACHE_KEY, 'another version')
+        with self.assertNumQueries(1):
+            complex_fields = get_complex_popolo_fields()
+        self.assertIn('twitter', complex_fields)
+        self.assertNotIn('twitter_username', complex_fields)
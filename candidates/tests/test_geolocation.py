@@ -13,7 +13,7 @@ from candidates.tests.factories import (
 from .uk_examples import UK2015ExamplesMixin
 
 
-def fake_requests_for_mapit(url):
+def fake_requests_for_mapit(url, **kwargs):
     """Return reduced MapIt output for some known URLs"""
     if url == 'http://global.mapit.mysociety.org/point/4326/51.5,-0.143207?type=LAC,WMC&generation=22':
         status_code = 200
@@ -35,7 +35,7 @@ def fake_requests_for_mapit(url):
     })
 
 
-@patch('candidates.views.frontpage.requests')
+@patch('candidates.mapit.session')
 class TestGeolocator(UK2015ExamplesMixin, WebTest):
 
     def setUp(self):
@@ -77,26 +77,26 @@ class TestGeolocator(UK2015ExamplesMixin, WebTest):
             base__area=area_extra.base,
         )
 
-    def test_valid_coords_redirects_to_constituency(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_mapit
+    def test_valid_coords_redirects_to_constituency(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
         response = self.app.get('/geolocator/-0.143207,51.5')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json, {'url': '/areas/WMC--gss:E14000639'})
 
-    def test_valid_coords_redirects_with_two_elections(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_mapit
+    def test_valid_coords_redirects_with_two_elections(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
         response = self.app.get('/geolocator/-0.09153,51.444')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json, {'url': '/areas/LAC--gss:E32000010,WMC--gss:E14000673'})
 
-    def test_invalid_coords_returns_error(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_mapit
+    def test_invalid_coords_returns_error(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
         response = self.app.get('/geolocator/-0.143207,1.5')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json, {'error': 'Your location does not seem to be covered by this site'})
 
-    def test_handles_mapit_error(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_mapit
+    def test_handles_mapit_error(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
         response = self.app.get('/geolocator/-0.207,1.5')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json, {'error': 'The area lookup returned an error: \'There was an error\''})
@@ -0,0 +1,190 @@
+from __future__ import unicode_literals
+
+from os.path import dirname, join, realpath
+from random import Random
+
+from mock import patch
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from candidates.local_areas import (
+    BoundingBoxTree, LocalAreaResolver, get_local_area_resolver
+)
+from candidates.mapit import (
+    AREA_LOOKUP_TIMEOUT_SECONDS, get_areas_from_coords, get_areas_from_point,
+    get_areas_from_postcode
+)
+
+from .factories import AreaTypeFactory
+
+DATA_DIRECTORY = realpath(join(dirname(__file__), 'data'))
+POSTCODES_FILE = join(DATA_DIRECTORY, 'local_area_postcodes.csv')
+BOUNDARIES_FILE = join(DATA_DIRECTORY, 'local_area_boundaries.geojson')
+
+
+class TestBoundingBoxTree(TestCase):
+
+    def test_search_finds_the_same_as_checking_every_box(self):
+        random = Random(42)
+        entries = []
+        for i in range(1000):
+            x, y = random.uniform(0, 100), random.uniform(0, 100)
+            width, height = random.uniform(0, 10), random.uniform(0, 10)
+            entries.append(((x, y, x + width, y + height), i))
+        tree = BoundingBoxTree(entries)
+        self.assertEqual(tree.height, 2)
+        for j in range(100):
+            x, y = random.uniform(0, 110), random.uniform(0, 110)
+            self.assertEqual(
+                sorted(tree.search(x, y)),
+                [
+                    i for (min_x, min_y, max_x, max_y), i in entries
+                    if min_x <= x <= max_x and min_y <= y <= max_y
+                ]
+            )
+
+    def test_empty_tree(self):
+        self.assertEqual(BoundingBoxTree([]).search(0, 0), [])
+
+
+class TestLocalAreaResolver(TestCase):
+
+    def setUp(self):
+        self.resolver = LocalAreaResolver.from_files(
+            POSTCODES_FILE, [BOUNDARIES_FILE])
+
+    def test_areas_for_postcode(self):
+        self.assertEqual(
+            sorted(
+                (a['type'], a['id'], a['name']) for a in
+                self.resolver.areas_for_postcode('se240ag').values()
+            ),
+            [
+                ('LAC', '11822', 'Lambeth and Southwark'),
+                ('WMC', '65808', 'Dulwich and West Norwood'),
+            ]
+        )
+
+    def test_unknown_postcode(self):
+        self.assertIsNone(self.resolver.areas_for_postcode('SE1 1AA'))
+
+    def test_areas_at_point(self):
+        areas = self.resolver.areas_at_point(-0.09153, 51.444)
+        self.assertEqual(sorted(areas.keys()), ['11822', '65808'])
+        self.assertEqual(areas['65808']['codes'], {'gss': 'E14000673'})
+        self.assertEqual(
+            list(self.resolver.areas_at_point(-0.09153, 51.444, ['LAC'])),
+            ['11822']
+        )
+
+    def test_point_in_a_hole_and_in_a_multipolygon(self):
+        self.assertEqual(
+            list(self.resolver.areas_at_point(-0.165, 51.505)), ['65808'])
+
+    def test_point_outside_every_area(self):
+        self.assertEqual(self.resolver.areas_at_point(0.5, 0.5), {})
+
+    def test_areas_at_coords(self):
+        self.assertEqual(
+            list(self.resolver.areas_at_coords('-0.143207,51.5')), ['65759'])
+        self.assertEqual(
+            list(self.resolver.areas_at_coords(
+                '51.5,-0.143207', latitude_first=True)),
+            ['65759']
+        )
+        self.assertEqual(self.resolver.areas_at_coords('nowhere'), {})
+
+
+@override_settings(
+    LOCAL_AREA_POSTCODES_FILE=POSTCODES_FILE,
+    LOCAL_AREA_BOUNDARIES_FILES=[BOUNDARIES_FILE],
+)
+@patch('candidates.mapit.session')
+class TestLocalAreaLookups(TestCase):
+
+    def setUp(self):
+        AreaTypeFactory.create(name='WMC')
+
+    def test_resolver_is_only_loaded_once(self, mock_session):
+        self.assertIs(get_local_area_resolver(), get_local_area_resolver())
+
+    @override_settings(
+        LOCAL_AREA_POSTCODES_FILE=None,
+        LOCAL_AREA_BOUNDARIES_FILES=[],
+    )
+    def test_no_resolver_without_files(self, mock_session):
+        self.assertIsNone(get_local_area_resolver())
+
+    def test_postcode_lookup(self, mock_session):
+        self.assertEqual(
+            get_areas_from_postcode('SW1A 1AA'), [('WMC', '65759')])
+        self.assertFalse(mock_session.get.called)
+
+    def test_coordinates_lookup(self, mock_session):
+        self.assertEqual(
+            get_areas_from_coords('-0.09153,51.444'), [('WMC', '65808')])
+        self.assertFalse(mock_session.get.called)
+
+    def test_point_lookup(self, mock_session):
+        self.assertEqual(
+            list(get_areas_from_point(-0.09153, 51.444, ['LAC'], 22)),
+            ['11822']
+        )
+        self.assertFalse(mock_session.get.called)
+
+    def test_unknown_postcode_is_looked_up_on_mapit(self, mock_session):
+        mock_session.get.return_value.status_code = 200
+        mock_session.get.return_value.json.return_value = {
+            'areas': {
+                '65636': {'id': 65636, 'type': 'WMC'},
+            }
+        }
+        self.assertEqual(
+            get_areas_from_postcode('SE1 1AA'), [('WMC', '65636')])
+        mock_session.get.assert_called_once_with(
+            'http://global.mapit.mysociety.org/postcode/SE1%201AA',
+            timeout=AREA_LOOKUP_TIMEOUT_SECONDS
+        )
+
+    def test_postcode_with_missing_area_types_is_looked_up_on_mapit(
+            self, mock_session):
+        AreaTypeFactory.create(name='CED')
+        mock_session.get.return_value.status_code = 200
+        mock_session.get.return_value.json.return_value = {
+            'areas': {
+                '65759': {'id': 65759, 'type': 'WMC'},
+                '2574': {'id': 2574, 'type': 'CED'},
+            }
+        }
+        self.assertEqual(
+            sorted(get_areas_from_postcode('SW1A 1AA')),
+            [('CED', '2574'), ('WMC', '65759')]
+        )
+        self.assertTrue(mock_session.get.called)
+
+    def test_coordinates_with_missing_area_types_are_looked_up_on_mapit(
+            self, mock_session):
+        AreaTypeFactory.create(name='CED')
+        mock_session.get.return_value.status_code = 200
+        mock_session.get.return_value.json.return_value = {
+            '65808': {'id': 65808, 'type': 'WMC'},
+            '2574': {'id': 2574, 'type': 'CED'},
+        }
+        self.assertEqual(
+            sorted(get_areas_from_coords('-0.09153,51.444')),
+            [('CED', '2574'), ('WMC', '65808')]
+        )
+        self.assertTrue(mock_session.get.called)
+
+    def test_point_with_missing_area_types_is_looked_up_on_mapit(
+            self, mock_session):
+        mock_session.get.return_value.json.return_value = {
+            '11822': {'id': 11822, 'type': 'LAC'},
+            '2574': {'id': 2574, 'type': 'CED'},
+        }
+        self.assertEqual(
+            sorted(get_areas_from_point(-0.09153, 51.444, ['LAC', 'CED'], 22)),
+            ['11822', '2574']
+        )
+        self.assertTrue(mock_session.get.called)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from mock import patch, Mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from candidates.mapit import (
+    BadCoordinatesException, BadPostcodeException, UnknownMapitException,
+    get_area_lookup_cache_key, get_area_lookup_stats, get_areas_from_coords,
+    get_areas_from_point, get_areas_from_postcode, normalise_coords,
+    normalise_postcode
+)
+
+from .factories import AreaTypeFactory
+
+
+def fake_requests_for_mapit(url, **kwargs):
+    if url == 'http://global.mapit.mysociety.org/point/4326/-0.143207%2C51.5':
+        status_code = 200
+        json_result = {
+            "65759": {
+                "id": 65759,
+                "name": "Cities of London and Westminster",
+                "type": "WMC",
+            },
+        }
+    elif url == 'http://global.mapit.mysociety.org/point/4326/-0.143207,51.5?type=WMC&generation=22':
+        status_code = 200
+        json_result = {}
+    elif url == 'http://global.mapit.mysociety.org/postcode/SE24%200AG':
+        status_code = 404
+        json_result = {'error': 'Postcode not found'}
+    else:
+        status_code = 500
+        json_result = {'error': 'There was an error'}
+    return Mock(**{
+        'json.return_value': json_result,
+        'status_code': status_code
+    })
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+@patch('candidates.mapit.session')
+class TestAreaLookupCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        AreaTypeFactory.create(name='WMC')
+
+    def test_normalised_keys(self, mock_session):
+        self.assertEqual(normalise_postcode(' se24  0ag\n'), 'SE240AG')
+        self.assertEqual(
+            normalise_coords('-0.1432071,51.5'), '-0.14321,51.50000')
+        self.assertEqual(normalise_coords('nowhere'), 'nowhere')
+        self.assertEqual(
+            get_area_lookup_cache_key('mapit-postcode', 'SE240AG'),
+            'mapit-postcode:SE240AG'
+        )
+        # Anything that mightn't be allowed in a memcached key is hashed:
+        self.assertEqual(
+            get_area_lookup_cache_key('mapit-postcode', 'SE24 0AG'),
+            'mapit-postcode:6bc48cb6791ca1c0474093f9ed1243ee'
+        )
+
+    def test_coordinates_are_cached(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
+        expected = [('WMC', '65759')]
+        self.assertEqual(get_areas_from_coords('-0.143207,51.5'), expected)
+        # Nearly the same point should get the cached result too:
+        self.assertEqual(get_areas_from_coords('-0.1432071,51.5'), expected)
+        self.assertEqual(mock_session.get.call_count, 1)
+        self.assertEqual(
+            get_area_lookup_stats(),
+            {'hit': 1, 'negative_hit': 0, 'miss': 1, 'coalesced': 0}
+        )
+
+    def test_empty_results_are_cached(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
+        for i in range(2):
+            self.assertEqual(
+                get_areas_from_point(-0.143207, 51.5, ['WMC'], 22), {})
+        self.assertEqual(mock_session.get.call_count, 1)
+
+    def test_bad_postcodes_are_cached(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
+        for postcode in ('SE24 0AG', 'se24 0ag'):
+            with self.assertRaises(BadPostcodeException):
+                get_areas_from_postcode(postcode)
+        self.assertEqual(mock_session.get.call_count, 1)
+        self.assertEqual(
+            get_area_lookup_stats(),
+            {'hit': 0, 'negative_hit': 1, 'miss': 1, 'coalesced': 0}
+        )
+
+    def test_cached_errors_are_translated_for_each_request(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
+        # As if the first request were in a different language:
+        with patch('candidates.mapit._', side_effect=lambda m: 'FR: ' + m):
+            with self.assertRaises(BadPostcodeException) as context:
+                get_areas_from_postcode('SE24 0AG')
+        self.assertEqual(
+            context.exception.args[0],
+            'FR: The postcode “SE24 0AG” couldn’t be found'
+        )
+        with self.assertRaises(BadPostcodeException) as context:
+            get_areas_from_postcode('SE24 0AG')
+        self.assertEqual(
+            context.exception.args[0],
+            'The postcode “SE24 0AG” couldn’t be found'
+        )
+        self.assertEqual(mock_session.get.call_count, 1)
+
+    def test_other_errors_are_not_cached(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
+        for i in range(2):
+            with self.assertRaises(UnknownMapitException):
+                get_areas_from_coords('1,1')
+        self.assertEqual(mock_session.get.call_count, 2)
+
+    def test_concurrent_lookup_result_is_shared(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
+        key = get_area_lookup_cache_key(
+            'mapit-coords', normalise_coords('-0.143207,51.5'))
+        # As if another request had started this lookup and then
+        # finished it while this one was waiting:
+        cache.add(key + ':lock', True)
+        cache_get_many = cache.get_many
+
+        def finish_other_lookup(keys):
+            cache.set(key, [('WMC', '65808')])
+            return cache_get_many(keys)
+
+        with patch.object(cache, 'get_many', side_effect=finish_other_lookup):
+            self.assertEqual(
+                get_areas_from_coords('-0.143207,51.5'), [('WMC', '65808')])
+        self.assertEqual(mock_session.get.call_count, 0)
+        self.assertEqual(get_area_lookup_stats()['coalesced'], 1)
+
+    def test_point_lookup_error(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_mapit
+        with self.assertRaisesRegexp(
+                BadCoordinatesException, 'There was an error'):
+            get_areas_from_point(0, 0, ['WMC'], 22)
@@ -387,6 +387,20 @@ class TestMergePeopleView(TestUserMixin, UK2015ExamplesMixin, WebTest):
         # The ID will be None now because the secondary has been deleted.
         self.assertEqual(mock_additional_merge_actions.call_args[0][1].id, None)
 
+        # Check that the version history of both people has been kept,
+        # with the merge as the most recent version:
+        version_ids = [v['version_id'] for v in merged_person.extra.versions]
+        self.assertEqual(version_ids[0], example_version_id)
+        self.assertEqual(
+            sorted(version_ids[1:]),
+            [
+                '274e50504df330e4',
+                '35ec2d5821176ccc',
+                '5469de7db0cbd155',
+                '68a452284d95d9ab',
+            ]
+        )
+
     @patch('candidates.views.version_data.get_current_timestamp')
     @patch('candidates.views.version_data.create_version_id')
     def test_merge_regression(
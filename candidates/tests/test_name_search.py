@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from mock import Mock
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from haystack.backends.elasticsearch_backend import (
+    ElasticsearchSearchBackend
+)
+from popolo.models import Person
+
+from bulk_adding.forms import BaseBulkAddReviewFormSet
+from candidates.models import (
+    PersonNameToken, search_people_in_database,
+    search_people_by_names_in_database
+)
+from candidates.models.name_search import get_name_tokens
+from candidates.models.search_index import update_search_index
+from candidates.views.search import (
+    elasticsearch_multi_search, haystack_search_person_by_name
+)
+
+from .factories import PersonExtraFactory
+
+
+class TestNameTokens(TestCase):
+
+    def test_tokens(self):
+        self.assertEqual(
+            get_name_tokens("Siân O'Neill-Jones siân"),
+            ['sian', 'o', 'neill', 'jones']
+        )
+
+    def test_underscores_separate_words(self):
+        self.assertEqual(get_name_tokens('a_b%'), ['a', 'b'])
+
+    def test_escaped_name(self):
+        self.assertEqual(get_name_tokens("O&#39;Lucas"), ['o', 'lucas'])
+
+
+@override_settings(SEARCH_BACKEND='database')
+class TestDatabaseNameSearch(TestCase):
+
+    def setUp(self):
+        for person_id, name in (
+                (1, 'John Quincy Adams'),
+                (2, 'John Adams'),
+                (3, 'Johnny Adamson'),
+                (4, 'Siân Berry'),
+                (5, "Charlotte O'Lucas"),
+                (6, 'Quincy Jones'),
+                (7, 'Aaron Johnson Adams'),
+        ):
+            PersonExtraFactory.create(base__id=person_id, base__name=name)
+        update_search_index()
+
+    def search(self, name):
+        return [r.pk for r in search_people_in_database(name)]
+
+    def test_tokens_are_created_from_the_queue(self):
+        self.assertEqual(
+            sorted(
+                PersonNameToken.objects.filter(person_id=5)
+                .values_list('token', flat=True)
+            ),
+            ['charlotte', 'lucas', 'o']
+        )
+
+    def test_partial_names(self):
+        self.assertEqual(self.search('Joh Ada'), [1, 2, 3, 7])
+
+    def test_whole_words_rank_higher(self):
+        self.assertEqual(self.search('John Adams'), [1, 2, 7, 3])
+
+    def test_only_first_and_last_names_need_to_match(self):
+        self.assertEqual(
+            self.search('John Fitzgerald Adams'), [1, 2, 7, 3])
+        self.assertEqual(self.search('John Quincy Adams'), [1, 2, 7, 3])
+
+    def test_accents_and_apostrophes(self):
+        self.assertEqual(self.search('sian berry'), [4])
+        self.assertEqual(self.search("O'Lucas"), [5])
+        self.assertEqual(self.search("O&#39;Lucas"), [5])
+
+    def test_single_letters_only_match_whole_words(self):
+        self.assertEqual(self.search('J Adams'), [])
+
+    def test_no_words(self):
+        self.assertEqual(self.search('  !'), [])
+
+    def test_other_names_and_renames(self):
+        person = Person.objects.get(id=6)
+        person.other_names.create(name='Quincy Delight Jones')
+        person.name = 'Q Jones'
+        person.save()
+        update_search_index()
+        self.assertEqual(self.search('delight'), [6])
+        person.delete()
+        update_search_index()
+        self.assertEqual(self.search('delight'), [])
+
+    def test_results_are_only_fetched_when_sliced(self):
+        results = search_people_in_database('Adams')
+        self.assertEqual(len(results), 4)
+        with self.assertNumQueries(1):
+            first = results[0]
+        self.assertEqual(first.name, 'John Quincy Adams')
+        self.assertEqual(first.object.extra.base_id, 1)
+
+    def test_search_page(self):
+        response = self.client.get('/search?q=Charl+O%27Luc')
+        self.assertContains(response, "Charlotte O&#39;Lucas")
+        self.assertNotContains(response, 'Siân Berry')
+
+    def test_several_names_in_one_query(self):
+        with self.assertNumQueries(2):
+            results = search_people_by_names_in_database(
+                ['John Adams', 'Quincy', '!', 'Berry'], 3)
+        self.assertEqual(
+            {name: [r.pk for r in people] for name, people in results.items()},
+            {
+                'John Adams': [1, 2, 7],
+                'Quincy': [1, 6],
+                '!': [],
+                'Berry': [4],
+            }
+        )
+        self.assertEqual(results['Berry'][0].name, 'Siân Berry')
+
+    def test_bulk_add_suggestions(self):
+        formset = BaseBulkAddReviewFormSet.__new__(BaseBulkAddReviewFormSet)
+        formset.suggestion_count = 5
+        self.assertEqual(
+            [s.pk for s in formset.suggested_people(['John Adams'])['John Adams']],
+            [1, 2, 7, 3]
+        )
+
+
+class TestElasticsearchMultiSearch(TestCase):
+
+    def setUp(self):
+        self.backend = ElasticsearchSearchBackend(
+            'default', URL='http://localhost:9200/', INDEX_NAME='test')
+        self.backend.setup_complete = True
+        self.backend.conn = Mock()
+
+    def test_one_request_for_all_searches(self):
+        self.backend.conn.msearch.return_value = {
+            'responses': [
+                {'hits': {'total': 1, 'hits': [{
+                    '_score': 1.0,
+                    '_source': {
+                        'django_ct': 'popolo.person',
+                        'django_id': '2009',
+                        'name': 'Tessa Jowell',
+                    },
+                }]}},
+                {'hits': {'total': 0, 'hits': []}},
+            ]
+        }
+        results = elasticsearch_multi_search(
+            self.backend,
+            [
+                haystack_search_person_by_name('Tessa Jowell'),
+                haystack_search_person_by_name('Frank Dobson'),
+            ],
+            5
+        )
+        self.assertEqual(self.backend.conn.msearch.call_count, 1)
+        body = self.backend.conn.msearch.call_args[0][0]
+        self.assertEqual(len(body), 4)
+        self.assertEqual(body[1]['size'], 5)
+        self.assertEqual(
+            [[(r.pk, r.name) for r in people] for people in results],
+            [[('2009', 'Tessa Jowell')], []]
+        )
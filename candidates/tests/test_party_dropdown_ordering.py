@@ -1,3 +1,6 @@
+from django.core.cache import cache
+from django.test.utils import override_settings
+
 from django_webtest import WebTest
 
 from . import factories
@@ -146,3 +149,61 @@ class TestPartyDropDownOrdering(TestUserMixin, UK2015ExamplesMixin, WebTest):
                 (str(self.labour_party_extra.base.id), u'Labour Party'),
             ],
         )
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+    def test_party_choices_cached_until_changes(self):
+        cache.clear()
+        self.create_lots_of_candidates(
+            self.election,
+            (
+                (self.ld_party_extra, 30),
+                (self.green_party_extra, 15),
+            )
+        )
+        party_choices = self.gb_parties.party_choices()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.gb_parties.party_choices(), party_choices)
+        # A new candidacy should change the counts:
+        pe = factories.PersonExtraFactory.create(
+            base__id=4242, base__name='Jane Doe')
+        factories.CandidacyExtraFactory.create(
+            election=self.election,
+            base__person=pe.base,
+            base__post=self.dulwich_post_extra.base,
+            base__on_behalf_of=self.conservative_party_extra.base,
+        )
+        self.assertEqual(
+            self.gb_parties.party_choices()[3],
+            (str(self.conservative_party_extra.base.id),
+             u'Conservative Party (1 candidates)'),
+        )
+        # ... as should a new party description:
+        self.green_party_extra.base.other_names.create(
+            name="Scottish Green Party")
+        self.assertEqual(
+            self.gb_parties.party_choices()[2],
+            (
+                u'Green Party (15 candidates)', [
+                    (self.green_party_extra.base.id, u'Green Party'),
+                    (str(self.green_party_extra.base.id),
+                     u'Scottish Green Party'),
+                ]
+            )
+        )
+        # ... and the election no longer being current:
+        self.election.current = False
+        self.election.save()
+        self.assertEqual(
+            self.gb_parties.party_choices()[1],
+            (str(self.ld_party_extra.base.id),
+             u'Liberal Democrats (30 candidates)'),
+        )
+        self.assertEqual(
+            self.gb_parties.party_choices(include_descriptions=False)[2],
+            (str(self.green_party_extra.base.id),
+             u'Green Party (15 candidates)'),
+        )
@@ -0,0 +1,193 @@
+from __future__ import unicode_literals
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from candidates.models import PersonVersion
+
+from . import factories
+from .uk_examples import UK2015ExamplesMixin
+
+
+def make_change_metadata(i):
+    return {
+        'information_source': 'Edit number {0}'.format(i),
+        'version_id': '{0:016x}'.format(i),
+        'timestamp': '2015-05-08T01:52:{0:02d}.061038'.format(i % 60),
+        'username': 'alice',
+    }
+
+
+class TestPersonVersions(UK2015ExamplesMixin, TestCase):
+
+    def setUp(self):
+        super(TestPersonVersions, self).setUp()
+        self.person_extra = factories.PersonExtraFactory.create(
+            base__id=2009,
+            base__name='Tessa Jowell',
+        )
+        factories.CandidacyExtraFactory.create(
+            election=self.election,
+            base__person=self.person_extra.base,
+            base__post=self.dulwich_post_extra.base,
+            base__on_behalf_of=self.labour_party_extra.base
+        )
+
+    def record_version_queries(self, i):
+        with CaptureQueriesContext(connection) as context:
+            self.person_extra.record_version(make_change_metadata(i))
+        return len(context.captured_queries)
+
+    def test_record_version_cost_independent_of_history(self):
+        # The first call populates some caches, so compare the second
+        # version with the fiftieth:
+        self.person_extra.record_version(make_change_metadata(0))
+        second_version_queries = self.record_version_queries(1)
+        for i in range(2, 49):
+            self.person_extra.record_version(make_change_metadata(i))
+        self.assertEqual(
+            second_version_queries, self.record_version_queries(49))
+        self.assertEqual(PersonVersion.objects.count(), 50)
+
+    def test_versions_most_recent_first(self):
+        for i in range(3):
+            self.person_extra.record_version(make_change_metadata(i))
+        versions = self.person_extra.versions
+        self.assertEqual(
+            [v['information_source'] for v in versions],
+            ['Edit number 2', 'Edit number 1', 'Edit number 0']
+        )
+        self.assertEqual(
+            versions[0],
+            dict(
+                make_change_metadata(2),
+                data=versions[0]['data'],
+            )
+        )
+        self.assertEqual(versions[0]['data']['name'], 'Tessa Jowell')
+        self.assertEqual(
+            versions[0]['data']['standing_in']['2015']['post_id'],
+            '65808'
+        )
+
+    def test_iter_versions_before_same_timestamp(self):
+        for i in range(2):
+            version = dict(make_change_metadata(i), data={})
+            version['timestamp'] = '2015-05-08T01:52:00.000000'
+            PersonVersion.from_dict(self.person_extra.base, version).save()
+        later_version = PersonVersion.from_dict(
+            self.person_extra.base,
+            dict(make_change_metadata(2), data={})
+        )
+        self.assertEqual(
+            [
+                v['version_id'] for v in
+                self.person_extra.iter_versions_before(
+                    later_version.timestamp)
+            ],
+            ['0000000000000001', '0000000000000000']
+        )
+
+    def test_version_dict_round_trip(self):
+        version = {
+            'information_source': 'Imported from PopIt',
+            'version_id': '5469de7db0cbd155',
+            'timestamp': '2014-10-01T15:12:34.732426',
+            'data': {'id': '2009', 'name': 'Tessa Jowell'},
+        }
+        PersonVersion.from_dict(self.person_extra.base, version).save()
+        self.assertEqual(self.person_extra.versions, [version])
+
+    def test_timestamp_without_microseconds(self):
+        version = {
+            'information_source': 'Imported from PopIt',
+            'version_id': '5469de7db0cbd155',
+            'timestamp': '2014-10-01T15:12:34',
+            'data': {'id': '2009', 'name': 'Tessa Jowell'},
+        }
+        PersonVersion.from_dict(self.person_extra.base, version).save()
+        self.assertEqual(
+            self.person_extra.versions[0]['timestamp'],
+            '2014-10-01T15:12:34.000000'
+        )
+
+    def test_record_version_caches_diffs_from_parent(self):
+        self.person_extra.record_version(make_change_metadata(0))
+        self.person_extra.base.name = 'Tessa Jowell-Mills'
+        self.person_extra.base.save()
+        self.person_extra.record_version(make_change_metadata(1))
+        latest, first = PersonVersion.objects.all()
+        self.assertEqual(
+            first.get_cached_diffs()['parent_version_ids'], [])
+        self.assertEqual(
+            latest.get_cached_diffs()['parent_version_ids'],
+            [first.version_id]
+        )
+        latest_version_diff = self.person_extra.latest_version_diff
+        self.assertEqual(
+            latest_version_diff['diffs'],
+            [
+                {
+                    'parent_version_id': first.version_id,
+                    'parent_diff': [
+                        {
+                            'op': 'replace',
+                            'path': 'name',
+                            'previous_value': 'Tessa Jowell',
+                            'value': 'Tessa Jowell-Mills',
+                        }
+                    ]
+                }
+            ]
+        )
+        self.assertEqual(
+            latest_version_diff, self.person_extra.version_diffs[0])
+
+    def test_version_diffs_does_not_save_missing_diffs(self):
+        for i, name in enumerate(('Tessa Jowell', 'Tessa Jowell-Mills')):
+            version = make_change_metadata(i)
+            version['data'] = {'id': '2009', 'name': name}
+            PersonVersion.from_dict(self.person_extra.base, version).save()
+        self.assertIsNone(
+            PersonVersion.objects.first().get_version_with_diffs())
+        with CaptureQueriesContext(connection) as context:
+            version_diffs = self.person_extra.version_diffs
+        self.assertFalse([
+            q for q in context.captured_queries
+            if not q['sql'].startswith('SELECT')
+        ])
+        self.assertEqual(
+            version_diffs[0]['diffs'][0]['parent_diff'],
+            [
+                {
+                    'op': 'replace',
+                    'path': 'name',
+                    'previous_value': 'Tessa Jowell',
+                    'value': 'Tessa Jowell-Mills',
+                }
+            ]
+        )
+        self.assertFalse(
+            PersonVersion.objects.exclude(cached_diffs='').exists())
+
+    def test_cache_version_diffs(self):
+        for i, name in enumerate(('Tessa Jowell', 'Tessa Jowell-Mills')):
+            version = make_change_metadata(i)
+            version['data'] = {'id': '2009', 'name': name}
+            PersonVersion.from_dict(self.person_extra.base, version).save()
+        version_diffs = self.person_extra.version_diffs
+        call_command('candidates_cache_version_diffs', verbosity=0)
+        latest, first = PersonVersion.objects.all()
+        self.assertEqual(
+            first.get_cached_diffs()['parent_version_ids'], [])
+        self.assertEqual(
+            latest.get_cached_diffs()['parent_version_ids'],
+            [first.version_id]
+        )
+        self.assertEqual(
+            [first.get_version_with_diffs(), latest.get_version_with_diffs()],
+            version_diffs[::-1]
+        )
+        self.assertEqual(self.person_extra.cache_version_diffs(), 0)
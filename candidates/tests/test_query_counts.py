@@ -0,0 +1,79 @@
+from __future__ import unicode_literals
+
+from collections import defaultdict
+import os
+
+from mock import patch
+
+from django.db import transaction
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from .query_benchmark import (
+    DatasetSize, make_dataset, measure_request, write_report
+)
+
+# The number of queries for each of these should be the same for
+# every size of dataset.  Some pages work differently when there are
+# only one or two elections, so even the smallest has more than that:
+SIZES = [
+    DatasetSize(elections=3, posts=2, candidates_per_post=2),
+    DatasetSize(elections=4, posts=5, candidates_per_post=5),
+]
+
+PAGES = [
+    ('areas', lambda d: '/areas/' + ','.join(
+        'WMC--' + pe.base.area.identifier for pe in d.posts)),
+    ('constituencies', lambda d: '/election/election-0/constituencies'),
+    ('constituency', lambda d: '/election/election-0/post/post-0/area-0'),
+    ('person', lambda d: '/person/{0}'.format(d.people[0].base.id)),
+    ('party', lambda d: '/election/election-0/party/party:0/party-0'),
+    ('api-persons', lambda d: '/api/v0.9/persons/?page_size=200'),
+    ('api-person', lambda d: '/api/v0.9/persons/{0}/'.format(
+        d.people[0].base.id)),
+    ('api-posts', lambda d: '/api/v0.9/posts/?page_size=200'),
+    ('api-candidates-for-postcode',
+     lambda d: '/api/v0.9/candidates_for_postcode/?postcode=SW1A1AA'),
+]
+
+
+# The party choices are ordered by the number of candidates once
+# there are enough of them; make that the case for every size:
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    },
+    CANDIDATES_REQUIRED_FOR_WEIGHTED_PARTY_LIST=0,
+)
+class TestQueryCounts(TestCase):
+    """Check that pages don't make more queries for more data
+
+    To write the measurements to a JSON file, for comparing between
+    commits, set the environment variable YNR_QUERY_BENCHMARK_REPORT
+    to its filename."""
+
+    @patch('candidates.views.api.fetch_area_ids')
+    def test_query_counts_do_not_grow(self, mock_fetch_area_ids):
+        results = defaultdict(list)
+        for size in SIZES:
+            with transaction.atomic():
+                dataset = make_dataset(size)
+                mock_fetch_area_ids.return_value = [
+                    ('WMC', pe.base.area.identifier) for pe in dataset.posts
+                ]
+                for name, get_url in PAGES:
+                    results[name].append(
+                        (size, measure_request(self.client, get_url(dataset)))
+                    )
+                transaction.set_rollback(True)
+        report_filename = os.environ.get('YNR_QUERY_BENCHMARK_REPORT')
+        if report_filename:
+            write_report(report_filename, results)
+        growing = {
+            name: [measurement.queries for size, measurement in measurements]
+            for name, measurements in results.items()
+            if len(set(m.queries for s, m in measurements)) > 1
+        }
+        self.assertEqual(growing, {})
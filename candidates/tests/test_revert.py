@@ -2,7 +2,6 @@
 
 from __future__ import unicode_literals
 
-import json
 from mock import patch
 from string import Template
 
@@ -184,7 +183,7 @@ class TestRevertPersonView(TestUserMixin, UK2015ExamplesMixin, WebTest):
         person_extra = PersonExtra.objects.get(base__id=2009)
 
         # First check that a new version has been created:
-        new_versions = json.loads(person_extra.versions)
+        new_versions = person_extra.versions
 
         self.maxDiff = None
         expected_new_version = {
@@ -67,6 +67,9 @@ class TestSearchView(TestUserMixin, UK2015ExamplesMixin, WebTest):
         form['party_gb_2015'] = self.labour_party_extra.base_id
         form.submit()
 
+        # changes are only sent to the index when the queue is processed
+        call_command('candidates_update_search_index')
+
         # check searching finds them
         response = self.app.get('/search?q=Elizabeth')
         self.assertTrue(
@@ -93,6 +96,7 @@ class TestSearchView(TestUserMixin, UK2015ExamplesMixin, WebTest):
         form['source'] = 'Testing adding a new person to a post'
         form['party_gb_2015'] = self.labour_party_extra.base_id
         form.submit()
+        call_command('candidates_update_search_index')
 
         response = self.app.get('/search?q=Elizabeth')
         self.assertTrue(
@@ -117,6 +121,7 @@ class TestSearchView(TestUserMixin, UK2015ExamplesMixin, WebTest):
         form['name'] = 'Lizzie Jones'
         form['source'] = "Some source of this information"
         form.submit()
+        call_command('candidates_update_search_index')
 
         response = self.app.get('/search?q=Elizabeth')
         self.assertTrue(
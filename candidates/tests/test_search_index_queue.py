@@ -0,0 +1,102 @@
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from mock import patch
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from popolo.models import Person
+
+from candidates.models import SearchIndexUpdate
+from candidates.models.search_index import update_search_index_batch
+
+from .factories import AreaTypeFactory, PersonExtraFactory
+
+
+def queued_person_ids():
+    return list(
+        SearchIndexUpdate.objects.order_by('id')
+        .values_list('person_id', flat=True)
+    )
+
+
+class TestSearchIndexQueue(TestCase):
+
+    def setUp(self):
+        self.person = PersonExtraFactory.create(
+            base__id=2009, base__name='Tessa Jowell').base
+        self.other_person = PersonExtraFactory.create(
+            base__id=2010, base__name='Frank Dobson').base
+        SearchIndexUpdate.objects.all().delete()
+
+    def test_saving_a_person_queues_an_update(self):
+        self.person.name = 'Tessa Jane Jowell'
+        self.person.save()
+        self.assertEqual(queued_person_ids(), [2009])
+
+    def test_saving_an_other_name_queues_an_update(self):
+        self.person.other_names.create(name='Tessa Palmer')
+        self.assertEqual(queued_person_ids(), [2009])
+
+    def test_saving_anything_else_queues_nothing(self):
+        AreaTypeFactory.create(name='WMC')
+        self.assertEqual(queued_person_ids(), [])
+
+    def test_rolled_back_changes_are_not_queued(self):
+        try:
+            with transaction.atomic():
+                self.person.save()
+                raise ValueError('Something went wrong')
+        except ValueError:
+            pass
+        self.assertEqual(queued_person_ids(), [])
+
+    @patch('candidates.models.search_index.connections')
+    def test_updates_are_sent_in_batches(self, mock_connections):
+        backend = mock_connections.__getitem__.return_value.get_backend()
+        for i in range(3):
+            self.person.save()
+        self.other_person.save()
+        self.other_person.delete()
+        self.assertEqual(update_search_index_batch(batch_size=10), 5)
+        self.assertEqual(backend.update.call_count, 1)
+        self.assertEqual(backend.update.call_args[0][1], [self.person])
+        backend.remove.assert_called_once_with('popolo.person.2010')
+        self.assertEqual(queued_person_ids(), [])
+        self.assertEqual(update_search_index_batch(batch_size=10), 0)
+
+    @patch('candidates.models.search_index.connections')
+    def test_updates_made_after_a_batch_are_left_queued(
+            self, mock_connections):
+        backend = mock_connections.__getitem__.return_value.get_backend()
+        self.person.save()
+
+        def update(index, people):
+            self.other_person.save()
+
+        backend.update.side_effect = update
+        self.assertEqual(update_search_index_batch(), 1)
+        self.assertEqual(queued_person_ids(), [2010])
+
+    @patch('candidates.models.search_index.connections')
+    def test_catch_up_since(self, mock_connections):
+        backend = mock_connections.__getitem__.return_value.get_backend()
+        Person.objects.filter(id=2010).update(
+            updated_at=timezone.now() - timedelta(days=7))
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        call_command('candidates_update_search_index', since=since)
+        self.assertEqual(backend.update.call_args[0][1], [self.person])
+
+    @patch('candidates.models.search_index.connections')
+    def test_catch_up_all(self, mock_connections):
+        backend = mock_connections.__getitem__.return_value.get_backend()
+        call_command('candidates_update_search_index', all=True)
+        self.assertEqual(
+            sorted(p.id for p in backend.update.call_args[0][1]),
+            [2009, 2010]
+        )
+        self.assertEqual(queued_person_ids(), [])
@@ -33,7 +33,7 @@ class SimpleFieldsTests(TestUserMixin, UK2015ExamplesMixin, WebTest):
             name="John the Well-Described",
             additional_name="Very Well-Described"
         )
-        PersonExtra.objects.create(base=self.person, versions='[]')
+        PersonExtra.objects.create(base=self.person)
 
     def test_create_form_has_fields(self):
         response = self.app.get(
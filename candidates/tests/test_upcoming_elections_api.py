@@ -7,11 +7,15 @@ from mock import patch, Mock
 from datetime import date, timedelta
 
 from django.conf import settings
+from django.core.cache import cache
+from django.test.utils import override_settings
 from django.utils.six.moves.urllib_parse import urljoin
 
 from nose.plugins.attrib import attr
 from django_webtest import WebTest
 
+from popolo.models import Membership
+
 from candidates.tests.factories import (
     AreaTypeFactory, AreaExtraFactory, ElectionFactory,
     ParliamentaryChamberExtraFactory, PostExtraFactory,
@@ -81,20 +85,20 @@ def fake_requests_for_every_election(url, *args, **kwargs):
 
 
 @attr(country='uk')
-@patch('elections.uk.mapit.requests')
+@patch('candidates.mapit.session')
 class TestUpcomingElectionsAPI(UK2015ExamplesMixin, WebTest):
     def setUp(self):
         super(TestUpcomingElectionsAPI, self).setUp()
 
-    def test_empty_results(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_every_election
+    def test_empty_results(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_every_election
         response = self.app.get('/upcoming-elections/?postcode=SW1A+1AA')
 
         output = response.json
         self.assertEqual(output, [])
 
-    def test_results_for_past_elections(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_every_election
+    def test_results_for_past_elections(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_every_election
         response = self.app.get('/upcoming-elections/?postcode=SE24+0AG')
 
         output = response.json
@@ -147,10 +151,10 @@ class TestUpcomingElectionsAPI(UK2015ExamplesMixin, WebTest):
             base__label='Assembly Member',
         )
 
-    def test_results_for_upcoming_elections(self, mock_requests):
+    def test_results_for_upcoming_elections(self, mock_session):
         self._setup_data()
 
-        mock_requests.get.side_effect = fake_requests_for_every_election
+        mock_session.get.side_effect = fake_requests_for_every_election
         response = self.app.get('/upcoming-elections/?postcode=SE24+0AG')
 
         output = response.json
@@ -189,7 +193,7 @@ class TestUpcomingElectionsAPI(UK2015ExamplesMixin, WebTest):
 
         self.assertEqual(expected, output)
 
-    def test_results_for_candidates_for_postcode(self, mock_requests):
+    def test_results_for_candidates_for_postcode(self, mock_session):
         self._setup_data()
 
         person_extra = PersonExtraFactory.create(
@@ -207,7 +211,7 @@ class TestUpcomingElectionsAPI(UK2015ExamplesMixin, WebTest):
 
         self.maxDiff = None
 
-        mock_requests.get.side_effect = fake_requests_for_every_election
+        mock_session.get.side_effect = fake_requests_for_every_election
         response = self.app.get(
             '/api/v0.9/candidates_for_postcode/?postcode=SE24+0AG')
 
@@ -300,3 +304,61 @@ class TestUpcomingElectionsAPI(UK2015ExamplesMixin, WebTest):
         }]
 
         self.assertEqual(expected, output)
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+    def test_candidates_for_postcode_cached(self, mock_session):
+        cache.clear()
+        self._setup_data()
+        person_extra = PersonExtraFactory.create(
+            base__id='2009',
+            base__name='Tessa Jowell'
+        )
+        CandidacyExtraFactory.create(
+            election=self.election_gla,
+            base__person=person_extra.base,
+            base__post=self.post_extra.base,
+            base__on_behalf_of=self.labour_party_extra.base
+        )
+        mock_session.get.side_effect = fake_requests_for_every_election
+        url = '/api/v0.9/candidates_for_postcode/?postcode=SE24+0AG'
+
+        def get_candidate_names():
+            return sorted(
+                candidate['name']
+                for result in self.app.get(url).json
+                for candidate in result['candidates']
+            )
+
+        first_output = self.app.get(url).json
+        with self.assertNumQueries(0):
+            self.assertEqual(self.app.get(url).json, first_output)
+
+        # Changes to a candidate should be seen straight away:
+        person = person_extra.base
+        person.name = 'Tessa Jowell-Smith'
+        person.save()
+        self.assertEqual(get_candidate_names(), ['Tessa Jowell-Smith'])
+        # ... as should new candidates:
+        CandidacyExtraFactory.create(
+            election=self.election_gla,
+            base__person=PersonExtraFactory.create(
+                base__id='2010',
+                base__name='Harriet Harman'
+            ).base,
+            base__post=self.post_extra.base,
+            base__on_behalf_of=self.labour_party_extra.base
+        )
+        self.assertEqual(
+            get_candidate_names(), ['Harriet Harman', 'Tessa Jowell-Smith'])
+        # ... and candidacies moved to another post:
+        candidacy = Membership.objects.get(person_id=2010)
+        candidacy.post = self.camberwell_post_extra.base
+        candidacy.save()
+        self.assertEqual(get_candidate_names(), ['Tessa Jowell-Smith'])
+        # ... and removed candidacies:
+        Membership.objects.get(person_id=2009).delete()
+        self.assertEqual(get_candidate_names(), [])
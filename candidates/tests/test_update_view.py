@@ -2,8 +2,8 @@
 
 from __future__ import unicode_literals
 
-import json
-
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.six.moves.urllib_parse import urlsplit
 
 from django_webtest import WebTest
@@ -64,6 +64,22 @@ class TestUpdatePersonView(TestUserMixin, UK2015ExamplesMixin, WebTest):
         form = response.forms['person-details']
         self.assertIsNotNone(form)
 
+    def test_update_person_view_fetches_versions_once(self):
+        person_extra = Person.objects.get(pk=2009).extra
+        person_extra.record_version({
+            'information_source': 'An initial version',
+            'version_id': '5469de7db0cbd155',
+            'timestamp': '2014-10-01T15:12:34.732426',
+        })
+        with CaptureQueriesContext(connection) as context:
+            response = self.app.get('/person/2009/update', user=self.user)
+        response.mustcontain('5469de7db0cbd155')
+        versions_queries = [
+            q for q in context.captured_queries
+            if 'candidates_personversion' in q['sql']
+        ]
+        self.assertEqual(len(versions_queries), 1)
+
     def test_update_person_submission_copyright_refused(self):
         response = self.app.get('/person/2009/update', user=self.user)
         form = response.forms['person-details']
@@ -147,7 +163,7 @@ class TestUpdatePersonView(TestUserMixin, UK2015ExamplesMixin, WebTest):
 
         person = Person.objects.get(id='2009')
         self.assertEqual(person.birth_date, '1875-04-01')
-        versions_data = json.loads(person.extra.versions)
+        versions_data = person.extra.versions
         self.assertEqual(
             versions_data[0]['data']['extra_fields'],
             {
@@ -1375,3 +1375,47 @@ class TestVersionDiffs(UK2015ExamplesMixin, TestCase):
             }
         }]
         self.assertEqual(expected_result, versions_with_diffs)
+
+    def test_election_lookups_constant_queries(self):
+        versions = [
+            {
+                'information_source': 'Standing in lots of elections',
+                'timestamp': '2015-05-08T01:52:27.061038',
+                'version_id': '3aa8d7da968e10fa',
+                'data': {
+                    'id': '24680',
+                    'standing_in': {
+                        '2010': {
+                            'name': 'South Cambridgeshire',
+                            'post_id': '65922',
+                        },
+                        '2015': {
+                            'name': 'Edinburgh North and Leith',
+                            'post_id': '14420',
+                        },
+                        'renamed-election': {
+                            'name': 'Edinburgh North and Leith',
+                            'post_id': '14420',
+                        },
+                    }
+                }
+            },
+            {
+                'information_source': 'Original imported data',
+                'timestamp': '2015-03-10T05:35:15.297559',
+                'version_id': 'fd105d1cf3b5ed0f',
+                'data': {
+                    'id': '24680',
+                }
+            },
+        ]
+        with self.assertNumQueries(1):
+            versions_with_diffs = get_version_diffs(versions)
+        operation, = versions_with_diffs[0]['diffs'][0]['parent_diff']
+        # The order of the clauses depends on dictionary ordering:
+        for clause in (
+            'is known to be standing in Edinburgh North and Leith in the 2015 General Election',
+            'was known to be standing in South Cambridgeshire in the 2010 General Election',
+            'was known to be standing in Edinburgh North and Leith in the renamed-election election',
+        ):
+            self.assertIn(clause, operation['value'])
@@ -1,6 +1,8 @@
 from django.test import TestCase
 
-from candidates.models.versions import get_versions_parent_map
+from candidates.models.versions import (
+    get_new_version_parents, get_versions_parent_map
+)
 
 
 class TestVersionTree(TestCase):
@@ -323,3 +325,32 @@ class TestVersionTree(TestCase):
                 r'with ID 567; there were 2 merge versions and 2 person IDs.'
         ):
             get_versions_parent_map(versions)
+
+    def test_new_version_parents_match_parent_map(self):
+        versions = [
+            {
+                "data": {"id": person_id},
+                "information_source": information_source,
+                "timestamp": timestamp,
+                "version_id": version_id,
+            }
+            for version_id, person_id, information_source, timestamp in (
+                ("4df120ba2cb9042c", "4", "After merging person 6628",
+                 "2016-04-23T14:28:53.499803"),
+                ("4ce77239a3ce82f4", "6628", "Found on the party website",
+                 "2016-04-23T14:26:34.673240"),
+                ("6eaf38ba8f30f68c", "4", "There's a Labour candidate",
+                 "2015-03-21T00:16:33.324290"),
+                ("5abf454b55e734a5", "6628", "From the party's press release",
+                 "2015-03-05T14:45:03.058131"),
+                ("5a30bda120ae89b1", "4", "Imported from YourNextMP",
+                 "2014-11-21T18:07:15.616170"),
+            )
+        ]
+        parent_map = get_versions_parent_map(versions)
+        for i, version in enumerate(versions):
+            parents = get_new_version_parents(version, iter(versions[i + 1:]))
+            self.assertEqual(
+                [p['version_id'] for p in parents],
+                parent_map[version['version_id']]
+            )
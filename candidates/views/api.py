@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 
+from functools import reduce
 import json
+from operator import or_
 from os.path import dirname
 import subprocess
 import sys
@@ -9,6 +11,7 @@ from dateutil import parser
 
 import django
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db.models import Count, Prefetch, Q
 from django.http import HttpResponse
 from django.views.generic import View
@@ -20,6 +23,7 @@ from rest_framework.response import Response
 from images.models import Image
 from candidates import serializers
 from candidates import models as extra_models
+from candidates.cache import get_cache_version
 from elections.models import AreaType, Election
 from popolo.models import Area, Membership, Person, Post
 from rest_framework import pagination, viewsets
@@ -34,6 +38,10 @@ def fetch_posts_for_area(**kwargs):
 
     area_ids = [area[1] for area in areas]
 
+    return fetch_posts_for_area_ids(area_ids)
+
+
+def fetch_posts_for_area_ids(area_ids):
     posts = Post.objects.filter(
         area__identifier__in=area_ids,
     ).select_related(
@@ -135,50 +143,50 @@ class CandidatesAndElectionsForPostcodeViewSet(ViewSet):
             return self._error('Postcode or Co-ordinates required')
 
         try:
-            posts = fetch_posts_for_area(postcode=postcode, coords=coords)
+            areas = fetch_area_ids(postcode=postcode, coords=coords)
         except Exception as e:
             return self._error(e.message)
 
+        # Lots of postcodes are in the same areas, so the elections for
+        # a set of areas, and the candidates for each post in those
+        # elections, are cached:
+        version = get_cache_version(
+            extra_models.POSTCODE_RESULTS_VERSION_CACHE_KEY)
+        post_elections = [
+            (post_id, election, result)
+            for post_id, election, result
+            in self.get_post_elections(version, [area[1] for area in areas])
+            if handle_election(election, request)
+        ]
+        candidates = self.get_candidates(
+            version,
+            request,
+            [(post_id, election) for post_id, election, result in post_elections]
+        )
+
         results = []
-        for post in posts:
+        for post_id, election, result in post_elections:
+            result = dict(result)
+            result['candidates'] = candidates[(post_id, election.id)]
+            results.append(result)
+
+        return Response(results)
+
+    def get_post_elections(self, version, area_ids):
+        """Return (post ID, election, result) for each post in some areas
+
+        The result is a dictionary of everything in the output for
+        that post and election except the candidates."""
+        cache_key = extra_models.get_post_elections_cache_key(
+            version, area_ids)
+        if version is not None:
+            post_elections = cache.get(cache_key)
+            if post_elections is not None:
+                return post_elections
+        post_elections = []
+        for post in fetch_posts_for_area_ids(area_ids):
             for election in post.extra.elections.all():
-                if not handle_election(election, request):
-                    continue
-                candidates = []
-                for membership in post.memberships.filter(
-                        extra__election=election,
-                        role=election.candidate_membership_role) \
-                        .prefetch_related(
-                            Prefetch(
-                                'person__memberships',
-                                Membership.objects.select_related(
-                                    'on_behalf_of__extra',
-                                    'organization__extra',
-                                    'post__extra',
-                                    'extra__election',
-                                )
-                            ),
-                            Prefetch(
-                                'person__extra__images',
-                                Image.objects.select_related('extra__uploading_user')
-                            ),
-                            'person__other_names',
-                            'person__contact_details',
-                            'person__links',
-                            'person__identifiers',
-                            'person__extra_field_values',
-                        ) \
-                        .select_related('person__extra'):
-                    candidates.append(
-                        serializers.NoVersionPersonSerializer(
-                            instance=membership.person,
-                            context={
-                                'request': request,
-                            },
-                            read_only=True,
-                        ).data
-                    )
-                election = {
+                post_elections.append((post.id, election, {
                     'election_date': text_type(election.election_date),
                     'election_name': election.name,
                     'election_id': election.slug,
@@ -193,13 +201,102 @@ class CandidatesAndElectionsForPostcodeViewSet(ViewSet):
                         'identifier': post.area.identifier,
                     },
                     'organization': post.organization.name,
-                    'candidates': candidates,
-
-                }
-
-                results.append(election)
-
-        return Response(results)
+                }))
+        if version is not None:
+            cache.set(
+                cache_key,
+                post_elections,
+                extra_models.POSTCODE_RESULTS_CACHE_SECONDS
+            )
+        return post_elections
+
+    def get_candidates(self, version, request, posts_and_elections):
+        """Return a dict of serialized candidates for each post and election
+
+        The keys of the returned dictionary are (post ID, election ID)
+        tuples.  The serialized data includes absolute URLs, so each
+        cache entry has a version for each base URL and API version
+        it's been requested with."""
+        variant = (request.build_absolute_uri('/'), request.version)
+        cache_keys = {
+            extra_models.get_candidates_cache_key(
+                version, post_id, election.id
+            ): (post_id, election)
+            for post_id, election in posts_and_elections
+        }
+        cached = {}
+        if version is not None:
+            cached = cache.get_many(list(cache_keys.keys()))
+        missing = [
+            (post_id, election)
+            for cache_key, (post_id, election) in cache_keys.items()
+            if variant not in cached.get(cache_key, {})
+        ]
+        serialized = self.serialize_candidates(request, missing)
+        result = {}
+        to_cache = {}
+        for cache_key, (post_id, election) in cache_keys.items():
+            variants = cached.get(cache_key, {})
+            if variant not in variants:
+                variants[variant] = serialized[(post_id, election.id)]
+                to_cache[cache_key] = variants
+            result[(post_id, election.id)] = variants[variant]
+        if version is not None and to_cache:
+            cache.set_many(
+                to_cache, extra_models.POSTCODE_RESULTS_CACHE_SECONDS)
+        return result
+
+    def serialize_candidates(self, request, posts_and_elections):
+        """Return a dict of serialized candidates for each post and election
+
+        This gets the candidates for all of them at once, so the
+        number of queries doesn't depend on how many there are."""
+        result = {
+            (post_id, election.id): []
+            for post_id, election in posts_and_elections
+        }
+        if not result:
+            return result
+        candidacy_filter = reduce(or_, [
+            Q(
+                post_id=post_id,
+                extra__election=election,
+                role=election.candidate_membership_role
+            )
+            for post_id, election in posts_and_elections
+        ])
+        for membership in Membership.objects.filter(
+                candidacy_filter
+            ).prefetch_related(
+                Prefetch(
+                    'person__memberships',
+                    Membership.objects.select_related(
+                        'on_behalf_of__extra',
+                        'organization__extra',
+                        'post__extra',
+                        'extra__election',
+                    )
+                ),
+                Prefetch(
+                    'person__extra__images',
+                    Image.objects.select_related('extra__uploading_user')
+                ),
+                'person__other_names',
+                'person__contact_details',
+                'person__links',
+                'person__identifiers',
+                'person__extra_field_values',
+            ).select_related('person__extra', 'extra'):
+            result[(membership.post_id, membership.extra.election_id)].append(
+                serializers.NoVersionPersonSerializer(
+                    instance=membership.person,
+                    context={
+                        'request': request,
+                    },
+                    read_only=True,
+                ).data
+            )
+        return result
 
 
 class CurrentElectionsView(View):
@@ -293,10 +390,16 @@ class PersonViewSet(viewsets.ModelViewSet):
                 'memberships__extra__election',
                 'memberships__organization__extra',
                 'extra__images',
+                Prefetch(
+                    'extra_field_values',
+                    extra_models.PersonExtraFieldValue.objects \
+                        .select_related('field')
+                ),
                 'other_names',
                 'contact_details',
                 'links',
                 'identifiers',
+                'versions',
             ) \
             .order_by('id')
         date_qs = self.request.query_params.get('updated_gte', None)
@@ -344,6 +447,11 @@ class PostViewSet(viewsets.ModelViewSet):
         .prefetch_related(
             'elections',
             'elections__area_types',
+            Prefetch(
+                'postextraelection_set',
+                extra_models.PostExtraElection.objects \
+                    .select_related('election')
+            ),
             'base__area__other_identifiers',
             Prefetch(
                 'base__memberships',
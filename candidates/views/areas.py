@@ -2,6 +2,7 @@
 
 from __future__ import unicode_literals
 
+from collections import defaultdict
 import re
 
 from django.db.models import Prefetch
@@ -12,10 +13,11 @@ from django.utils.text import slugify
 from django.utils.translation import ugettext as _
 from django.shortcuts import get_object_or_404
 
-from candidates.models import AreaExtra, MembershipExtra
-from candidates.models.auth import get_edits_allowed, is_post_locked
+from candidates.models import AreaExtra, PostExtraElection
+from candidates.models.auth import get_edits_allowed
 
 from elections.models import AreaType, Election
+from popolo.models import Membership
 
 from ..forms import NewPersonForm, ToggleLockForm
 from .helpers import (
@@ -38,98 +40,130 @@ class AreasView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(AreasView, self).get_context_data(**kwargs)
-        all_area_names = set()
-        context['posts'] = []
-        any_area_found = False
-        no_data_areas = []
-        posts_seen = set()
-        for area_type_code, area_id in self.types_and_areas:
-            area_extras = AreaExtra.objects \
+        area_ids = [area_id for area_type_code, area_id in self.types_and_areas]
+        areas_by_id = defaultdict(list)
+        for area_extra in AreaExtra.objects \
                 .select_related('base', 'type') \
-                .prefetch_related('base__posts') \
-                .filter(base__identifier=area_id)
-            if area_extras.exists():
-                any_area_found = True
-            else:
-                continue
-
-            for area_extra in area_extras:
-                area = area_extra.base
-                all_area_names.add(area.name)
-                for post in area.posts.all():
-                    post_extra = post.extra
-                    try:
-                        election = post_extra.elections.get(current=True)
-                    except Election.DoesNotExist:
-                        continue
-                    if post.id in posts_seen:
-                        continue
-                    else:
-                        posts_seen.add(post.id)
-                    locked = is_post_locked(post, election)
-                    extra_qs = MembershipExtra.objects.select_related('election')
-                    current_candidacies, _ = split_candidacies(
-                        election,
-                        post.memberships.prefetch_related(
-                            Prefetch('extra', queryset=extra_qs)
-                        ).select_related(
-                            'person', 'person__extra', 'on_behalf_of',
-                            'on_behalf_of__extra', 'organization'
-                        ).all()
-                    )
-                    elected_candidacies, unelected_candidacies = split_by_elected(
-                        election,
-                        current_candidacies,
-                    )
-                    elected_candidacies = group_candidates_by_party(
-                        election,
-                        elected_candidacies,
-                    )
-                    unelected_candidacies = group_candidates_by_party(
-                        election,
-                        unelected_candidacies,
-                    )
-                    post_context = {
-                        'election': election.slug,
-                        'election_data': election,
-                        'post_data': {
-                            'id': post.extra.slug,
-                            'label': post.label,
-                        },
-                        'candidates_locked': locked,
-                        'lock_form': ToggleLockForm(
-                            initial={
-                                'post_id': post.extra.slug,
-                                'lock': not locked
-                            },
-                        ),
-                        'candidate_list_edits_allowed':
-                        get_edits_allowed(self.request.user, locked),
-                        'has_elected': \
-                            len(elected_candidacies['parties_and_people']) > 0,
-                        'elected': elected_candidacies,
-                        'unelected': unelected_candidacies,
-                        'add_candidate_form': NewPersonForm(
-                            election=election.slug,
-                            initial={
-                                ('constituency_' + election.slug): post_extra.slug,
-                                ('standing_' + election.slug): 'standing',
-                            },
-                            hidden_post_widget=True,
-                        ),
-                    }
+                .filter(base__identifier__in=area_ids):
+            areas_by_id[area_extra.base.identifier].append(area_extra.base)
+        if not areas_by_id:
+            raise Http404("No such areas found")
+        # Keep the areas in the order they were requested in:
+        area_order = {}
+        for area_id in area_ids:
+            for area in areas_by_id[area_id]:
+                area_order.setdefault(area.id, len(area_order))
+        all_area_names = set(
+            area.name for areas in areas_by_id.values() for area in areas
+        )
+
+        # Now fetch everything that's needed for every post in those
+        # areas at once, rather than area by area and post by post:
+        post_elections = sorted(
+            PostExtraElection.objects.filter(
+                postextra__base__area_id__in=area_order.keys(),
+                election__current=True,
+            ).select_related(
+                'postextra__base', 'postextra__party_set', 'election'
+            ),
+            key=lambda pee: (
+                area_order[pee.postextra.base.area_id],
+                pee.postextra.base_id,
+            )
+        )
+        candidacies_by_post_election = defaultdict(list)
+        for membership in Membership.objects.filter(
+                post_id__in=[pee.postextra.base_id for pee in post_elections],
+                extra__election_id__in=[
+                    pee.election_id for pee in post_elections
+                ],
+            ).select_related(
+                'extra__election', 'person', 'person__extra', 'on_behalf_of',
+                'on_behalf_of__extra', 'organization'
+            ).prefetch_related('person__extra__images'):
+            key = (membership.post_id, membership.extra.election_id)
+            candidacies_by_post_election[key].append(membership)
+
+        # The party choices for the add candidate forms and whether the
+        # user can edit the candidates only depend on the party set and
+        # whether the post is locked, so don't repeat those for each post:
+        party_choices_by_party_set = {}
+        edits_allowed_by_locked = {}
 
-                    post_context = get_person_form_fields(
-                        post_context,
-                        post_context['add_candidate_form']
-                    )
+        context['posts'] = []
+        for pee in post_elections:
+            post_extra = pee.postextra
+            post = post_extra.base
+            election = pee.election
+            locked = pee.candidates_locked
+            if locked not in edits_allowed_by_locked:
+                edits_allowed_by_locked[locked] = \
+                    get_edits_allowed(self.request.user, locked)
+            party_sets_and_party_choices = []
+            party_set = post_extra.party_set
+            if party_set is not None:
+                if party_set.id not in party_choices_by_party_set:
+                    party_choices_by_party_set[party_set.id] = \
+                        party_set.party_choices()
+                party_sets_and_party_choices.append(
+                    (party_set, party_choices_by_party_set[party_set.id])
+                )
+            current_candidacies, _ = split_candidacies(
+                election,
+                candidacies_by_post_election[(post.id, election.id)]
+            )
+            elected_candidacies, unelected_candidacies = split_by_elected(
+                election,
+                current_candidacies,
+            )
+            elected_candidacies = group_candidates_by_party(
+                election,
+                elected_candidacies,
+            )
+            unelected_candidacies = group_candidates_by_party(
+                election,
+                unelected_candidacies,
+            )
+            post_context = {
+                'election': election.slug,
+                'election_data': election,
+                'post_data': {
+                    'id': post_extra.slug,
+                    'label': post.label,
+                },
+                'candidates_locked': locked,
+                'lock_form': ToggleLockForm(
+                    initial={
+                        'post_id': post_extra.slug,
+                        'lock': not locked
+                    },
+                ),
+                'candidate_list_edits_allowed':
+                edits_allowed_by_locked[locked],
+                'has_elected': \
+                    len(elected_candidacies['parties_and_people']) > 0,
+                'elected': elected_candidacies,
+                'unelected': unelected_candidacies,
+                'add_candidate_form': NewPersonForm(
+                    election=election.slug,
+                    election_data=election,
+                    initial={
+                        ('constituency_' + election.slug): post_extra.slug,
+                        ('standing_' + election.slug): 'standing',
+                    },
+                    hidden_post_widget=True,
+                    party_sets_and_party_choices=party_sets_and_party_choices,
+                ),
+            }
 
-                    context['posts'].append(post_context)
+            post_context = get_person_form_fields(
+                post_context,
+                post_context['add_candidate_form']
+            )
 
-        context['no_data_areas'] = no_data_areas
+            context['posts'].append(post_context)
 
-        if not any_area_found:
-            raise Http404("No such areas found")
+        context['no_data_areas'] = []
         context['all_area_names'] = ' — '.join(all_area_names)
         context['suppress_official_documents'] = True
         return context
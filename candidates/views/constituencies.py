@@ -109,29 +109,22 @@ class ConstituencyDetailView(ElectionMixin, TemplateView):
             'label': mp_post.label
         }
 
-        context['candidates_locked'] = is_post_locked(mp_post, self.election_data)
-
-        if hasattr(mp_post, 'extra'):
-            # FIXME: Sym has a pending change which adds the
-            # PostExtraElection to the context earlier anyway, so this
-            # is just temporary.
-            pee = PostExtraElection.objects.get(
-                postextra=mp_post.extra,
-                election=self.election_data)
+        pee = context['post_election']
+        context['candidates_locked'] = pee.candidates_locked
 
-            context['has_lock_suggestion'] = \
-                SuggestedPostLock.objects.filter(postextraelection=pee).exists()
+        context['has_lock_suggestion'] = \
+            SuggestedPostLock.objects.filter(postextraelection=pee).exists()
 
-            context['suggest_lock_form'] = SuggestedPostLockForm(
-                initial={'postextraelection': pee},
-            )
+        context['suggest_lock_form'] = SuggestedPostLockForm(
+            initial={'postextraelection': pee},
+        )
 
-            if self.request.user.is_authenticated():
-                context['user_has_suggested_lock'] = \
-                    SuggestedPostLock.objects.filter(
-                        user=self.request.user,
-                        postextraelection=pee,
-                    ).exists()
+        if self.request.user.is_authenticated():
+            context['user_has_suggested_lock'] = \
+                SuggestedPostLock.objects.filter(
+                    user=self.request.user,
+                    postextraelection=pee,
+                ).exists()
 
         context['lock_form'] = ToggleLockForm(
             initial={
@@ -148,7 +141,9 @@ class ConstituencyDetailView(ElectionMixin, TemplateView):
             split_candidacies(
                 self.election_data,
                 mp_post.memberships.prefetch_related(
-                    Prefetch('extra', queryset=extra_qs)
+                    Prefetch('extra', queryset=extra_qs),
+                    'person__extra__images',
+                    'person__extra__not_standing',
                 ).select_related(
                     'person', 'person__extra', 'on_behalf_of',
                     'on_behalf_of__extra', 'organization'
@@ -166,7 +161,9 @@ class ConstituencyDetailView(ElectionMixin, TemplateView):
                 split_candidacies(
                     self.election_data,
                     other_post.memberships.prefetch_related(
-                        Prefetch('extra', queryset=extra_qs)
+                        Prefetch('extra', queryset=extra_qs),
+                        'person__extra__images',
+                        'person__extra__not_standing',
                     ).select_related(
                         'person', 'person__extra', 'on_behalf_of',
                         'on_behalf_of__extra', 'organization'
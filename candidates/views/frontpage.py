@@ -1,14 +1,11 @@
 from __future__ import unicode_literals
 
 import json
-import requests
 from collections import defaultdict
 
-from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.http import HttpResponse, HttpResponseRedirect
 from django.utils.decorators import method_decorator
-from django.utils.six.moves.urllib_parse import urljoin
 from django.utils.translation import ugettext as _
 from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
@@ -33,26 +30,24 @@ class GeoLocatorView(View):
                 .values_list('election__area_generation', 'name'):
             generation_with_types[t[0]].append(t[1])
 
-        mapit_base_url = urljoin(settings.MAPIT_BASE_URL,
-                                 'point/4326/{lon},{lat}'.format(
-                                     lon=longitude,
-                                     lat=latitude,
-                                 ))
-
+        try:
+            mapit_results = mapit.get_areas_from_point_in_generations(
+                longitude,
+                latitude,
+                [
+                    (generation, sorted(types))
+                    for generation, types in generation_with_types.items()
+                ]
+            )
+        except mapit.BaseMapItException as e:
+            message = _("The area lookup returned an error: '{0}'") \
+                .format(e)
+            return HttpResponse(
+                json.dumps({'error': message}),
+                content_type='application/json',
+            )
         mapit_json = []
-        for generation, types in generation_with_types.items():
-            lookup_url = mapit_base_url + '?type=' \
-                + ','.join(sorted(types))
-            lookup_url += '&generation={0}'.format(generation)
-            mapit_result = requests.get(lookup_url)
-            mapit_result = mapit_result.json()
-            if 'error' in mapit_result:
-                message = _("The area lookup returned an error: '{0}'") \
-                    .format(mapit_result['error'])
-                return HttpResponse(
-                    json.dumps({'error': message}),
-                    content_type='application/json',
-                )
+        for mapit_result in mapit_results:
             mapit_json += mapit_result.items()
 
         if len(mapit_json) == 0:
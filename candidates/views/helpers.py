@@ -58,21 +58,21 @@ def get_redirect_to_post(election, post):
 
 def get_person_form_fields(context, form):
     context['extra_fields'] = []
-    extra_fields = ExtraField.objects.all()
+    extra_fields = ExtraField.objects.cached()
     for field in extra_fields:
         context['extra_fields'].append(
             form[field.key]
         )
 
     context['complex_fields'] = []
-    complex_fields = ComplexPopoloField.objects.all()
+    complex_fields = ComplexPopoloField.objects.cached()
     for field in complex_fields:
         context['complex_fields'].append((field, form[field.name]))
 
     personal_fields, demographic_fields = get_field_groupings()
     context['personal_fields'] = []
     context['demographic_fields'] = []
-    simple_fields = SimplePopoloField.objects.all()
+    simple_fields = SimplePopoloField.objects.cached()
     for field in simple_fields:
         if field.name in personal_fields:
             context['personal_fields'].append(
@@ -108,7 +108,7 @@ def get_candidacy_fields_for_person_form(form):
             'constituency': form['constituency_' + election_data.slug],
         }
         party_fields = []
-        for ps in PartySet.objects.all():
+        for ps in form.party_sets:
             key_suffix = ps.slug + '_' + election_data.slug
             position_field = None
             try:
@@ -26,7 +26,6 @@ from auth_helpers.views import GroupRequiredMixin, user_in_group
 from elections.models import Election
 from elections.mixins import ElectionMixin
 
-from ..diffs import get_version_diffs
 from ..election_specific import additional_merge_actions
 from .version_data import get_client_ip, get_change_metadata
 from ..forms import NewPersonForm, UpdatePersonForm, SingleElectionForm
@@ -94,7 +93,7 @@ def get_extra_fields(person):
                 'type': extra_field.type,
             }
         )
-        for extra_field in ExtraField.objects.all()
+        for extra_field in ExtraField.objects.cached()
     ]
 
 
@@ -128,7 +127,7 @@ class PersonView(TemplateView):
         context['has_current_elections'] = any([
                 e.current for e in context['elections_to_list']])
         context['simple_fields'] = [
-            field.name for field in SimplePopoloField.objects.all()
+            field.name for field in SimplePopoloField.objects.cached()
         ]
         personal_fields, demographic_fields = get_field_groupings()
         context['has_demographics'] = any(
@@ -137,7 +136,7 @@ class PersonView(TemplateView):
         )
         context['complex_fields'] = [
             (field, getattr(self.person.extra, field.name))
-            for field in ComplexPopoloField.objects.all()
+            for field in ComplexPopoloField.objects.cached()
         ]
 
         context['extra_fields'] = get_extra_fields(self.person)
@@ -187,18 +186,15 @@ class RevertPersonView(LoginRequiredMixin, View):
         )
         person = person_extra.base
 
-        versions = json.loads(person_extra.versions)
+        version_to_revert_to = person.versions \
+            .filter(version_id=version_id).first()
 
-        data_to_revert_to = None
-        for version in versions:
-            if version['version_id'] == version_id:
-                data_to_revert_to = version['data']
-                break
-
-        if not data_to_revert_to:
+        if not version_to_revert_to:
             message = _("Couldn't find the version {0} of person {1}")
             raise Exception(message.format(version_id, person_id))
 
+        data_to_revert_to = json.loads(version_to_revert_to.data)
+
         with transaction.atomic():
 
             change_metadata = get_change_metadata(self.request, source)
@@ -246,11 +242,9 @@ class MergePeopleView(GroupRequiredMixin, View):
                 primary_person_extra,
                 merged_person_version_data
             )
-        # Make sure the secondary person's version history is appended, so it
-        # isn't lost.
-        primary_person_versions = json.loads(primary_person_extra.versions)
-        primary_person_versions += json.loads(secondary_person_extra.versions)
-        primary_person_extra.versions = json.dumps(primary_person_versions)
+        # Make sure the secondary person's version history is moved to the
+        # primary person, so it isn't lost.
+        secondary_person.versions.update(person=primary_person)
         primary_person_extra.record_version(change_metadata)
         primary_person_extra.save()
         # Change the secondary person's images to point at the primary
@@ -342,10 +336,6 @@ class UpdatePersonView(LoginRequiredMixin, FormView):
             TRUSTED_TO_MERGE_GROUP_NAME
         )
 
-        context['versions'] = get_version_diffs(
-            json.loads(person.extra.versions)
-        )
-
         context = get_person_form_fields(context, kwargs['form'])
 
         if 'highlight_field' in self.request.GET:
@@ -456,7 +446,7 @@ class NewPersonView(ElectionMixin, LoginRequiredMixin, FormView):
         context['add_candidate_form'] = kwargs['form']
 
         context['extra_fields'] = []
-        extra_fields = ExtraField.objects.all()
+        extra_fields = ExtraField.objects.cached()
         for field in extra_fields:
             context['extra_fields'].append(
                 context['add_candidate_form'][field.key]
@@ -1,13 +1,38 @@
+import logging
+
+from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.http import HttpResponseRedirect
 from django.utils.html import escape
 
+import elasticsearch
+from haystack.backends.elasticsearch_backend import (
+    ElasticsearchSearchBackend
+)
 from haystack.query import SearchQuerySet
 from haystack.generic_views import SearchView
 from haystack.forms import SearchForm
 
+from ..models import (
+    search_people_in_database, search_people_by_names_in_database
+)
+
+logger = logging.getLogger(__name__)
+
 
 def search_person_by_name(name, sqs=None):
+    """Search for people by name with the configured search backend
+
+    For the database search backend this returns a
+    PersonNameSearchResults, and sqs is ignored; otherwise, it's a
+    SearchQuerySet, as from haystack_search_person_by_name.
+    """
+    if settings.SEARCH_BACKEND == 'database':
+        return search_people_in_database(name)
+    return haystack_search_person_by_name(name, sqs)
+
+
+def haystack_search_person_by_name(name, sqs=None):
     """
     Becuase the default haystack operator is AND if you search for
     John Quincy Adams then it looks for `John AND Quincy AND Adams'
@@ -28,6 +53,63 @@ def search_person_by_name(name, sqs=None):
     return sqs
 
 
+def search_people_by_names(names, limit):
+    """Search for each of several names with the configured search backend
+
+    Returns a dict mapping each name to a list of (at most limit)
+    results, as search_person_by_name would have found for it.  With
+    the database search backend that's one query for all the names,
+    and with Elasticsearch one multi-search request.
+    """
+    names = [name for name in set(names) if name and name.strip()]
+    if settings.SEARCH_BACKEND == 'database':
+        return search_people_by_names_in_database(names, limit)
+    querysets = [haystack_search_person_by_name(name) for name in names]
+    if querysets:
+        backend = querysets[0].query.backend
+        if isinstance(backend, ElasticsearchSearchBackend):
+            results = elasticsearch_multi_search(backend, querysets, limit)
+            return dict(zip(names, results))
+    return {
+        name: list(sqs[:limit])
+        for name, sqs in zip(names, querysets)
+    }
+
+
+def elasticsearch_multi_search(backend, querysets, limit):
+    """Run the queries of several SearchQuerySets in one request
+
+    Haystack has no API for Elasticsearch's multi-search, so this
+    builds each request body as ElasticsearchSearchBackend.search
+    does.  Returns a list of results for each SearchQuerySet.
+    """
+    if not backend.setup_complete:
+        backend.setup()
+    body = []
+    for sqs in querysets:
+        sqs.query.set_limits(0, limit)
+        search_kwargs = backend.build_search_kwargs(
+            sqs.query.build_query(), **sqs.query.build_params())
+        search_kwargs['from'] = 0
+        search_kwargs['size'] = limit
+        body += [{}, search_kwargs]
+    try:
+        responses = backend.conn.msearch(
+            body, index=backend.index_name, doc_type='modelresult'
+        )['responses']
+    except elasticsearch.TransportError as e:
+        if not backend.silently_fail:
+            raise
+        logger.error(
+            "Failed to multi-search Elasticsearch: %s", e, exc_info=True)
+        responses = [{} for sqs in querysets]
+    return [
+        backend._process_results(
+            raw_results, result_class=sqs.query.result_class)['results']
+        for sqs, raw_results in zip(querysets, responses)
+    ]
+
+
 class PersonSearchForm(SearchForm):
     """
     When Haystack indexed things into its sythesized text field
@@ -40,6 +122,10 @@ class PersonSearchForm(SearchForm):
         return escape(self.cleaned_data['q'])
 
     def search(self):
+        if settings.SEARCH_BACKEND == 'database':
+            if not (self.is_valid() and self.cleaned_data.get('q')):
+                return []
+            return search_person_by_name(self.cleaned_data['q'])
         sqs = super(PersonSearchForm, self).search()
         return search_person_by_name(self.cleaned_data['q'], sqs)
 
@@ -3,7 +3,9 @@ from __future__ import unicode_literals
 from collections import defaultdict, OrderedDict
 from datetime import date
 
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.shortcuts import get_object_or_404
 from django.utils.translation import ugettext_lazy as _
 
@@ -24,7 +26,26 @@ class ElectionQuerySet(models.QuerySet):
             'election_date'
         )
 
+ELECTION_INDEX_CACHE_KEY = 'election_name_and_current_by_slug'
+
+
 class ElectionManager(models.Manager):
+    def name_and_current_by_slug(self):
+        """Return a dict mapping each election slug to (name, current)
+
+        This is for looking up lots of elections by slug, e.g. when
+        explaining a person's version history; it's cached until an
+        election is next saved or deleted."""
+        result = cache.get(ELECTION_INDEX_CACHE_KEY)
+        if result is None:
+            result = {
+                slug: (name, current)
+                for slug, name, current
+                in self.values_list('slug', 'name', 'current')
+            }
+            cache.set(ELECTION_INDEX_CACHE_KEY, result)
+        return result
+
     def elections_for_area_generations(self):
         generations = defaultdict(list)
         for election in self.current():
@@ -230,3 +251,10 @@ class Election(models.Model):
             role['elections'].append(d)
             last_current = election.current
         return result
+
+
+def invalidate_election_index(sender, **kwargs):
+    cache.delete(ELECTION_INDEX_CACHE_KEY)
+
+post_save.connect(invalidate_election_index, sender=Election)
+post_delete.connect(invalidate_election_index, sender=Election)
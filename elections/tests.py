@@ -2,6 +2,7 @@
 from datetime import date, timedelta
 
 from django.test import TestCase
+from django.test.utils import override_settings
 
 from candidates.tests.factories import (
     AreaTypeFactory, ElectionFactory, ParliamentaryChamberExtraFactory,
@@ -39,3 +40,24 @@ class ElectionTests(TestCase):
         self.election.election_date = date.today() - timedelta(days=1)
         self.election.save()
         self.assertFalse(Election.objects.are_upcoming_elections())
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+    def test_name_and_current_by_slug(self):
+        self.assertEqual(
+            Election.objects.name_and_current_by_slug(),
+            {'2015': ('2015 Election', True)}
+        )
+        with self.assertNumQueries(0):
+            Election.objects.name_and_current_by_slug()
+        self.election.name = 'General Election 2015'
+        self.election.save()
+        self.assertEqual(
+            Election.objects.name_and_current_by_slug(),
+            {'2015': ('General Election 2015', True)}
+        )
+        self.election.delete()
+        self.assertEqual(Election.objects.name_and_current_by_slug(), {})
@@ -5,18 +5,19 @@ from __future__ import unicode_literals
 import re
 import logging
 
-import requests
-
 from django.conf import settings
-from django.core.cache import cache
 from django.utils.http import urlquote
 from django.utils.six.moves.urllib_parse import urljoin
-from django.utils.translation import ugettext as _
+from django.utils.translation import ugettext as _, ugettext_noop
 
 from candidates.mapit import (
     BaseMapItException, BadPostcodeException,
-    UnknownMapitException, BadCoordinatesException
+    UnknownMapitException, BadCoordinatesException,
+    cached_area_lookup, get_area_lookup_cache_key, get_from_mapit,
+    normalise_coords, normalise_postcode
 )
+from candidates.local_areas import get_local_area_resolver
+from elections.models import AreaType
 from popolo.models import Area
 
 
@@ -53,6 +54,10 @@ def get_known_area_types(ee_areas):
         ))
 
     area_ids = [r[1] for r in result]
+    return get_known_areas(area_ids)
+
+
+def get_known_areas(area_ids):
     known_areas = Area.objects.filter(identifier__in=area_ids).select_related(
         'extra__type'
     )
@@ -60,19 +65,17 @@ def get_known_area_types(ee_areas):
     return [(a.extra.type.name,a.identifier) for a in known_areas]
 
 
-def get_areas(url, cache_key, exception):
-    r = requests.get(url)
+def get_areas(url, exception):
+    r = get_from_mapit(url)
     if r.status_code == 200:
         ee_result = r.json()
-        result = get_known_area_types(ee_result)
-        cache.set(cache_key, result, settings.MAPIT_CACHE_SECONDS)
-        return result
+        return get_known_area_types(ee_result)
     elif r.status_code == 400:
         ee_result = r.json()
         raise exception(ee_result['detail'])
     elif r.status_code == 404:
-        raise exception(
-            _('The url "{}" couldn’t be found').format(url)
+        raise exception.translatable(
+            ugettext_noop('The url "{}" couldn’t be found'), url
         )
     else:
         raise UnknownMapitException(
@@ -89,29 +92,47 @@ def get_areas_from_postcode(original_postcode):
             _('There were disallowed characters in "{0}"').format(
                 original_postcode)
         )
-    cache_key = 'mapit-postcode:' + postcode
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
-
-    url = urljoin(EE_BASE_URL, "/api/elections/?postcode={0}".format(
-        urlquote(postcode)))
-    try:
-        areas = get_areas(url, cache_key, BadPostcodeException)
-    except BadPostcodeException:
-        # Give a nicer error message, as this is used on the frontend
-        raise BadPostcodeException(
-            'The postcode “{}” couldn’t be found'.format(original_postcode))
-    return areas
+
+    resolver = get_local_area_resolver()
+    if resolver is not None:
+        local_result = resolver.areas_for_postcode(
+            postcode, AreaType.objects.values_list('name', flat=True))
+        if local_result is not None:
+            return get_known_areas(list(local_result.keys()))
+
+    def lookup():
+        url = urljoin(EE_BASE_URL, "/api/elections/?postcode={0}".format(
+            urlquote(postcode)))
+        try:
+            return get_areas(url, BadPostcodeException)
+        except BadPostcodeException:
+            # Give a nicer error message, as this is used on the frontend
+            raise BadPostcodeException(
+                'The postcode “{}” couldn’t be found'.format(
+                    original_postcode))
+
+    cache_key = get_area_lookup_cache_key(
+        'mapit-postcode', normalise_postcode(postcode))
+    return cached_area_lookup(cache_key, lookup)
 
 
 def get_areas_from_coords(coords):
-    url = urljoin(EE_BASE_URL, "/api/elections/?coords={0}".format(
-        urlquote(coords)))
+    resolver = get_local_area_resolver()
+    if resolver is not None:
+        # EveryElection takes coordinates as 'lat,lon':
+        local_result = resolver.areas_at_coords(
+            coords,
+            latitude_first=True,
+            area_types=AreaType.objects.values_list('name', flat=True)
+        )
+        if local_result:
+            return get_known_areas(list(local_result.keys()))
 
-    cache_key = 'mapit-postcode:' + coords
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
+    def lookup():
+        url = urljoin(EE_BASE_URL, "/api/elections/?coords={0}".format(
+            urlquote(coords)))
+        return get_areas(url, BadCoordinatesException)
 
-    return get_areas(url, cache_key, BadCoordinatesException)
+    cache_key = get_area_lookup_cache_key(
+        'mapit-coords', normalise_coords(coords))
+    return cached_area_lookup(cache_key, lookup)
@@ -75,7 +75,7 @@ def fake_requests_for_every_election(url, *args, **kwargs):
     })
 
 @attr(country='uk')
-@patch('elections.uk.mapit.requests')
+@patch('candidates.mapit.session')
 class TestConstituencyPostcodeFinderView(WebTest):
     def setUp(self):
         wmc_area_type = AreaTypeFactory.create()
@@ -102,13 +102,13 @@ class TestConstituencyPostcodeFinderView(WebTest):
             base__area=area_extra.base,
         )
 
-    def test_front_page(self, mock_requests):
+    def test_front_page(self, mock_session):
         response = self.app.get('/')
         # Check that there is a form on that page
         response.forms['form-postcode']
 
-    def test_valid_postcode_redirects_to_constituency(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_every_election
+    def test_valid_postcode_redirects_to_constituency(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_every_election
         response = self.app.get('/')
         form = response.forms['form-postcode']
         form['q'] = 'SE24 0AG'
@@ -124,8 +124,8 @@ class TestConstituencyPostcodeFinderView(WebTest):
             '/areas/WMC--gss:E14000673',
         )
 
-    def test_valid_postcode_redirects_to_multiple_areas(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_every_election
+    def test_valid_postcode_redirects_to_multiple_areas(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_every_election
         # Create some extra posts and areas:
         london_assembly = ParliamentaryChamberExtraFactory.create(
             slug='london-assembly', base__name='London Assembly'
@@ -184,8 +184,8 @@ class TestConstituencyPostcodeFinderView(WebTest):
             '/areas/GLA--unit_id:41441,LAC--gss:E32000010,WMC--gss:E14000673',
         )
 
-    def test_valid_postcode_redirects_to_only_real_areas(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_every_election
+    def test_valid_postcode_redirects_to_only_real_areas(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_every_election
         # Create some extra posts and areas:
         london_assembly = ParliamentaryChamberExtraFactory.create(
             slug='london-assembly', base__name='London Assembly'
@@ -232,8 +232,8 @@ class TestConstituencyPostcodeFinderView(WebTest):
             '/areas/GLA--unit_id:41441,WMC--gss:E14000673',
         )
 
-    def test_unknown_postcode_returns_to_finder_with_error(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_every_election
+    def test_unknown_postcode_returns_to_finder_with_error(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_every_election
         response = self.app.get('/')
         form = response.forms['form-postcode']
         # This looks like a postcode to the usual postcode-checking
@@ -247,8 +247,8 @@ class TestConstituencyPostcodeFinderView(WebTest):
         response = self.app.get(response.location)
         self.assertIn('The postcode “CB2 8RQ” couldn’t be found', response)
 
-    def test_nonsense_postcode_searches_for_candidate(self, mock_requests):
-        mock_requests.get.side_effect = fake_requests_for_every_election
+    def test_nonsense_postcode_searches_for_candidate(self, mock_session):
+        mock_session.get.side_effect = fake_requests_for_every_election
         response = self.app.get('/')
         form = response.forms['form-postcode']
         # This looks like a postcode to the usual postcode-checking
@@ -264,10 +264,10 @@ class TestConstituencyPostcodeFinderView(WebTest):
             a['href'],
             '/person/create/select_election?name=foo bar')
 
-    def test_nonascii_postcode(self, mock_requests):
+    def test_nonascii_postcode(self, mock_session):
         # This used to produce a particular error, but now goes to the
         # search candidates page. Assert the new behaviour:
-        mock_requests.get.side_effect = fake_requests_for_every_election
+        mock_session.get.side_effect = fake_requests_for_every_election
         response = self.app.get('/')
         form = response.forms['form-postcode']
         # Postcodes with non-ASCII characters aren't postcodes, so
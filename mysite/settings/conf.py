@@ -451,6 +451,13 @@ def get_settings(conf_file_leafname, election_app=None, tests=False):
 
         # By default, cache successful results from MapIt for a day
         'MAPIT_CACHE_SECONDS': 86400,
+        # ... and that a postcode or coordinates couldn't be found for
+        # ten minutes
+        'MAPIT_NEGATIVE_CACHE_SECONDS': 600,
+        # Files of postcodes and area boundaries to look up areas in
+        # before making a request to MapIt (see candidates.local_areas)
+        'LOCAL_AREA_POSTCODES_FILE': conf.get('LOCAL_AREA_POSTCODES_FILE'),
+        'LOCAL_AREA_BOUNDARIES_FILES': conf.get('LOCAL_AREA_BOUNDARIES_FILES') or [],
         'DATABASES': databases,
         'CACHES': {
             'default': cache,
@@ -486,7 +493,7 @@ def get_settings(conf_file_leafname, election_app=None, tests=False):
         # allow attaching extra data to notifications:
         'NOTIFICATIONS_USE_JSONFIELD': True,
 
-        'HAYSTACK_SIGNAL_PROCESSOR': 'haystack.signals.RealtimeSignalProcessor',
+        'HAYSTACK_SIGNAL_PROCESSOR': 'candidates.search_signals.QueuedSignalProcessor',
 
         'HAYSTACK_CONNECTIONS': {
             'default': {
@@ -535,6 +542,13 @@ def get_settings(conf_file_leafname, election_app=None, tests=False):
         # If we're not testing, use PipelineCachedStorage
         result['STATICFILES_STORAGE'] = \
             'pipeline.storage.PipelineCachedStorage'
+    result['SEARCH_BACKEND'] = conf.get('SEARCH_BACKEND', 'elasticsearch')
+    if result['SEARCH_BACKEND'] in ('simple', 'database'):
+        result['HAYSTACK_CONNECTIONS'] = {
+            'default': {
+                'ENGINE': 'haystack.backends.simple_backend.SimpleEngine',
+            },
+        }
     if conf.get('NGINX_SSL'):
         result['SECURE_PROXY_SSL_HEADER'] = ('HTTP_X_FORWARDED_PROTO', 'https')
         result['ACCOUNT_DEFAULT_HTTP_PROTOCOL'] = 'https'
@@ -1,5 +1,4 @@
 from __future__ import unicode_literals
-import json
 
 from django.db import models
 from django.db.models.signals import post_save
@@ -8,8 +7,8 @@ from django.contrib.auth.models import User
 from django_extensions.db.models import TimeStampedModel
 
 from popolo.models import Person
-from candidates.models import (PersonExtra, ComplexPopoloField,
-                               SimplePopoloField)
+from candidates.models import PersonExtra, SimplePopoloField
+from candidates.models.fields import get_complex_popolo_fields
 
 
 class PersonTaskManager(models.Manager):
@@ -32,11 +31,13 @@ class PersonTask(TimeStampedModel):
         ordering = ['-task_priority', ]
 
     def get_user_from_vesions(self):
-        version_data = json.loads(self.person.extra.versions)
-        if not version_data or 'username' not in version_data[0]:
+        # Only the username is needed, so avoid fetching the version data:
+        username = self.person.versions \
+            .values_list('username', flat=True).first()
+        if not username:
             return None
         try:
-            return User.objects.get(username=version_data[0]['username'])
+            return User.objects.get(username=username)
         except User.DoesNotExist:
             return None
 
@@ -46,14 +47,13 @@ class PersonTask(TimeStampedModel):
             return value
 
         person_qs = PersonExtra.objects.filter(base=self.person)
-        simple_field = SimplePopoloField.objects.filter(
-            name=self.task_field).first()
-        if simple_field:
+        simple_field_names = [
+            f.name for f in SimplePopoloField.objects.cached()]
+        if self.task_field in simple_field_names:
             return person_qs.filter(**{'base__' + self.task_field: ''})
 
 
-        complex_field = ComplexPopoloField.objects.filter(
-            name=self.task_field).first()
+        complex_field = get_complex_popolo_fields().get(self.task_field)
 
         if complex_field:
             kwargs = {
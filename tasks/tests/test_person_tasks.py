@@ -14,7 +14,7 @@ class PersonTaskTests(TestCase):
             name="John the Well-Described",
             additional_name="Very Well-Described"
         )
-        PersonExtra.objects.create(base=self.person, versions='[]')
+        PersonExtra.objects.create(base=self.person)
         PersonTask.objects.create(
             task_field='email',
             person=self.person,